@@ -0,0 +1,796 @@
+import os
+import sys
+import math
+import json
+import time
+import random
+import shutil
+import pickle
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from world_storage import Chunk, ChunkedWorld, CHUNK_SIZE, CHUNK_AREA, CHUNK_VOLUME, WORLD_HEIGHT, block_id
+from block_registry import load_block_registry, REGISTRY
+from region_file import RegionStore, BackgroundSaver
+from chunk_workers import ProcessChunkPool, default_worker_count
+from worldgen import generate_chunk_blocks
+from raycast import raycast_block
+from physics import box_hits_solid, sweep_aabb, FixedTimestep
+from lighting import LightEngine
+import chunk_mesher
+import terrain
+import structures
+
+MAIN_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _timed(func, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def flat_test_world(radius, seed=1):
+    # 與舊版 generate_chunk 相同的平坦地形: 石頭/泥土/草地 + 礦石
+    rng = random.Random(seed)
+    world = ChunkedWorld()
+    stone, dirt, grass = block_id("stone"), block_id("dirt"), block_id("grass_block")
+    ores = [block_id("coal_ore"), block_id("iron_ore")]
+    for cx in range(-radius, radius + 1):
+        for cz in range(-radius, radius + 1):
+            blocks = world.ensure_chunk(cx, cz).blocks
+            blocks[0:4 * CHUNK_AREA] = bytes([stone]) * (4 * CHUNK_AREA)
+            blocks[4 * CHUNK_AREA:8 * CHUNK_AREA] = bytes([dirt]) * (4 * CHUNK_AREA)
+            blocks[8 * CHUNK_AREA:9 * CHUNK_AREA] = bytes([grass]) * CHUNK_AREA
+            for idx in range(CHUNK_AREA, 4 * CHUNK_AREA):
+                if rng.randint(1, 1000) <= 80:
+                    blocks[idx] = ores[rng.randint(0, 1)]
+    return world
+
+
+def bench_world_format(radius):
+    world = flat_test_world(radius)
+    temp_dir = tempfile.mkdtemp(prefix="mcpy_bench_")
+    try:
+        json_path = os.path.join(temp_dir, "world.json")
+        region_dir = os.path.join(temp_dir, "region")
+
+        # 舊版 save_game / load_world 的 JSON 寫法
+        def save_json():
+            data = {f"{k[0]},{k[1]},{k[2]}": v for k, v in world.items()}
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+
+        def load_json():
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.loads(f.read())
+            return {tuple(map(int, k.split(","))): v for k, v in data.items()}
+
+        store = RegionStore(region_dir)
+
+        def save_region():
+            store.save_chunks({key: chunk.blocks for key, chunk in world.chunks.items()})
+
+        def load_region():
+            return dict(store.load_all())
+
+        json_save, _ = _timed(save_json)
+        json_load, loaded = _timed(load_json)
+        region_save, _ = _timed(save_region)
+        region_load, loaded_chunks = _timed(load_region)
+        assert len(loaded) == len(world) and len(loaded_chunks) == len(world.chunks)
+
+        json_size = os.path.getsize(json_path)
+        region_size = sum(os.path.getsize(os.path.join(region_dir, n)) for n in os.listdir(region_dir))
+        print(f"world: {len(world.chunks)} chunks, {len(world)} blocks")
+        print(f"{'format':<8}{'save (s)':>12}{'load (s)':>12}{'size (KB)':>12}")
+        print(f"{'json':<8}{json_save:>12.3f}{json_load:>12.3f}{json_size / 1024:>12.0f}")
+        print(f"{'region':<8}{region_save:>12.3f}{region_load:>12.3f}{region_size / 1024:>12.0f}")
+        print(f"speedup: save x{json_save / region_save:.0f}, load x{json_load / region_load:.0f}, size /{json_size / region_size:.0f}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_autosave(radius):
+    # 比較同步存檔與背景存檔時主執行緒被卡住的時間
+    world = flat_test_world(radius)
+    temp_dir = tempfile.mkdtemp(prefix="mcpy_bench_")
+    try:
+        store = RegionStore(temp_dir)
+        saver = BackgroundSaver(store)
+
+        def sync_save():
+            world.modified_chunks.update(world.chunk_keys())
+            store.save_chunks(world.snapshot_modified_chunks())
+
+        def queue_save():
+            world.modified_chunks.update(world.chunk_keys())
+            saver.submit(world.snapshot_modified_chunks())
+
+        stone = block_id("stone")
+
+        def edit_all_chunks():
+            # 每個區塊寫一格，觸發 copy-on-write
+            for cx, cz in list(world.chunk_keys()):
+                world.set_id(cx * CHUNK_SIZE, 100, cz * CHUNK_SIZE, stone)
+
+        sync_time, _ = _timed(sync_save)
+        queue_times = []
+        cow_times = []
+        for _ in range(3):
+            queue_time, _ = _timed(queue_save, repeat=1)
+            cow_time, _ = _timed(edit_all_chunks, repeat=1)
+            saver.flush()
+            queue_times.append(queue_time)
+            cow_times.append(cow_time)
+        saver.close()
+        print(f"world: {len(world.chunks)} chunks")
+        print(f"sync save (main thread):       {sync_time * 1000:8.2f} ms")
+        print(f"snapshot + queue (main thread): {min(queue_times) * 1000:8.2f} ms")
+        print(f"first edit per chunk (COW):     {min(cow_times) * 1000:8.2f} ms")
+        print(f"background write (worker):      {saver.last_duration * 1000:8.2f} ms")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_lazy_load(radius):
+    # 啟動時間: 全部讀入 vs 只讀索引再載入玩家周圍 9x9 區塊
+    world = flat_test_world(radius)
+    temp_dir = tempfile.mkdtemp(prefix="mcpy_bench_")
+    try:
+        store = RegionStore(temp_dir)
+        store.save_chunks({key: chunk.blocks for key, chunk in world.chunks.items()})
+
+        def load_everything():
+            return dict(store.load_all())
+
+        def load_nearby():
+            lazy_world = ChunkedWorld()
+            lazy_world.attach_store(store)
+            for cx in range(-4, 5):
+                for cz in range(-4, 5):
+                    lazy_world.load_chunk(cx, cz)
+            return lazy_world
+
+        full_time, _ = _timed(load_everything)
+        index_time, _ = _timed(lambda: ChunkedWorld().attach_store(store))
+        lazy_time, lazy_world = _timed(load_nearby)
+        print(f"world on disk: {len(world.chunks)} chunks")
+        print(f"load_all:               {full_time * 1000:8.1f} ms")
+        print(f"index only:             {index_time * 1000:8.1f} ms")
+        print(f"index + 81 nearby:      {lazy_time * 1000:8.1f} ms ({len(lazy_world.chunks)} resident)")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_mesher(radius):
+    world = flat_test_world(radius)
+    # 加幾棵樹葉讓透明方塊的判斷也被測到
+    rng = random.Random(2)
+    leaves = block_id("oak_leaves")
+    span = radius * CHUNK_SIZE
+    for _ in range(len(world.chunks) * 20):
+        world.set_id(rng.randint(-span, span), rng.randint(9, 14), rng.randint(-span, span), leaves)
+    chunks = list(world.chunks.values())
+
+    def mesh_all(mesher):
+        return [mesher(world, chunk, REGISTRY) for chunk in chunks]
+
+    python_time, python_meshes = _timed(mesh_all, chunk_mesher.mesh_chunk_python)
+    print(f"world: {len(chunks)} chunks, {sum(len(v) // 12 for m in python_meshes for v, _, _ in m.values())} quads")
+    print(f"{'mesher':<8}{'total (ms)':>12}{'per chunk (ms)':>16}")
+    print(f"{'python':<8}{python_time * 1000:>12.1f}{python_time * 1000 / len(chunks):>16.2f}")
+    numpy_time, numpy_meshes = _timed(mesh_all, chunk_mesher.mesh_chunk_numpy)
+    assert numpy_meshes == python_meshes, "numpy 版本的網格與純 Python 版本不同"
+    print(f"{'numpy':<8}{numpy_time * 1000:>12.1f}{numpy_time * 1000 / len(chunks):>16.2f}")
+    print(f"speedup: x{python_time / numpy_time:.1f} (geometry identical)")
+    greedy_time, greedy_meshes = _timed(mesh_all, chunk_mesher.mesh_chunk_greedy)
+    greedy_quads = sum(len(v) // 12 for m in greedy_meshes for v, _, _ in m.values())
+    print(f"{'greedy':<8}{greedy_time * 1000:>12.1f}{greedy_time * 1000 / len(chunks):>16.2f}  ({greedy_quads} quads)")
+
+
+def legacy_generate_terrain(seed, cx, cz):
+    # 改用 numpy 之前 generate_chunk 的做法: 整層寫入後逐格抽礦石
+    rng = terrain.chunk_rng(seed, cx, cz)
+    blocks = bytearray(CHUNK_VOLUME)
+    base = terrain.BASE_Y_LEVEL
+    stone_id = block_id("stone")
+    blocks[0:(base - 4) * CHUNK_AREA] = bytes([stone_id]) * ((base - 4) * CHUNK_AREA)
+    blocks[(base - 4) * CHUNK_AREA:base * CHUNK_AREA] = bytes([block_id("dirt")]) * (4 * CHUNK_AREA)
+    blocks[base * CHUNK_AREA:(base + 1) * CHUNK_AREA] = bytes([block_id("grass_block")]) * CHUNK_AREA
+    ore_ids = [(block_id(name), min_d, max_d, rarity) for name, min_d, max_d, rarity in terrain.ORES_TO_GENERATE]
+    for column in range(CHUNK_AREA):
+        for y in range(terrain.ORE_MIN_Y, terrain.ORE_MAX_Y + 1):
+            idx = y * CHUNK_AREA + column
+            if blocks[idx] == stone_id:
+                for ore_id, min_d, max_d, rarity in ore_ids:
+                    if min_d <= y <= max_d and rng.randint(1, 1000) <= rarity:
+                        blocks[idx] = ore_id
+                        break
+    return blocks
+
+
+def bench_worldgen(radius, seed=1, frame_ms=1000 / 60):
+    keys = [(cx, cz) for cx in range(-radius, radius + 1) for cz in range(-radius, radius + 1)]
+
+    def generate_all(generator):
+        return [generator(seed, cx, cz) for cx, cz in keys]
+
+    def generate_all_cold(generator):
+        # 每輪都清掉雜訊快取，量到的是第一次生成的成本
+        terrain.clear_caches()
+        return generate_all(generator)
+
+    def flat_terrain(seed, cx, cz):
+        return terrain.generate_terrain(seed, cx, cz, terrain.flat_heightmap())
+
+    def flat_no_caves(seed, cx, cz):
+        return terrain.generate_terrain(seed, cx, cz, terrain.flat_heightmap(), caves=False)
+
+    def hills_no_caves(seed, cx, cz):
+        return terrain.generate_terrain(seed, cx, cz, caves=False)
+
+    # flat 與 hills 都清掉快取再量，比較的是同樣冷啟動的成本
+    legacy_time, legacy_chunks = _timed(generate_all, legacy_generate_terrain)
+    flat_time, flat_chunks = _timed(generate_all_cold, flat_terrain)
+    hills_time, hills_chunks = _timed(generate_all_cold, terrain.generate_terrain)
+    flat_terrain_time, _ = _timed(generate_all_cold, flat_no_caves)
+    hills_terrain_time, _ = _timed(generate_all_cold, hills_no_caves)
+    # 亂數來源不同，逐格不會一樣；比較各種方塊的總數確認分佈相同
+    print(f"{'block':<14}{'legacy':>10}{'flat':>10}{'hills':>10}")
+    for name in ("stone", "dirt", "grass_block") + tuple(ore[0] for ore in terrain.ORES_TO_GENERATE):
+        bid = block_id(name)
+        legacy_count = sum(blocks.count(bid) for blocks in legacy_chunks)
+        flat_count = sum(int((ids == bid).sum()) for ids in flat_chunks)
+        hills_count = sum(int((ids == bid).sum()) for ids in hills_chunks)
+        print(f"{name:<14}{legacy_count:>10}{flat_count:>10}{hills_count:>10}")
+    print(f"{'generator':<16}{'total (ms)':>12}{'per chunk (ms)':>16}")
+    for label, elapsed in (("legacy", legacy_time), ("flat", flat_time), ("hills", hills_time),
+                           ("flat, no caves", flat_terrain_time), ("hills, no caves", hills_terrain_time)):
+        print(f"{label:<16}{elapsed * 1000:>12.1f}{elapsed * 1000 / len(keys):>16.3f}")
+    fits = "fits" if hills_time * 1000 <= frame_ms else "does NOT fit"
+    print(f"speedup: x{legacy_time / hills_time:.1f}; {len(keys)} hilly chunks {fits} in one {frame_ms:.1f} ms frame")
+
+
+def bench_noise(radius, seed=1):
+    noise = terrain.height_noise(seed)
+    print(f"{'grid':<16}{'octaves':>8}{'calls':>8}{'Msamples/s':>12}")
+    for label, size in (("chunk coarse", CHUNK_SIZE // terrain.NOISE_STEP + 1),
+                        ("tile coarse", terrain.NOISE_TILE * CHUNK_SIZE // terrain.NOISE_STEP + 1),
+                        ("chunk full", CHUNK_SIZE), ("256x256", 256)):
+        coords = np.arange(size) / terrain.TERRAIN_SCALE
+        calls = max(1, 200000 // (size * size))
+        elapsed, _ = _timed(lambda: [noise.grid2(coords + i, coords) for i in range(calls)])
+        print(f"{label:<16}{noise.octaves:>8}{calls:>8}{calls * size * size / elapsed / 1e6:>12.2f}")
+    keys = [(cx, cz) for cx in range(-radius, radius + 1) for cz in range(-radius, radius + 1)]
+
+    def heightmaps():
+        terrain.clear_caches()
+        return [terrain.chunk_heightmap(seed, cx, cz) for cx, cz in keys]
+
+    elapsed, maps = _timed(heightmaps)
+    heights = np.stack(maps)
+    print(f"heightmaps: {len(keys)} chunks in {elapsed * 1000:.2f} ms ({elapsed * 1e6 / len(keys):.1f} us/chunk, "
+          f"{len(keys) * CHUNK_AREA / elapsed / 1e6:.2f} Mcolumns/s), height {heights.min()}..{heights.max()}")
+
+
+def generated_world(radius, seed=1, caves=True):
+    world = ChunkedWorld()
+    for cx in range(-radius, radius + 1):
+        for cz in range(-radius, radius + 1):
+            world.ensure_chunk(cx, cz).blocks[:] = terrain.generate_terrain(seed, cx, cz, caves=caves).tobytes()
+    return world
+
+
+def bench_caves(radius, seed=1):
+    keys = [(cx, cz) for cx in range(-radius, radius + 1) for cz in range(-radius, radius + 1)]
+
+    def generate_all(caves):
+        terrain.clear_caches()
+        return [terrain.generate_terrain(seed, cx, cz, caves=caves) for cx, cz in keys]
+
+    below_surface = [np.arange(terrain.WORLD_HEIGHT)[:, None, None] < terrain.chunk_heightmap(seed, cx, cz)
+                     for cx, cz in keys]
+    print(f"{'caves':<6}{'gen/chunk (ms)':>16}{'carved blocks':>15}{'quads':>10}{'greedy':>10}{'mesh/chunk (ms)':>17}")
+    for caves in (False, True):
+        gen_time, chunks = _timed(generate_all, caves)
+        carved = sum(int(((ids == 0) & below).sum()) for ids, below in zip(chunks, below_surface))
+        world = generated_world(radius, seed, caves)
+        # 外圈區塊缺鄰居，邊界面會多算，只網格內圈
+        inner = [world.get_chunk(cx, cz) for cx, cz in keys if max(abs(cx), abs(cz)) < radius]
+        mesh_time, meshes = _timed(lambda: [chunk_mesher.mesh_chunk(world, chunk, REGISTRY) for chunk in inner])
+        greedy = [chunk_mesher.mesh_chunk_greedy(world, chunk, REGISTRY) for chunk in inner]
+        quads = sum(len(v) // 12 for m in meshes for v, _, _ in m.values())
+        greedy_quads = sum(len(v) // 12 for m in greedy for v, _, _ in m.values())
+        print(f"{'on' if caves else 'off':<6}{gen_time * 1000 / len(keys):>16.3f}{carved:>15}{quads:>10}{greedy_quads:>10}"
+              f"{mesh_time * 1000 / len(inner):>17.2f}")
+
+
+def bench_trees(radius, seed=1):
+    keys = [(cx, cz) for cx in range(-radius, radius + 1) for cz in range(-radius, radius + 1)]
+    terrain_chunks = {key: terrain.generate_terrain(seed, *key) for key in keys}
+
+    def place_all(order):
+        structures.clear_caches()
+        result = {}
+        for key in order:
+            ids = terrain_chunks[key].copy()
+            structures.place_structures(ids, seed, *key)
+            result[key] = ids
+        return result
+
+    elapsed, forward = _timed(place_all, keys)
+    backward = place_all(list(reversed(keys)))
+    shuffled = list(keys)
+    random.Random(seed).shuffle(shuffled)
+    shuffled = place_all(shuffled)
+    same = all(np.array_equal(forward[key], backward[key]) and np.array_equal(forward[key], shuffled[key]) for key in keys)
+    plans = [structures.plan_trees(seed, *key) for key in keys]
+    trees = sum(int(part[2].sum()) for plan in plans for part in plan.values())
+    crossing = sum(1 for plan in plans if len(plan) > 1)
+    print(f"{len(keys)} chunks, {trees} log blocks, {crossing} chunks with trees reaching into a neighbour")
+    print(f"structure pass: {elapsed * 1000:.2f} ms total, {elapsed * 1e6 / len(keys):.1f} us/chunk")
+    print(f"forward / reversed / shuffled order identical: {same}")
+
+
+def _load_registry():
+    load_block_registry(os.path.join(MAIN_SCRIPT_DIR, "assets", "blocks.json"))
+
+
+def _pickled_generate(seed, cx, cz):
+    return generate_chunk_blocks(seed, cx, cz)
+
+
+def _pickled_mesh(key, snapshot):
+    return chunk_mesher.mesh_chunk_numpy(snapshot, snapshot.get_chunk(*key), REGISTRY)
+
+
+def bench_shared_memory(radius, seed=1):
+    keys = [(cx, cz) for cx in range(-radius, radius + 1) for cz in range(-radius, radius + 1)]
+    inner = [key for key in keys if max(abs(key[0]), abs(key[1])) < radius]
+    workers = default_worker_count()
+
+    def store(world, key, ids):
+        # 與 Game.apply_generated_chunk 一樣複製進區塊陣列
+        np.copyto(np.frombuffer(world.ensure_chunk(*key).blocks, dtype=np.uint8), ids.reshape(-1))
+
+    def pickled_round(executor):
+        # 參數與結果都經過 pickle 與管線: 區塊陣列、九個區塊的快照、網格串列
+        world = ChunkedWorld()
+        start = time.perf_counter()
+        for key, ids in zip(keys, executor.map(_pickled_generate, [seed] * len(keys), *zip(*keys))):
+            store(world, key, ids)
+        gen_time = time.perf_counter() - start
+        start = time.perf_counter()
+        meshes = list(executor.map(_pickled_mesh, inner, [world.snapshot_area(*key) for key in inner]))
+        return world, gen_time, time.perf_counter() - start, sum(len(v) // 12 for m in meshes for v, _, _ in m.values())
+
+    def pool_round(pool):
+        # 遊戲的 ProcessChunkPool: 生成同樣走 pickle (共享記憶體的槽反而較慢)，網格走共享記憶體
+        world = ChunkedWorld()
+        start = time.perf_counter()
+        for key in keys:
+            pool.submit_generate(seed, *key)
+        while pool.generating:
+            done = pool.done_generated()
+            for key in done:
+                store(world, key, pool.pop_generated(key))
+            if not done:
+                # 像遊戲一樣每個 tick 才檢查一次，不要空轉搶工作行程的 CPU
+                time.sleep(0.001)
+        gen_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for key in inner:
+            pool.submit(key, chunk_mesher.mesh_chunk_numpy, world.snapshot_area(*key), REGISTRY)
+        quads = 0
+        while pool.pending:
+            done = pool.done_keys()
+            for key in done:
+                quads += sum(v.size // 12 for v, _, _ in pool.pop_result(key).values())
+            if not done:
+                time.sleep(0.001)
+        return world, gen_time, time.perf_counter() - start, quads
+
+    executor = ProcessPoolExecutor(workers, initializer=_load_registry)
+    pool = ProcessChunkPool(REGISTRY, workers)
+    try:
+        # 第一輪讓工作行程啟動、暖好雜訊快取，不列入計時
+        results = {}
+        for label, run in (("pickle", lambda: pickled_round(executor)), ("pool", lambda: pool_round(pool))):
+            run()
+            results[label] = min((run() for _ in range(3)), key=lambda r: r[1] + r[2])
+    finally:
+        executor.shutdown()
+        pool.shutdown()
+
+    world = results["pickle"][0]
+    same = all(world.get_chunk(*key).blocks == results["pool"][0].get_chunk(*key).blocks for key in keys)
+    gen_bytes = sum(len(pickle.dumps(generate_chunk_blocks(seed, *key))) for key in keys) / len(keys)
+    mesh_bytes = sum(len(pickle.dumps(world.snapshot_area(*key))) + len(pickle.dumps(_pickled_mesh(key, world.snapshot_area(*key))))
+                     for key in inner) / len(inner)
+    print(f"{workers} worker processes, {len(keys)} chunks generated, {len(inner)} meshed")
+    print(f"pickled per chunk: generate {gen_bytes / 1024:.1f} KB, mesh {mesh_bytes / 1024:.1f} KB (snapshot + vertex lists)")
+    print(f"{'transfer':<10}{'gen chunks/s':>14}{'mesh chunks/s':>15}{'quads':>9}")
+    for label, (_, gen_time, mesh_time, quads) in results.items():
+        print(f"{label:<10}{len(keys) / gen_time:>14.0f}{len(inner) / mesh_time:>15.0f}{quads:>9}")
+    print(f"generated chunks identical: {same}")
+
+
+def legacy_target_block(get_id, origin, direction, max_distance, step_size=0.05):
+    # 改用體素走訪之前 get_target_block 的做法: 每 step_size 取樣一次，面由上一個空氣格推算
+    last_air = None
+    for i in range(int(max_distance / step_size) + 1):
+        point = [origin[axis] + direction[axis] * i * step_size for axis in range(3)]
+        pos = (math.floor(point[0]), math.floor(point[1]), math.floor(point[2]))
+        if get_id(*pos):
+            face = [0, 0, 0]
+            if last_air:
+                diff = [last_air[axis] - pos[axis] for axis in range(3)]
+                if abs(diff[0]) > abs(diff[1]) and abs(diff[0]) > abs(diff[2]): face[0] = int(math.copysign(1, diff[0]))
+                elif abs(diff[1]) > abs(diff[2]): face[1] = int(math.copysign(1, diff[1]))
+                else: face[2] = int(math.copysign(1, diff[2]))
+            else:
+                frac = [point[axis] - pos[axis] - 0.5 for axis in range(3)]
+                if abs(frac[0]) > abs(frac[1]) and abs(frac[0]) > abs(frac[2]): face[0] = 1 if frac[0] < 0 else -1
+                elif abs(frac[1]) > abs(frac[2]): face[1] = 1 if frac[1] < 0 else -1
+                else: face[2] = 1 if frac[2] < 0 else -1
+            if face == [0, 0, 0]: face = [0, 1, 0]
+            return pos, tuple(face)
+        last_air = pos
+    return None
+
+
+def bench_raycast(radius, seed=1, rays=2000, reach=8):
+    world = generated_world(radius, seed)
+    rng = random.Random(seed)
+    span = radius * CHUNK_SIZE - reach
+    rays_list = []
+    for _ in range(rays):
+        x, z = rng.uniform(-span, span), rng.uniform(-span, span)
+        # 眼睛在地表上方 1.5 格，大多往下看，模擬挖掘與放置
+        eye = (x, terrain.chunk_heightmap(seed, math.floor(x) >> 4, math.floor(z) >> 4)[math.floor(z) & 15, math.floor(x) & 15] + 2.5, z)
+        yaw, pitch = math.radians(rng.uniform(0, 360)), math.radians(rng.uniform(-89, 30))
+        rays_list.append((eye, (math.cos(pitch) * -math.sin(yaw), math.sin(pitch), math.cos(pitch) * -math.cos(yaw))))
+    get_id, targetable = world.get_id, REGISTRY.targetable
+
+    legacy_time, legacy_hits = _timed(lambda: [legacy_target_block(get_id, o, d, reach) for o, d in rays_list])
+    dda_time, dda_hits = _timed(lambda: [raycast_block(get_id, targetable, o, d, reach) for o, d in rays_list])
+    # 參考答案: 取樣間隔縮小到 0.001 的舊做法，在邊角附近仍可能誤判但機率很低
+    reference = [legacy_target_block(get_id, o, d, reach, step_size=0.001) for o, d in rays_list]
+    hits = sum(1 for hit in reference if hit)
+    print(f"{rays} rays, reach {reach}, {hits} hit a block")
+    print(f"{'method':<8}{'us/ray':>10}{'block wrong':>13}{'face wrong':>12}")
+    for label, elapsed, result in (("legacy", legacy_time, legacy_hits), ("dda", dda_time, dda_hits)):
+        block_wrong = sum(1 for a, b in zip(result, reference) if (a and a[0]) != (b and b[0]))
+        face_wrong = sum(1 for a, b in zip(result, reference) if a and b and a[0] == b[0] and a[1] != b[1])
+        print(f"{label:<8}{elapsed * 1e6 / rays:>10.1f}{block_wrong:>13}{face_wrong:>12}")
+    print(f"speedup: x{legacy_time / dda_time:.1f}")
+
+
+def legacy_collides(get_id, solid, position, width=0.6, height=1.8):
+    # 改用掃掠碰撞之前 check_collision_bbox 的做法: 逐格查詢碰撞盒覆蓋的方塊
+    min_x, max_x = position[0] - width / 2, position[0] + width / 2
+    min_y, max_y = position[1], position[1] + height
+    min_z, max_z = position[2] - width / 2, position[2] + width / 2
+    for ix in range(math.floor(min_x), math.ceil(max_x)):
+        for iy in range(math.floor(min_y), math.ceil(max_y)):
+            for iz in range(math.floor(min_z), math.ceil(max_z)):
+                if solid[get_id(ix, iy, iz)] and min_x < ix + 1 and max_x > ix and min_y < iy + 1 and max_y > iy \
+                        and min_z < iz + 1 and max_z > iz:
+                    return True
+    return False
+
+
+def legacy_move(world, solid, position, delta):
+    # 舊版 update: 水平方向撞到就不動，垂直方向只檢查終點，撞到再取整貼齊
+    for axis in (0, 2):
+        moved = list(position)
+        moved[axis] += delta[axis]
+        if not legacy_collides(world.get_id, solid, moved):
+            position[axis] = moved[axis]
+    moved = [position[0], position[1] + delta[1], position[2]]
+    if not legacy_collides(world.get_id, solid, moved):
+        position[1] = moved[1]
+    elif delta[1] <= 0:
+        position[1] = math.floor(moved[1]) + 1.0
+    else:
+        position[1] = math.floor(moved[1] + 1.8) - 1.8 - 0.01
+
+
+def swept_move(world, solid, position, delta):
+    for axis in (0, 2, 1):
+        box_min = (position[0] - 0.3, position[1], position[2] - 0.3)
+        box_max = (position[0] + 0.3, position[1] + 1.8, position[2] + 0.3)
+        t, _ = sweep_aabb(world, solid, box_min, box_max, axis, delta[axis])
+        position[axis] += delta[axis] * t
+
+
+def bench_physics(radius, seed=1, ticks=2000):
+    world = generated_world(radius, seed)
+    solid = REGISTRY.solid
+    rng = random.Random(seed)
+    span = radius * CHUNK_SIZE - 4
+    starts = []
+    for _ in range(ticks):
+        x, z = rng.uniform(-span, span), rng.uniform(-span, span)
+        ground = int(terrain.chunk_heightmap(seed, math.floor(x) >> 4, math.floor(z) >> 4)[math.floor(z) & 15, math.floor(x) & 15])
+        # 站在地表附近往隨機方向走一個 60 FPS 的 tick (含重力)
+        starts.append(([x, ground + 1 + rng.uniform(0, 0.5), z], (rng.uniform(-0.1, 0.1), -rng.uniform(0, 0.3), rng.uniform(-0.1, 0.1))))
+
+    def run(mover):
+        for position, delta in starts:
+            mover(world, solid, list(position), delta)
+
+    legacy_time, _ = _timed(run, legacy_move)
+    swept_time, _ = _timed(run, swept_move)
+    print(f"{'collision':<10}{'us/tick':>10}")
+    print(f"{'legacy':<10}{legacy_time * 1e6 / ticks:>10.1f}")
+    print(f"{'swept':<10}{swept_time * 1e6 / ticks:>10.1f}")
+
+    # 從高空以終端速度落到一格厚的平台上，dt 越大舊做法越容易穿過去
+    platform = ChunkedWorld()
+    for x in range(-2, 3):
+        for z in range(-2, 3):
+            platform.set_id(x, 60, z, block_id("stone"))
+    print(f"{'dt':<8}{'legacy tunnelled':>18}{'swept tunnelled':>17}")
+    for dt in (1 / 144, 1 / 60, 1 / 20, 0.1):
+        offsets = [i * 5 / 50 for i in range(50)]
+        results = []
+        for mover in (legacy_move, swept_move):
+            fell = 0
+            for offset in offsets:
+                position = [0.5, 80.0 + offset, 0.5]
+                while position[1] > 40 and not box_hits_solid(platform, solid, (0.2, position[1] - 0.01, 0.2), (0.8, position[1], 0.8)):
+                    mover(platform, solid, position, (0.0, -50.0 * dt, 0.0))
+                fell += position[1] < 60
+            results.append(fell)
+        print(f"{dt:<8.4f}{results[0]:>12}/{len(offsets)}{results[1]:>14}/{len(offsets)}")
+
+
+def bench_timestep(radius, seed=1, seconds=4.0, gravity=-20.0, speed=5.0, jump_force=8.0):
+    world = generated_world(radius, seed)
+    solid = REGISTRY.solid
+    rng = random.Random(seed)
+    # 每種幀序列都比 seconds 長一點，模擬到 seconds 秒 (固定步長為 seconds * 60 個 tick) 為止
+    frame_patterns = {
+        "144 fps": [1 / 144] * int((seconds + 1) * 144),
+        "60 fps": [1 / 60] * int((seconds + 1) * 60),
+        "25 fps": [1 / 25] * int((seconds + 1) * 25),
+        "jitter": [],
+    }
+    while sum(frame_patterns["jitter"]) < seconds + 1:
+        frame_patterns["jitter"].append(rng.choice((0.005, 0.016, 0.016, 0.033, 0.09)))
+
+    def simulate(frames, fixed):
+        # 與 Game.update 相同的步驟: 重力、水平行走、每 0.5 秒落地時跳一次，x/z/y 依序掃掠
+        state = {"position": [0.5, 60.0, 0.5], "velocity": 0.0, "on_ground": False, "time": 0.0, "next_jump": 0.5}
+
+        def tick(dt):
+            if state["time"] >= seconds - 1e-9:
+                return
+            position = state["position"]
+            state["time"] += dt
+            if state["on_ground"] and state["time"] >= state["next_jump"]:
+                state["velocity"], state["next_jump"] = jump_force, state["time"] + 0.5
+            state["velocity"] = max(state["velocity"] + gravity * dt, -50.0)
+            for axis, delta in ((0, speed * dt), (2, speed * 0.5 * dt), (1, state["velocity"] * dt)):
+                t, normal = sweep_aabb(world, solid, (position[0] - 0.3, position[1], position[2] - 0.3),
+                                       (position[0] + 0.3, position[1] + 1.8, position[2] + 0.3), axis, delta)
+                position[axis] += delta * t
+                if axis == 1:
+                    state["on_ground"] = normal > 0
+                    if normal:
+                        state["velocity"] = 0.0
+
+        timestep = FixedTimestep(60)
+        for dt in frames:
+            if fixed:
+                timestep.advance(dt, tick)
+            else:
+                tick(min(dt, 0.1))
+        return state["position"]
+
+    print(f"{'frames':<10}{'variable dt final position':>32}{'fixed 60 Hz final position':>32}")
+    finals = {False: [], True: []}
+    for label, frames in frame_patterns.items():
+        row = []
+        for fixed in (False, True):
+            position = simulate(frames, fixed)
+            finals[fixed].append(position)
+            row.append("({:.3f}, {:.3f}, {:.3f})".format(*position))
+        print(f"{label:<10}{row[0]:>32}{row[1]:>32}")
+    for fixed in (False, True):
+        spread = max(max(p[axis] for p in finals[fixed]) - min(p[axis] for p in finals[fixed]) for axis in range(3))
+        print(f"{'fixed' if fixed else 'variable'} dt: largest difference between frame patterns {spread:.4f} blocks")
+
+
+def legacy_surface_y(get_id, solid, x, z):
+    # 改用高度圖之前 ensure_player_on_surface 的做法: 從世界頂端往下逐格查詢
+    for y in range(WORLD_HEIGHT - 1, -1, -1):
+        if solid[get_id(x, y, z)]:
+            return y
+    return -1
+
+
+def bench_heightmap(radius, seed=1, queries=5000, edits=3000):
+    world = generated_world(radius, seed)
+    world.solid = solid = REGISTRY.solid
+    rng = random.Random(seed)
+    span = radius * CHUNK_SIZE
+    columns = [(rng.randrange(-span, span), rng.randrange(-span, span)) for _ in range(queries)]
+    get_id = world.get_id
+
+    start = time.perf_counter()
+    for chunk in world.chunks.values():
+        chunk.heightmaps(solid)
+    build_time = time.perf_counter() - start
+    legacy_time, legacy = _timed(lambda: [legacy_surface_y(get_id, solid, x, z) for x, z in columns])
+    map_time, mapped = _timed(lambda: [world.surface_y(x, z) for x, z in columns])
+    print(f"{len(world.chunks)} chunks, heightmaps built in {build_time * 1000:.1f} ms "
+          f"({build_time * 1e6 / len(world.chunks):.0f} us/chunk)")
+    print(f"{'method':<10}{'us/query':>10}")
+    print(f"{'scan':<10}{legacy_time * 1e6 / queries:>10.2f}")
+    print(f"{'heightmap':<10}{map_time * 1e6 / queries:>10.2f}")
+    print(f"speedup: x{legacy_time / map_time:.0f}, mismatches: {sum(a != b for a, b in zip(legacy, mapped))}")
+
+    # 在地表放置與破壞方塊，破壞的一半都是最高的那一格，會觸發往下重掃
+    stone = block_id("stone")
+    edit_list = []
+    for _ in range(edits):
+        x, z = rng.randrange(-span, span), rng.randrange(-span, span)
+        top = world.top_y(x, z)
+        edit_list.append((x, top + 1, z, stone) if rng.random() < 0.5 else (x, top, z, 0))
+    start = time.perf_counter()
+    for x, y, z, bid in edit_list:
+        world.set_id(x, y, z, bid)
+    tracked_time = time.perf_counter() - start
+
+    # 逐格更新的結果必須與整塊重算相同
+    wrong = 0
+    for key, chunk in world.chunks.items():
+        expected = Chunk(key[0], key[1], chunk.blocks).heightmaps(solid)
+        wrong += sum(a != b for a, b in zip(chunk.heights[0] + chunk.heights[1], expected[0] + expected[1]))
+    print(f"incremental heightmaps vs full recompute after {edits} edits: {wrong} columns differ")
+
+    for chunk in world.chunks.values():
+        chunk.heights = None
+    start = time.perf_counter()
+    for x, y, z, bid in edit_list:
+        world.set_id(x, y, z, bid)
+    plain_time = time.perf_counter() - start
+    print(f"set_id: {plain_time * 1e6 / edits:.2f} us without heightmaps, "
+          f"{tracked_time * 1e6 / edits:.2f} us with incremental heightmaps")
+
+
+def _lit_world(blocks_by_key, registry):
+    world = ChunkedWorld()
+    world.lighting = LightEngine(world, registry)
+    for key, blocks in blocks_by_key.items():
+        world.ensure_chunk(*key).blocks[:] = blocks
+    start = time.perf_counter()
+    for key in blocks_by_key:
+        world.lighting.light_chunk(*key)
+    return world, time.perf_counter() - start
+
+
+def bench_lighting(radius, seed=1, edits=400):
+    keys = [(cx, cz) for cx in range(-radius, radius + 1) for cz in range(-radius, radius + 1)]
+    world, full_time = _lit_world({key: generate_chunk_blocks(seed, *key).tobytes() for key in keys}, REGISTRY)
+    world.solid = REGISTRY.solid
+    engine = world.lighting
+    print(f"{len(keys)} chunks lit from scratch in {full_time * 1000:.0f} ms ({full_time * 1000 / len(keys):.2f} ms/chunk)")
+
+    rng = random.Random(seed)
+    span = (radius - 1) * CHUNK_SIZE
+    stone, glowstone = block_id("stone"), block_id("glowstone")
+
+    def surface():
+        x, z = rng.randrange(-span, span), rng.randrange(-span, span)
+        return x, world.top_y(x, z), z
+
+    def underground():
+        # 挖開地下的格子，碰到洞穴時光會灌進去
+        x, top, z = surface()
+        return x, rng.randrange(1, max(2, top)), z
+
+    placed = []
+
+    def glow():
+        x, y, z = surface()
+        placed.append((x, y + 1, z))
+        return x, y + 1, z, glowstone
+
+    cases = (
+        ("place on surface", lambda: (lambda x, y, z: (x, y + 1, z, stone))(*surface())),
+        ("break surface", lambda: surface() + (0,)),
+        ("dig underground", lambda: underground() + (0,)),
+        ("place glowstone", glow),
+        ("remove glowstone", lambda: placed.pop() + (0,)),
+    )
+    print(f"{'edit':<18}{'mean (ms)':>11}{'max (ms)':>10}{'cells/edit':>12}{'chunks remeshed':>17}")
+    for label, make_edit in cases:
+        times, cells, remeshed = [], 0, 0
+        for _ in range(edits // len(cases)):
+            x, y, z, bid = make_edit()
+            world.take_dirty_meshes()
+            before = engine.cells_updated
+            start = time.perf_counter()
+            world.set_id(x, y, z, bid)
+            times.append(time.perf_counter() - start)
+            cells += engine.cells_updated - before
+            remeshed += len(world.take_dirty_meshes())
+        n = len(times)
+        print(f"{label:<18}{sum(times) * 1000 / n:>11.3f}{max(times) * 1000:>10.2f}{cells / n:>12.0f}{remeshed / n:>17.1f}")
+
+    # 增量更新的結果必須與整個世界重新計算相同
+    fresh, _ = _lit_world({key: bytes(chunk.blocks) for key, chunk in world.chunks.items()}, REGISTRY)
+    differ = sum(sum(a != b for a, b in zip(chunk.light, fresh.get_chunk(*key).light)) for key, chunk in world.chunks.items())
+    print(f"incremental vs full relight after {edits} edits: {differ} cells differ "
+          f"(a full relight costs {full_time * 1000:.0f} ms per edit)")
+
+
+def bench_ambient_occlusion(radius, seed=1):
+    keys = [(cx, cz) for cx in range(-radius, radius + 1) for cz in range(-radius, radius + 1)]
+    world, _ = _lit_world({key: generate_chunk_blocks(seed, *key).tobytes() for key in keys}, REGISTRY)
+    # 最外圈的區塊缺鄰居，只量裡面的
+    chunks = [world.get_chunk(cx, cz) for cx, cz in keys if max(abs(cx), abs(cz)) < radius]
+
+    def mesh_all(mesher, ambient_occlusion):
+        return [mesher(world, chunk, REGISTRY, ambient_occlusion) for chunk in chunks]
+
+    def quads(meshes):
+        return sum(np.size(v) // 12 for m in meshes for v, _, _ in m.values())
+
+    python_meshes = mesh_all(chunk_mesher.mesh_chunk_python, True)
+    print(f"world: {len(chunks)} chunks, {quads(python_meshes)} quads")
+    assert mesh_all(chunk_mesher.mesh_chunk_numpy, True) == python_meshes, "numpy 版本的遮蔽與純 Python 版本不同"
+    # 四個頂點顏色不一樣的面才看得出遮蔽
+    shaded = sum(len(set(c[i] for i in (0, 3, 6, 9))) > 1 for m in python_meshes for _, _, colors in m.values()
+                 for c in zip(*(iter(colors),) * 12))
+    print(f"faces with per-vertex shading: {shaded} ({shaded * 100 / quads(python_meshes):.0f}%)")
+    print(f"{'mesher':<8}{'no AO (ms/chunk)':>18}{'AO (ms/chunk)':>15}{'slowdown':>10}{'quads no AO':>13}{'quads AO':>10}")
+    for label, mesher in (("numpy", chunk_mesher.mesh_chunk_arrays), ("greedy", chunk_mesher.mesh_chunk_greedy)):
+        plain_time, plain = _timed(mesh_all, mesher, False)
+        ao_time, occluded = _timed(mesh_all, mesher, True)
+        print(f"{label:<8}{plain_time * 1000 / len(chunks):>18.2f}{ao_time * 1000 / len(chunks):>15.2f}"
+              f"{(ao_time / plain_time - 1) * 100:>9.0f}%{quads(plain):>13}{quads(occluded):>10}")
+
+
+BENCHMARKS = {
+    "world_format": bench_world_format,
+    "autosave": bench_autosave,
+    "lazy_load": bench_lazy_load,
+    "mesher": bench_mesher,
+    "worldgen": bench_worldgen,
+    "noise": bench_noise,
+    "caves": bench_caves,
+    "trees": bench_trees,
+    "shared_memory": bench_shared_memory,
+    "raycast": bench_raycast,
+    "physics": bench_physics,
+    "timestep": bench_timestep,
+    "heightmap": bench_heightmap,
+    "lighting": bench_lighting,
+    "ambient_occlusion": bench_ambient_occlusion,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minecraft Py 效能測試")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--radius", type=int, default=4, help="測試世界的區塊半徑 (預設 4，即 9x9 區塊)")
+    args = parser.parse_args(argv)
+    load_block_registry(os.path.join(MAIN_SCRIPT_DIR, "assets", "blocks.json"))
+    BENCHMARKS[args.benchmark](args.radius)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import json
+import logging
+
+from world_storage import AIR, block_id
+
+MAX_BLOCK_IDS = 256
+DEFAULT_TEXTURE = "stone"
+DEFAULT_BREAK_TIME = 3.0
+
+# 順序與 Game.get_block_face_vertices 的 face_index 相同:
+# 0 右(+x) 1 左(-x) 2 上 3 下 4 後(+z) 5 前(-z)
+FACE_NAMES = ("east", "west", "top", "bottom", "south", "north")
+SIDE_FACES = (0, 1, 4, 5)
+
+
+class BlockRegistry:
+    """由方塊定義檔編譯出的查表資料。
+
+    所有表格都以方塊 ID 為索引 (面相關的表為 ID * 6 + face_index)，
+    熱迴圈只需做陣列索引，不需要字串比較。
+    """
+
+    def __init__(self):
+        self.definitions = {}
+        self.texture_files = {}
+        self.solid = [True] * MAX_BLOCK_IDS
+        self.transparent = [False] * MAX_BLOCK_IDS
+        self.blend = [False] * MAX_BLOCK_IDS
+        self.break_time = [DEFAULT_BREAK_TIME] * MAX_BLOCK_IDS
+        self.icon_texture = [None] * MAX_BLOCK_IDS
+        self.face_texture = [DEFAULT_TEXTURE] * (MAX_BLOCK_IDS * 6)
+        self.random_rotation = [False] * (MAX_BLOCK_IDS * 6)
+        # greedy meshing: 是否可以合併相鄰的面、合併時是否保留隨機旋轉
+        self.greedy = [True] * MAX_BLOCK_IDS
+        self.greedy_keep_rotation = [True] * MAX_BLOCK_IDS
+        # 準星射線會不會停在這個方塊上 (可以挖、可以對著放方塊)
+        self.targetable = [True] * MAX_BLOCK_IDS
+        # 光照 (lighting.LightEngine): 光穿過時減少的等級 (15 = 完全擋住) 與方塊自己發出的光
+        self.light_opacity = [15] * MAX_BLOCK_IDS
+        self.light_emission = [0] * MAX_BLOCK_IDS
+        self.solid[AIR] = False
+        self.transparent[AIR] = True
+        self.targetable[AIR] = False
+        self.light_opacity[AIR] = 0
+
+    def load(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.texture_files.update(data.get("textures", {}))
+        for definition in data.get("blocks", []):
+            self.register(definition)
+        logging.info(f"Loaded {len(self.definitions)} block definitions from {path}.")
+        return self
+
+    def register(self, definition):
+        name = definition["name"]
+        bid = block_id(name)
+        self.definitions[name] = definition
+        self.solid[bid] = definition.get("solid", True)
+        self.transparent[bid] = definition.get("transparent", False)
+        self.blend[bid] = definition.get("blend", False)
+        self.break_time[bid] = definition.get("break_time", DEFAULT_BREAK_TIME)
+        self.greedy[bid] = definition.get("greedy", True)
+        self.targetable[bid] = definition.get("targetable", bid != AIR)
+        self.light_opacity[bid] = definition.get("light_opacity", 0 if self.transparent[bid] else 15)
+        self.light_emission[bid] = definition.get("light", 0)
+        # "drop": greedy 模式下不做隨機旋轉，整片地形才能合併成大四邊形
+        self.greedy_keep_rotation[bid] = definition.get("greedy_rotation", "keep") != "drop"
+
+        textures = definition.get("textures", {})
+        all_faces = textures.get("all", DEFAULT_TEXTURE)
+        side = textures.get("side", all_faces)
+        for face_index, face_name in enumerate(FACE_NAMES):
+            fallback = side if face_index in SIDE_FACES else all_faces
+            self.face_texture[bid * 6 + face_index] = textures.get(face_name, fallback)
+        self.icon_texture[bid] = definition.get("icon", textures.get("all"))
+
+        rotation = definition.get("random_rotation")
+        for face_index in range(6):
+            self.random_rotation[bid * 6 + face_index] = rotation == "all" or (rotation == "top" and face_index == 2)
+        return bid
+
+    def face_textures(self, bid):
+        return self.face_texture[bid * 6:bid * 6 + 6]
+
+    def block_names(self):
+        return [name for name in self.definitions if name != "air"]
+
+
+REGISTRY = BlockRegistry()
+
+
+def load_block_registry(path):
+    try:
+        REGISTRY.load(path)
+    except FileNotFoundError:
+        logging.error(f"方塊定義檔 {path} 未找到，所有方塊將使用預設屬性。")
+    except (json.JSONDecodeError, KeyError, ValueError) as e:
+        logging.error(f"讀取方塊定義檔 {path} 失敗: {e}", exc_info=True)
+    return REGISTRY
@@ -0,0 +1,461 @@
+import numpy as np
+
+from world_storage import CHUNK_SIZE, WORLD_HEIGHT, FULL_SKY
+from lighting import LIGHT_COLORS
+
+# 與 Game.get_block_face_vertices 相同的面頂點 (scale 1.0, 無偏移):
+# 0 右(+x) 1 左(-x) 2 上 3 下 4 後(+z) 5 前(-z)
+_CUBE_CORNERS = (
+    (0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.0, 1.0, 0.0),
+    (0.0, 0.0, 1.0), (1.0, 0.0, 1.0), (1.0, 1.0, 1.0), (0.0, 1.0, 1.0),
+)
+_FACE_CORNERS = ((1, 5, 6, 2), (4, 0, 3, 7), (3, 2, 6, 7), (4, 5, 1, 0), (4, 5, 6, 7), (1, 0, 3, 2))
+FACE_OFFSETS = tuple(tuple(c for corner in corners for c in _CUBE_CORNERS[corner]) for corners in _FACE_CORNERS)
+
+# 貼圖旋轉 0~3 (順時針 0/90/180/270 度) 對應的紋理座標 (BL, BR, TR, TL 循環移動)
+_BASE_TEX_COORDS = ((0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0))
+ROTATED_TEX_COORDS = tuple(tuple(c for point in _BASE_TEX_COORDS[r:] + _BASE_TEX_COORDS[:r] for c in point)
+                           for r in range(4))
+
+
+# 鄰居在 [y][z][x] 中的位移 (dy, dz, dx)，順序同 face_index
+_NEIGHBOR_SHIFTS = ((0, 0, 1), (0, 0, -1), (1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0))
+
+
+def _ao_offsets(face_index):
+    # 面的每個頂點: 面前方那一層裡貼著頂點的 (側邊格, 另一個側邊格, 角落格)，位移為 (dy, dz, dx)
+    normal = _NEIGHBOR_SHIFTS[face_index]
+    tangents = [axis for axis in range(3) if not normal[axis]]
+    vertices = []
+    for corner in _FACE_CORNERS[face_index]:
+        x, y, z = _CUBE_CORNERS[corner]
+        signs = (1 if y else -1, 1 if z else -1, 1 if x else -1)
+        cells = []
+        for axes in ((tangents[0],), (tangents[1],), tangents):
+            offset = list(normal)
+            for axis in axes:
+                offset[axis] += signs[axis]
+            cells.append(tuple(offset))
+        vertices.append(tuple(cells))
+    return tuple(vertices)
+
+
+# 環境光遮蔽 (ambient occlusion): [face_index][頂點][側邊, 側邊, 角落] 的位移
+AO_NEIGHBORS = tuple(_ao_offsets(face_index) for face_index in range(6))
+# 遮蔽等級 0~3 (3 = 沒有遮蔽) 的亮度倍率，與光照顏色相乘後的結果以 AO 等級 * 256 + 光照 byte 為索引
+AO_BRIGHTNESS = (0.5, 0.65, 0.8, 1.0)
+AO_COLORS = tuple(round(color * factor) for factor in AO_BRIGHTNESS for color in LIGHT_COLORS)
+
+
+def vertex_ao(side1, side2, corner):
+    # 兩個側邊都擋住時角落看不到，直接是最暗
+    if side1 and side2:
+        return 0
+    return 3 - side1 - side2 - corner
+
+
+def face_rotation(x, y, z):
+    # 依座標算出固定的隨機旋轉，同一個位置的方塊旋轉角度永遠相同
+    return (x * 521 + y * 97 + z * 643) % 4
+
+
+def mesh_chunk_python(world, chunk, registry, ambient_occlusion=True):
+    """產生單一區塊的可見面，回傳 {貼圖名稱: (頂點 v3f 串列, 紋理座標 t2f 串列, 頂點顏色 c3B 串列)}。
+
+    頂點顏色是面朝向的那一格的光照 (lighting.LIGHT_COLORS) 乘上頂點的遮蔽 (AO_COLORS)。
+    四個頂點的遮蔽不平均時，四邊形從第二個頂點開始排，讓 GL_QUADS 沿著較亮的對角線切成三角形。
+    """
+    get_id = world.get_id
+    get_light = world.get_light
+    transparent = registry.transparent
+    face_texture = registry.face_texture
+    random_rotation = registry.random_rotation
+    blocks = chunk.blocks
+    light = chunk.light if chunk.light is not None else bytes([FULL_SKY]) * len(blocks)
+    base_x, base_z = chunk.cx * CHUNK_SIZE, chunk.cz * CHUNK_SIZE
+    meshes = {}
+
+    def occludes(lx, y, lz):
+        # 區塊內讀陣列，邊界外才查詢世界
+        if 0 <= lx < CHUNK_SIZE and 0 <= lz < CHUNK_SIZE and 0 <= y < WORLD_HEIGHT:
+            return not transparent[blocks[(y << 8) | (lz << 4) | lx]]
+        return not transparent[get_id(base_x + lx, y, base_z + lz)]
+
+    for i in range(len(blocks.rstrip(b"\x00"))):
+        bid = blocks[i]
+        if not bid:
+            continue
+        lx, lz, y = i & 15, (i >> 4) & 15, i >> 8
+        x, z = base_x + lx, base_z + lz
+        is_transparent_block = transparent[bid]
+
+        # 區塊內的鄰居直接讀陣列，只有邊界才查詢鄰近區塊
+        neighbor_ids = (
+            blocks[i + 1] if lx < 15 else get_id(x + 1, y, z),
+            blocks[i - 1] if lx > 0 else get_id(x - 1, y, z),
+            blocks[i + 256] if y < WORLD_HEIGHT - 1 else 0,
+            blocks[i - 256] if y > 0 else 0,
+            blocks[i + 16] if lz < 15 else get_id(x, y, z + 1),
+            blocks[i - 16] if lz > 0 else get_id(x, y, z - 1),
+        )
+
+        for face_index, neighbor_id in enumerate(neighbor_ids):
+            if neighbor_id and not (is_transparent_block and neighbor_id != bid) \
+                    and not (not is_transparent_block and transparent[neighbor_id]):
+                continue
+            face_slot = bid * 6 + face_index
+            mesh = meshes.get(face_texture[face_slot])
+            if mesh is None:
+                mesh = meshes[face_texture[face_slot]] = ([], [], [])
+            o = FACE_OFFSETS[face_index]
+            vertices = [x + o[0], y + o[1], z + o[2], x + o[3], y + o[4], z + o[5],
+                        x + o[6], y + o[7], z + o[8], x + o[9], y + o[10], z + o[11]]
+            tex_coords = list(ROTATED_TEX_COORDS[face_rotation(x, y, z) if random_rotation[face_slot] else 0])
+            face_light = _face_light(light, get_light, i, x, y, z, lx, lz, face_index)
+            if ambient_occlusion:
+                ao = [vertex_ao(*(occludes(lx + dx, y + dy, lz + dz) for dy, dz, dx in cells))
+                      for cells in AO_NEIGHBORS[face_index]]
+            else:
+                ao = [3, 3, 3, 3]
+            colors = [AO_COLORS[(level << 8) | face_light] for level in ao for _ in range(3)]
+            if ao[0] + ao[2] < ao[1] + ao[3]:
+                vertices, tex_coords, colors = vertices[3:] + vertices[:3], tex_coords[2:] + tex_coords[:2], colors[3:] + colors[:3]
+            mesh[0].extend(vertices)
+            mesh[1].extend(tex_coords)
+            mesh[2].extend(colors)
+    return meshes
+
+
+def _face_light(light, get_light, i, x, y, z, lx, lz, face_index):
+    # 面朝向的那一格的光照，區塊內讀陣列，邊界外查詢世界
+    if face_index == 0:
+        return light[i + 1] if lx < 15 else get_light(x + 1, y, z)
+    if face_index == 1:
+        return light[i - 1] if lx > 0 else get_light(x - 1, y, z)
+    if face_index == 2:
+        return light[i + 256] if y < WORLD_HEIGHT - 1 else FULL_SKY
+    if face_index == 3:
+        return light[i - 256] if y > 0 else FULL_SKY
+    if face_index == 4:
+        return light[i + 16] if lz < 15 else get_light(x, y, z + 1)
+    return light[i - 16] if lz > 0 else get_light(x, y, z - 1)
+
+
+# --- numpy 向量化版本 ---
+# 輸出與 mesh_chunk_python 完全相同 (同樣的面、同樣的順序)，只是整個區塊一次計算。
+
+_registry_tables = {}
+# 加了外圍的陣列攤平後 (dy, dz, dx) 位移對應的索引差，鄰格與遮蔽格都用一次一維取值
+_PADDED_STRIDES = np.array(((CHUNK_SIZE + 2) ** 2, CHUNK_SIZE + 2, 1))
+_FACE_STEPS = np.array(_NEIGHBOR_SHIFTS) @ _PADDED_STRIDES
+_AO_STEPS = np.array(AO_NEIGHBORS) @ _PADDED_STRIDES
+# (側邊, 側邊 << 1, 角落 << 2) 三個遮擋位元 -> 遮蔽等級
+_AO_LEVELS = np.array([vertex_ao(bits & 1, bits >> 1 & 1, bits >> 2) for bits in range(8)], dtype=np.int32)
+_AO_COLORS = np.array(AO_COLORS, dtype=np.uint8)
+# 翻轉對角線的四邊形從第 1 個頂點開始畫: 頂點表索引為 翻轉 * 6 + 面，紋理座標等於多轉一格
+_FACE_OFFSETS = np.array(FACE_OFFSETS + tuple(offsets[3:] + offsets[:3] for offsets in FACE_OFFSETS))
+_ROTATED_TEX_COORDS = np.array(ROTATED_TEX_COORDS, dtype=np.float32)
+
+
+def _lookup_tables(registry):
+    # 方塊表格只在讀取定義檔時改變，以定義數量判斷是否需要重建
+    cached = _registry_tables.get(id(registry))
+    if cached is not None and cached[0] == len(registry.definitions):
+        return cached[1]
+    texture_names = sorted(set(registry.face_texture))
+    texture_index = {name: i for i, name in enumerate(texture_names)}
+    tables = (
+        np.array(registry.transparent, dtype=bool),
+        np.array([texture_index[name] for name in registry.face_texture], dtype=np.int32),
+        np.array(registry.random_rotation, dtype=bool),
+        texture_names,
+        np.array(registry.greedy, dtype=bool),
+        np.array(registry.greedy_keep_rotation, dtype=bool),
+    )
+    _registry_tables[id(registry)] = (len(registry.definitions), tables)
+    return tables
+
+
+def _chunk_array(chunk, name, fill):
+    data = getattr(chunk, name)
+    if data is None:
+        return np.full((WORLD_HEIGHT, CHUNK_SIZE, CHUNK_SIZE), fill, dtype=np.uint8)
+    return np.frombuffer(data, dtype=np.uint8).reshape(WORLD_HEIGHT, CHUNK_SIZE, CHUNK_SIZE)
+
+
+def _padded(world, chunk, height, name="blocks", fill=0):
+    """回傳 (height + 2, 18, 18) 的區塊陣列 ("blocks" 或 "light")，外圍一圈是周圍區塊的邊界與上下各一層。
+
+    世界外、不存在的區塊 (以及還沒計算的光照) 填 fill。
+    """
+    padded = np.full((height + 2, CHUNK_SIZE + 2, CHUNK_SIZE + 2), fill, dtype=np.uint8)
+    top = min(height + 1, WORLD_HEIGHT)
+    padded[1:top + 1, 1:-1, 1:-1] = _chunk_array(chunk, name, fill)[:top]
+    cx, cz = chunk.cx, chunk.cz
+    for (dx, dz), src, dst in (
+            ((1, 0), (slice(None), 0), (slice(1, -1), -1)),
+            ((-1, 0), (slice(None), -1), (slice(1, -1), 0)),
+            ((0, 1), (0, slice(None)), (-1, slice(1, -1))),
+            ((0, -1), (-1, slice(None)), (0, slice(1, -1))),
+            # 斜對角區塊只用到貼著角落的那一柱 (環境光遮蔽)
+            ((1, 1), (0, 0), (-1, -1)),
+            ((1, -1), (-1, 0), (0, -1)),
+            ((-1, 1), (0, -1), (-1, 0)),
+            ((-1, -1), (-1, -1), (0, 0))):
+        neighbor = world.get_chunk(cx + dx, cz + dz)
+        if neighbor is not None:
+            padded[(slice(1, top + 1),) + dst] = _chunk_array(neighbor, name, fill)[(slice(None, top),) + src]
+    return padded
+
+
+def _visible_faces(world, chunk, transparent):
+    """回傳 (區塊方塊 ID [y][z][x], 六個面各自的可見遮罩, 加了外圍的光照, 加了外圍的遮蔽格)，
+    整個區塊是空氣時回傳 None。"""
+    center = np.frombuffer(chunk.blocks, dtype=np.uint8).reshape(WORLD_HEIGHT, CHUNK_SIZE, CHUNK_SIZE)
+    # 只處理到最高的非空氣層
+    layers = np.flatnonzero(center.reshape(WORLD_HEIGHT, -1).any(axis=1))
+    if not layers.size:
+        return None
+    height = int(layers[-1]) + 1
+    padded = _padded(world, chunk, height)
+    ids = padded[1:-1, 1:-1, 1:-1]
+    solid_mask = ids != 0
+    block_transparent = transparent[ids]
+
+    masks = []
+    for dy, dz, dx in _NEIGHBOR_SHIFTS:
+        neighbor = padded[1 + dy:height + 1 + dy, 1 + dz:CHUNK_SIZE + 1 + dz, 1 + dx:CHUNK_SIZE + 1 + dx]
+        masks.append(solid_mask & ((neighbor == 0)
+                                   | (block_transparent & (neighbor != ids))
+                                   | (~block_transparent & transparent[neighbor])))
+    return ids, masks, _padded(world, chunk, height, "light", FULL_SKY), ~transparent[padded]
+
+
+def _quad_arrays(chunk, ids, light, occluders, order, face_texture, random_rotation, ambient_occlusion):
+    """order: 排序好的 方塊索引 * 6 + 面。回傳 (貼圖索引, 頂點, 紋理座標, 顏色)，每列一個單格四邊形。"""
+    index, face = order // 6, order % 6
+    bid = ids.reshape(-1)[index].astype(np.int32)
+    face_slot = bid * 6 + face
+    y = index >> 8
+    x = chunk.cx * CHUNK_SIZE + (index & 15)
+    z = chunk.cz * CHUNK_SIZE + ((index >> 4) & 15)
+
+    rotation = np.where(random_rotation[face_slot], (x * 521 + y * 97 + z * 643) % 4, 0)
+    # 方塊在加了外圍的陣列裡的一維索引
+    center = (y + 1) * _PADDED_STRIDES[0] + (((index >> 4) & 15) + 1) * _PADDED_STRIDES[1] + (index & 15) + 1
+    face_light = light.reshape(-1)[center + _FACE_STEPS[face]].astype(np.int32)
+    if ambient_occlusion:
+        # (四邊形數, 4 頂點, 3 格) 一次取出，三個遮擋位元查表得到遮蔽等級
+        occluded = occluders.reshape(-1).view(np.uint8)[center[:, None, None] + _AO_STEPS[face]]
+        ao = _AO_LEVELS[occluded[..., 0] | occluded[..., 1] << 1 | occluded[..., 2] << 2]
+    else:
+        ao = np.full((order.size, 4), 3, dtype=np.int32)
+    flip = ao[:, 0] + ao[:, 2] < ao[:, 1] + ao[:, 3]
+    if ambient_occlusion:
+        ao = np.where(flip[:, None], ao[:, (1, 2, 3, 0)], ao)
+    vertices = (_FACE_OFFSETS[flip * 6 + face] + np.tile(np.stack((x, y, z), axis=1), 4)).astype(np.float32)
+    tex_coords = _ROTATED_TEX_COORDS[(rotation + flip) % 4]
+    colors = np.repeat(_AO_COLORS[(ao << 8) | face_light[:, None]], 3, axis=1)
+    return face_texture[face_slot], vertices, tex_coords, colors
+
+
+def mesh_chunk_arrays(world, chunk, registry, ambient_occlusion=True):
+    """mesh_chunk_numpy 的陣列版: 值是 ((四邊形數, 12) 頂點, (四邊形數, 8) 紋理座標, (四邊形數, 12) 顏色)，
+    頂點與紋理座標為 float32，顏色為 uint8。"""
+    transparent, face_texture, random_rotation, texture_names = _lookup_tables(registry)[:4]
+    visible = _visible_faces(world, chunk, transparent)
+    if visible is None:
+        return {}
+    ids, masks, light, occluders = visible
+    faces = [np.flatnonzero(mask) * 6 + face_index for face_index, mask in enumerate(masks)]
+    # 依 (方塊索引, 面) 排序，與逐格掃描的順序一致
+    order = np.sort(np.concatenate(faces))
+    if not order.size:
+        return {}
+    textures, vertices, tex_coords, colors = _quad_arrays(chunk, ids, light, occluders, order, face_texture,
+                                                          random_rotation, ambient_occlusion)
+
+    meshes = {}
+    # 依貼圖第一次出現的順序分組，與純 Python 版的 dict 順序相同
+    _, first = np.unique(textures, return_index=True)
+    for texture in textures[np.sort(first)]:
+        selected = textures == texture
+        meshes[texture_names[texture]] = (vertices[selected], tex_coords[selected], colors[selected])
+    return meshes
+
+
+def mesh_chunk_numpy(world, chunk, registry, ambient_occlusion=True):
+    """向量化的 mesh_chunk_python，回傳格式相同 (串列)。
+
+    遊戲裡的網格池會換成 mesh_chunk_arrays (見 ARRAY_MESHERS)，這個串列版給效能測試與比對用。
+    """
+    return {texture: (v.ravel().tolist(), tc.ravel().tolist(), c.ravel().tolist())
+            for texture, (v, tc, c) in mesh_chunk_arrays(world, chunk, registry, ambient_occlusion).items()}
+
+
+# --- greedy meshing ---
+# 同一平面上相鄰、貼圖與旋轉都相同的面合併成一個大四邊形，紋理座標超過 1 讓貼圖重複 (GL_REPEAT)。
+# 每個面在 [平面][v][u] 排列下的 (轉置軸順序, u 軸反向, v 軸反向)，
+# u / v 是 FACE_OFFSETS 第 0 個頂點往第 1 / 第 3 個頂點的方向。
+_GREEDY_LAYOUTS = (
+    ((2, 0, 1), False, False),  # +x: 平面 x, u = +z, v = +y
+    ((2, 0, 1), True, False),   # -x: 平面 x, u = -z, v = +y
+    ((0, 1, 2), False, False),  # 上: 平面 y, u = +x, v = +z
+    ((0, 1, 2), False, True),   # 下: 平面 y, u = +x, v = -z
+    ((1, 0, 2), False, False),  # +z: 平面 z, u = +x, v = +y
+    ((1, 0, 2), True, False),   # -z: 平面 z, u = -x, v = +y
+)
+_FACE_AXES = tuple(((o[3] - o[0], o[4] - o[1], o[5] - o[2]), (o[9] - o[0], o[10] - o[1], o[11] - o[2]))
+                   for o in FACE_OFFSETS)
+# 四個頂點的遮擋位元 (每個 3 位元，頂點 0 在最低位) -> 四個遮蔽等級 (每個 2 位元)
+_AO_CORNERS = np.array([sum(int(_AO_LEVELS[bits >> 3 * corner & 7]) << 2 * corner for corner in range(4))
+                        for bits in range(1 << 12)], dtype=np.int64)
+
+
+def _merge_kind(corners):
+    # 0: 四個頂點相同；1: 沿 u 不變 (只跟同一列合併)；2: 沿 v 不變 (只跟同一行合併)；3: 不合併
+    a0, a1, a2, a3 = (corners >> 2 * corner & 3 for corner in range(4))
+    return (a0 != a1 or a3 != a2) * 2 + (a0 != a3 or a1 != a2)
+
+
+_AO_MERGE_KIND = np.array([_merge_kind(corners) for corners in range(256)], dtype=np.int64)
+_quad_colors = {}
+
+
+def _greedy_colors(corners, light_byte):
+    # 同一組 (遮蔽, 光照) 的 12 個顏色值會重複出現很多次，查一次就記住
+    key = corners << 8 | light_byte
+    colors = _quad_colors.get(key)
+    if colors is None:
+        colors = _quad_colors[key] = [AO_COLORS[(corners >> 2 * corner & 3) << 8 | light_byte] for corner in range(4) for _ in range(3)]
+    return colors
+
+
+def _greedy_tex_coords(rotation, w, h):
+    # 旋轉後的貼圖在 w x h 的四邊形上重複，w = h = 1 時與 ROTATED_TEX_COORDS 相同
+    if rotation == 0:
+        return (0.0, 0.0, w, 0.0, w, h, 0.0, h)
+    if rotation == 1:
+        return (h, 0.0, h, w, 0.0, w, 0.0, 0.0)
+    if rotation == 2:
+        return (w, h, 0.0, h, 0.0, 0.0, w, 0.0)
+    return (0.0, w, 0.0, 0.0, h, 0.0, h, w)
+
+
+def _greedy_rectangles(grid):
+    """grid: [v][u] 的合併鍵 (0 表示沒有面)，會被改寫。產生 (v, u, 高, 寬, 鍵)。"""
+    rows, cols = len(grid), len(grid[0])
+    for v in range(rows):
+        row = grid[v]
+        for u in range(cols):
+            key = row[u]
+            if not key:
+                continue
+            w = 1
+            while u + w < cols and row[u + w] == key:
+                w += 1
+            h = 1
+            while v + h < rows and grid[v + h][u:u + w] == [key] * w:
+                h += 1
+            for dv in range(h):
+                grid[v + dv][u:u + w] = [0] * w
+            yield v, u, h, w, key
+
+
+def mesh_chunk_greedy(world, chunk, registry, ambient_occlusion=True):
+    """合併共平面的面，回傳格式同 mesh_chunk_python (四邊形數量較少)。
+
+    只合併光照與四個頂點遮蔽都相同的面；頂點遮蔽有變化時只沿著顏色不變的方向合併，
+    大四邊形內插出來的顏色才會跟逐格畫的一樣。
+    """
+    transparent, face_texture, random_rotation, texture_names, greedy, keep_rotation = _lookup_tables(registry)
+    visible = _visible_faces(world, chunk, transparent)
+    if visible is None:
+        return {}
+    ids, masks, light, occluders = visible
+    blocked = occluders.astype(np.uint16)
+    height = ids.shape[0]
+    base_x, base_z = chunk.cx * CHUNK_SIZE, chunk.cz * CHUNK_SIZE
+    y, z, x = np.meshgrid(np.arange(height), np.arange(base_z, base_z + CHUNK_SIZE),
+                          np.arange(base_x, base_x + CHUNK_SIZE), indexing="ij")
+    block_rotation = (x * 521 + y * 97 + z * 643) % 4
+    cell = np.indices(ids.shape)
+    mergeable = greedy[ids]
+    meshes = {}
+    single_faces = []
+
+    for face_index, mask in enumerate(masks):
+        face_slot = ids.astype(np.int32) * 6 + face_index
+        rotation = np.where(random_rotation[face_slot] & keep_rotation[ids], block_rotation, 0)
+        dy, dz, dx = _NEIGHBOR_SHIFTS[face_index]
+        face_light = light[1 + dy:height + 1 + dy, 1 + dz:CHUNK_SIZE + 1 + dz, 1 + dx:CHUNK_SIZE + 1 + dx]
+        axes, flip_u, flip_v = _GREEDY_LAYOUTS[face_index]
+        if ambient_occlusion:
+            # 每個 (側邊, 側邊, 角落) 都是加了外圍的陣列的一個切片，四個頂點的 12 個遮擋位元一次查表
+            occlusion = 0
+            for vertex in reversed(AO_NEIGHBORS[face_index]):
+                side1, side2, diagonal = (blocked[1 + ay:height + 1 + ay, 1 + az:CHUNK_SIZE + 1 + az, 1 + ax:CHUNK_SIZE + 1 + ax]
+                                          for ay, az, ax in vertex)
+                occlusion = occlusion << 3 | (side1 | side2 << 1 | diagonal << 2)
+            corners = _AO_CORNERS[occlusion]
+            kind = _AO_MERGE_KIND[corners]
+            # 頂點 0..3 = (u0, v0) (u1, v0) (u1, v1) (u0, v1)。遮蔽沿某個方向有變化的面只沿另一個方向合併 (鍵裡加上列/行)，
+            # 大四邊形內插出來的顏色才會跟逐格畫的一樣
+            lane = np.choose(kind, (0, cell[axes[1]] + 1, cell[axes[2]] + 1, 0))
+            singles = mask & ~(mergeable & (kind < 3))
+        else:
+            corners, lane, singles = 255, 0, mask & ~mergeable
+        # 不合併的方塊與遮蔽兩個方向都有變化的面最後跟 mesh_chunk_arrays 一樣整批產生
+        single_faces.append(np.flatnonzero(singles) * 6 + face_index)
+        # 合併鍵 = ((((貼圖 * 4 + 旋轉) * 256 + 光照) * 256 + 四個頂點的遮蔽) * 256 + 列/行) + 1
+        keys = np.where(mask & ~singles, (((((face_texture[face_slot] * 4 + rotation) << 8 | face_light) << 8 | corners) << 8) | lane) + 1, 0)
+        grid = keys.transpose(axes)
+        if flip_u:
+            grid = grid[:, :, ::-1]
+        if flip_v:
+            grid = grid[:, ::-1, :]
+        (ux, uy, uz), (vx, vy, vz) = _FACE_AXES[face_index]
+        o = FACE_OFFSETS[face_index]
+
+        for plane in np.flatnonzero(grid.reshape(grid.shape[0], -1).any(axis=1)):
+            plane_grid = grid[plane]
+            n_v, n_u = plane_grid.shape
+            for v, u, h, w, key in _greedy_rectangles(plane_grid.tolist()):
+                # 換回區塊內座標 [y][z][x]
+                local = [0, 0, 0]
+                local[axes[0]] = plane
+                local[axes[1]] = n_v - 1 - v if flip_v else v
+                local[axes[2]] = n_u - 1 - u if flip_u else u
+                ly, lz, lx = local
+                # 能合併的面兩條對角線的遮蔽和一定相同，不用翻轉
+                key = (key - 1) >> 8
+                texture, block_rot = key >> 18, (key >> 16) & 3
+                x0, y0, z0 = base_x + lx + o[0], ly + o[1], base_z + lz + o[2]
+                x1, y1, z1 = x0 + ux * w, y0 + uy * w, z0 + uz * w
+                mesh = meshes.get(texture_names[texture])
+                if mesh is None:
+                    mesh = meshes[texture_names[texture]] = ([], [], [])
+                mesh[0].extend((x0, y0, z0, x1, y1, z1,
+                                x1 + vx * h, y1 + vy * h, z1 + vz * h, x0 + vx * h, y0 + vy * h, z0 + vz * h))
+                mesh[1].extend(_greedy_tex_coords(block_rot, float(w), float(h)))
+                mesh[2].extend(_greedy_colors(key & 255, (key >> 8) & 255))
+
+    order = np.sort(np.concatenate(single_faces))
+    if order.size:
+        # 不保留旋轉的方塊單格畫時也不轉，跟合併時一樣
+        textures, vertices, tex_coords, colors = _quad_arrays(chunk, ids, light, occluders, order, face_texture,
+                                                              random_rotation & np.repeat(keep_rotation, 6), ambient_occlusion)
+        for texture in np.unique(textures):
+            selected = textures == texture
+            mesh = meshes.get(texture_names[texture])
+            if mesh is None:
+                mesh = meshes[texture_names[texture]] = ([], [], [])
+            mesh[0].extend(vertices[selected].ravel().tolist())
+            mesh[1].extend(tex_coords[selected].ravel().tolist())
+            mesh[2].extend(colors[selected].ravel().tolist())
+    return meshes
+
+
+mesh_chunk = mesh_chunk_numpy
+# 網格池 (執行緒與工作行程) 實際執行的陣列版，不需要先轉成串列
+ARRAY_MESHERS = {mesh_chunk_numpy: mesh_chunk_arrays}
@@ -0,0 +1,240 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from world_storage import ChunkedWorld, Chunk, BLOCK_NAMES, CHUNK_VOLUME, FULL_SKY, MESH_NEIGHBORHOOD, block_id
+from shared_slabs import SlabRing
+from worldgen import generate_chunk_blocks, _ignore_interrupt
+import chunk_mesher
+
+# 工作行程模式的共享記憶體 (只給網格用): 槽的前面放區塊與周圍八個區塊的方塊和光照，後面放頂點。
+# 生成的區塊只有 32 KB，pickle 傳回比搶槽、等槽還快，不經過共享記憶體，只限制同時送出的數量
+GENERATE_IN_FLIGHT = 32
+MESH_SLOTS = 16
+MESH_SLOT_SIZE = 2 * 1024 * 1024
+MESH_NEIGHBORS = MESH_NEIGHBORHOOD
+MESH_INPUT_BYTES = 2 * len(MESH_NEIGHBORS) * CHUNK_VOLUME
+# 每個四邊形 12 個頂點座標 + 8 個紋理座標 + 12 個 byte 的顏色 (佔 3 個 float 的空間)
+QUAD_FLOATS = 23
+
+
+def default_worker_count():
+    # 保留一個核心給主執行緒 (渲染與遊戲邏輯)
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+def flat_mesh_arrays(meshes):
+    """{貼圖: (v, tc, c)} 轉成平的 float32 / float32 / uint8 陣列，主執行緒用 write_vertex_data 直接寫進 vertex list。"""
+    return {texture: (np.ravel(np.asarray(v, dtype=np.float32)), np.ravel(np.asarray(tc, dtype=np.float32)),
+                      np.ravel(np.asarray(c, dtype=np.uint8)))
+            for texture, (v, tc, c) in meshes.items()}
+
+
+def _mesh_flat(mesher, snapshot, key, registry):
+    return flat_mesh_arrays(chunk_mesher.ARRAY_MESHERS.get(mesher, mesher)(snapshot, snapshot.get_chunk(*key), registry))
+
+
+class MeshWorkerPool:
+    """在背景執行緒產生區塊網格，主執行緒只負責把完成的結果上傳到 batch。
+
+    每個工作拿到的是 ChunkedWorld.snapshot_area 的唯讀快照，
+    主執行緒之後的修改會因 copy-on-write 另外複製，不影響正在計算的網格。
+    結果是平的 numpy 陣列 (flat_mesh_arrays)，不在背景執行緒拿著 GIL 轉成 Python 串列。
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or default_worker_count()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mesher")
+        # {(cx, cz): Future}，同一個區塊重新提交時舊的結果直接丟棄
+        self.pending = {}
+        self.completed = 0
+
+    def submit(self, key, mesher, snapshot, registry):
+        self.cancel(key)
+        self.pending[key] = self.executor.submit(_mesh_flat, mesher, snapshot, key, registry)
+
+    def cancel(self, key):
+        future = self.pending.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def done_keys(self):
+        return [key for key, future in self.pending.items() if future.done()]
+
+    def pop_result(self, key):
+        """取出已完成的網格；計算失敗時記錄錯誤並回傳 None。"""
+        future = self.pending.pop(key)
+        self.completed += 1
+        try:
+            return future.result()
+        except Exception as e:
+            logging.error(f"區塊 {key} 網格產生失敗: {e}", exc_info=True)
+            return None
+
+    def queue_depth(self):
+        return len(self.pending)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pending.clear()
+
+
+# --- 工作行程模式 ---
+# 下面的函式在工作行程裡執行，連上主行程建立的 SlabRing 後直接把網格寫進分配到的槽。
+_worker_state = {}
+
+
+def _init_worker(mesh_ring, block_names, registry):
+    _ignore_interrupt()
+    # 方塊 ID 依第一次出現的順序分配，照主行程的順序補齊 (spawn 啟動時不會繼承)
+    for name in block_names:
+        block_id(name)
+    _worker_state.update(mesh=SlabRing(MESH_SLOTS, MESH_SLOT_SIZE, mesh_ring), registry=registry)
+
+
+def _mesh_in_slab(mesher, key, present, slot):
+    """回傳 ({貼圖: (槽內 float 位移, 四邊形數)}, None)；頂點放不下時回傳 (None, 網格) 改用 pickle 傳。"""
+    ring = _worker_state["mesh"]
+    blocks, light = ring.array(slot, count=MESH_INPUT_BYTES).reshape(2, len(MESH_NEIGHBORS), CHUNK_VOLUME)
+    world = ChunkedWorld()
+    for i, (dx, dz) in enumerate(MESH_NEIGHBORS):
+        if present[i]:
+            chunk = world.chunks[(key[0] + dx, key[1] + dz)] = Chunk(key[0] + dx, key[1] + dz, blocks[i])
+            chunk.light = light[i]
+    meshes = chunk_mesher.ARRAY_MESHERS.get(mesher, mesher)(world, world.get_chunk(*key), _worker_state["registry"])
+    out = ring.array(slot, np.float32, offset=MESH_INPUT_BYTES)
+    layout, position = {}, 0
+    for texture, (v, tc, c) in meshes.items():
+        quads = np.size(v) // 12
+        if position + quads * QUAD_FLOATS > out.size:
+            return None, flat_mesh_arrays(meshes)
+        out[position:position + quads * 12] = np.ravel(v)
+        out[position + quads * 12:position + quads * 20] = np.ravel(tc)
+        out[position + quads * 20:position + quads * QUAD_FLOATS].view(np.uint8)[:] = np.ravel(c)
+        layout[texture] = (position, quads)
+        position += quads * QUAD_FLOATS
+    return layout, None
+
+
+class ProcessChunkPool:
+    """工作行程模式: 區塊生成與網格都在別的行程計算，網格的輸入與頂點透過 SlabRing 交換。
+
+    網格的介面與 MeshWorkerPool 相同，另外多了 submit_generate / done_generated / pop_generated。
+    網格工作在有空槽時才送出，沒有槽就留在 pending 裡等下一次 done_keys；
+    生成工作同時最多送出 GENERATE_IN_FLIGHT 個，其餘等下一次 done_generated。
+    pop_result 回傳的陣列直接指向共享記憶體，只在下一次 done_keys 之前有效，
+    呼叫端要在那之前用完 (複製進 vertex list)。生成的區塊陣列用 pickle 傳回，沒有這個限制。
+    """
+
+    def __init__(self, registry, workers=None):
+        self.workers = workers or default_worker_count()
+        self.mesh_ring = SlabRing(MESH_SLOTS, MESH_SLOT_SIZE)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                            initargs=(self.mesh_ring.name, list(BLOCK_NAMES), registry))
+        # {key: [Future (還沒送出時為 None), 槽, 工作參數]}
+        self.pending = {}
+        # {key: [Future (還沒送出時為 None), 工作參數]}
+        self.generating = {}
+        # 已交給呼叫端讀的槽，以及取消了但還在執行的工作 (結束後才能還槽)
+        self._borrowed = []
+        self._orphans = []
+        self.completed = 0
+
+    def submit(self, key, mesher, snapshot, registry):
+        # registry 在建立工作行程時已經傳過去
+        self.cancel(key)
+        self.pending[key] = [None, None, (key, mesher, snapshot)]
+
+    def submit_generate(self, seed, cx, cz):
+        if (cx, cz) not in self.generating:
+            self.generating[(cx, cz)] = [None, (seed, cx, cz)]
+
+    def cancel(self, key):
+        job = self.pending.pop(key, None)
+        if job is not None and job[0] is not None:
+            job[0].cancel()
+            self._orphans.append((job[0], job[1]))
+
+    def _send_mesh(self, slot, key, mesher, snapshot):
+        # 主行程唯一的一次複製: 快照的九個區塊 (方塊與光照) 寫進槽的輸入區
+        blocks, light = self.mesh_ring.array(slot, count=MESH_INPUT_BYTES).reshape(2, len(MESH_NEIGHBORS), CHUNK_VOLUME)
+        present = []
+        for i, (dx, dz) in enumerate(MESH_NEIGHBORS):
+            chunk = snapshot.get_chunk(key[0] + dx, key[1] + dz)
+            present.append(chunk is not None)
+            if chunk is not None:
+                blocks[i] = np.frombuffer(chunk.blocks, dtype=np.uint8)
+                light[i] = np.frombuffer(chunk.light, dtype=np.uint8) if chunk.light is not None else FULL_SKY
+        return self.executor.submit(_mesh_in_slab, mesher, key, present, slot)
+
+    def _settle(self):
+        ring = self.mesh_ring
+        for slot in self._borrowed:
+            ring.release(slot)
+        self._borrowed = []
+        running = []
+        for future, slot in self._orphans:
+            if future.done():
+                ring.release(slot)
+            else:
+                running.append((future, slot))
+        self._orphans = running
+
+    def done_keys(self):
+        self._settle()
+        for job in self.pending.values():
+            if job[0] is None:
+                slot = self.mesh_ring.acquire()
+                if slot is None:
+                    break
+                job[0], job[1] = self._send_mesh(slot, *job[2]), slot
+        return [key for key, job in self.pending.items() if job[0] is not None and job[0].done()]
+
+    def pop_result(self, key):
+        """取出已完成的網格，值是指向共享記憶體的陣列 (或放不下時 pickle 傳回的陣列)。"""
+        self.completed += 1
+        # 槽到下一次 _settle 才還
+        future, slot, _ = self.pending.pop(key)
+        self._borrowed.append(slot)
+        try:
+            layout, meshes = future.result()
+        except Exception as e:
+            logging.error(f"區塊 {key} 網格產生失敗: {e}", exc_info=True)
+            return None
+        if layout is None:
+            return meshes
+        out = self.mesh_ring.array(slot, np.float32, offset=MESH_INPUT_BYTES)
+        return {texture: (out[p:p + quads * 12], out[p + quads * 12:p + quads * 20],
+                          out[p + quads * 20:p + quads * QUAD_FLOATS].view(np.uint8))
+                for texture, (p, quads) in layout.items()}
+
+    def done_generated(self):
+        in_flight = sum(job[0] is not None for job in self.generating.values())
+        for job in self.generating.values():
+            if in_flight >= GENERATE_IN_FLIGHT:
+                break
+            if job[0] is None:
+                job[0] = self.executor.submit(generate_chunk_blocks, *job[1])
+                in_flight += 1
+        return [key for key, job in self.generating.items() if job[0] is not None and job[0].done()]
+
+    def pop_generated(self, key):
+        """取出已生成的區塊，回傳 (WORLD_HEIGHT, 16, 16) 方塊 ID 陣列；失敗時回傳 None。"""
+        future = self.generating.pop(key)[0]
+        try:
+            return future.result()
+        except Exception as e:
+            logging.error(f"區塊 {key} 生成失敗: {e}", exc_info=True)
+            return None
+
+    def queue_depth(self):
+        return len(self.pending)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.pending.clear()
+        self.generating.clear()
+        self._borrowed, self._orphans = [], []
+        self.mesh_ring.close()
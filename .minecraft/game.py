@@ -1,15 +1,33 @@
 import os
 import json
+import argparse
 import math
 import logging
 import random
 import time
 import sys
+import ctypes
+from collections import deque
 
+import numpy as np
 import pyglet
+# 預先生成 (--pregen) 與它的工作行程不開視窗，也不建立隱藏的 OpenGL shadow window
+if "--pregen" in sys.argv or __name__ == "__mp_main__":
+    pyglet.options["shadow_window"] = False
 import pyglet.gl as gl
 
 from pyglet.window import mouse, key
+
+from world_storage import ChunkedWorld, AIR, CHUNK_SIZE, CHUNK_VOLUME, WORLD_HEIGHT, MESH_NEIGHBORHOOD, block_id, spiral_offsets
+from block_registry import load_block_registry
+from region_file import RegionStore, BackgroundSaver, convert_json_world, load_world_seed
+from worldgen import generate_chunk_blocks, pregen_world
+from structures import surface_height
+import chunk_mesher
+from chunk_workers import MeshWorkerPool, ProcessChunkPool
+from raycast import raycast_block
+from physics import box_hits_solid, sweep_aabb, FixedTimestep
+from lighting import LightEngine
 MAIN_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 GAME_LOG_DIR = os.path.join(MAIN_SCRIPT_DIR, "log")
@@ -26,7 +44,8 @@ if __name__ == "__main__":
             logging.StreamHandler(sys.stdout) 
         ]
     )
-else:
+elif __name__ != "__mp_main__":
+    # 預先生成的工作行程 (spawn) 會以 __mp_main__ 重新匯入這個檔案，不能再用 'w' 開 game.log 把主行程的日誌清掉
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(module)s.%(funcName)s:%(lineno)d - %(message)s',
@@ -41,8 +60,19 @@ def gluPerspective(fovY, aspect, zNear, zFar):
     fW = fH * aspect
     gl.glFrustum(-fW, fW, -fH, fH, zNear, zFar)
 
+def write_vertex_data(array, data):
+    """把 numpy 陣列寫進 vertex list 的屬性 (vertex_list.vertices 等)，不先轉成 Python 串列。"""
+    if isinstance(array, ctypes.Array):
+        np.ctypeslib.as_array(array)[:] = data
+        return
+    # 同一個緩衝區裡交錯存放多個屬性 (IndirectArrayRegion)，用跨步視圖寫入
+    target = np.ctypeslib.as_array(array.region.array)
+    rows = array.size // array.count
+    view = np.lib.stride_tricks.as_strided(target, (rows, array.count), (array.stride * target.itemsize, target.itemsize))
+    view[:] = data.reshape(rows, array.count)
+
 class Game:
-    def __init__(self, window):
+    def __init__(self, window, worker_processes=0, tick_rate=60):
         self.window = window
         logging.info("遊戲引擎初始化開始...")
         self.world_batch = pyglet.graphics.Batch()
@@ -80,10 +110,35 @@ class Game:
         if self.keys is None:
             logging.error("CRITICAL FAILURE in Game.__init__: self.keys IS STRICTLY NONE after initialization attempt!")
         
-        self.world = {}
+        self.block_registry = load_block_registry(os.path.join(MAIN_SCRIPT_DIR, "assets", "blocks.json"))
+        # 世界在 load_world 建立 (接上區域檔與光照)
+        self.world = None
         self.generated_chunks = set()
         self.chunk_load_distance = 4
-        self.chunk_size = 16
+        self.chunk_size = CHUNK_SIZE
+        # 每個區塊各自的 vertex list，{(cx, cz): [vertex_list, ...]}
+        self.chunk_meshes = {}
+        self.render_chunk_distance = self.chunk_load_distance - 1
+        # greedy meshing 合併相鄰的同貼圖面，可用 /greedy on|off 切換
+        self.greedy_meshing = False
+        # 網格在背景執行緒產生，主執行緒每幀最多花 mesh_upload_budget_ms 上傳
+        # 指定 worker_processes (--worker-processes) 時生成與網格改在工作行程計算，網格透過共享記憶體交換
+        self.chunk_pool = ProcessChunkPool(self.block_registry, worker_processes) if worker_processes else None
+        self.mesh_pool = self.chunk_pool or MeshWorkerPool()
+        self.mesh_upload_budget_ms = 4.0
+        self.visible_chunks = set()
+        # 超出卸載半徑的區塊會寫回並移出記憶體，另外以數量/位元組上限做 LRU 淘汰
+        self.chunk_unload_distance = self.chunk_load_distance + 2
+        self.max_loaded_chunks = 256
+        self.max_loaded_bytes = 64 * 1024 * 1024
+        self.managed_chunk_center = None
+        # 缺少的區塊排進佇列，每個 tick 只花固定時間載入/生成
+        self.chunk_queue = deque()
+        self.chunk_generation_budget_ms = 4.0
+        self.spiral_offsets = spiral_offsets(self.chunk_load_distance)
+        # 自動存檔: 主執行緒只取快照，壓縮與寫檔交給背景執行緒
+        self.autosave_interval = 60.0
+        self.last_autosave_ms = 0.0
 
         self.texture_groups = {}
         self.textures = {}
@@ -98,6 +153,13 @@ class Game:
         self.load_recipes()
 
         self.position = [0.5, 15.0, 0.5]
+        # 模擬以固定的 tick_rate 執行，畫面在上一個與這一個 tick 的位置之間內插 (/tickrate 可調整)
+        self.timestep = FixedTimestep(tick_rate)
+        self.previous_position = list(self.position)
+        # 一個 tick 內移動超過這個距離視為傳送，鏡頭直接跳過去不內插
+        self.max_interpolation_distance = 8.0
+        # 找不到地面時放到地形雜訊的地表上方這麼多格 (多留一棵樹的高度)
+        self.surface_fallback_margin = 8
         self.rotation = [0.0, 0.0]
         self.velocity = [0.0, 0.0, 0.0]
         self.on_ground = False
@@ -135,16 +197,8 @@ class Game:
 
         self.breaking_block_pos = None; self.breaking_block_start_time = 0
         self.breaking_block_stage = 0
-        self.break_time_map = {
-            "dirt": 0.5, "grass_block": 0.6, "sand": 0.5, "gravel": 0.6,
-            "oak_log": 2.0, "oak_leaves": 0.2, "stone": 1.5, "cobblestone": 2.0,
-            "coal_ore": 3.0, "iron_ore": 3.0, "gold_ore": 3.0, "diamond_ore": 3.0,
-            "lapis_ore": 3.0, "oak_planks": 2.0, "birch_log": 2.0, "birch_leaves": 0.2,
-            "crafting_table": 2.5, "birch_planks": 2.0,
-        }
         
-        self.valid_give_items = set(self.break_time_map.keys())
-        self.valid_give_items.update(["oak_planks", "birch_planks", "crafting_table"])
+        self.valid_give_items = set(self.block_registry.block_names())
 
         self.chat_active = False
         self.chat_input = ""
@@ -167,18 +221,7 @@ class Game:
 
         self.texture_base_path = os.path.join(MAIN_SCRIPT_DIR, "assets", "minecraft", "textures", "block")
         
-        self.texture_map = {
-            "grass_block_top": "grass_block_top", "grass_block_side": "grass_block_side",
-            "grass_block_bottom": "dirt", "dirt": "dirt", "stone": "stone",
-            "cobblestone": "cobblestone", "oak_planks": "oak_planks", "sand": "sand",
-            "gravel": "gravel", "gold_ore": "gold_ore", "iron_ore": "iron_ore",
-            "coal_ore": "coal_ore", "diamond_ore": "diamond_ore", "lapis_ore": "lapis_ore",
-            "oak_log_top": "oak_log_top", "oak_log_side": "oak_log", "oak_leaves": "oak_leaves",
-            "birch_log_top": "birch_log_top", "birch_log_side": "birch_log", "birch_leaves": "birch_leaves",
-            "crafting_table_top": "crafting_table_top", "crafting_table_side": "crafting_table_side",
-            "crafting_table_front": "crafting_table_front",
-            "birch_planks": "birch_planks",
-        }
+        self.texture_map = self.block_registry.texture_files
         self.load_textures_and_groups()
 
         player_data_loaded_successfully = False
@@ -226,7 +269,7 @@ class Game:
         self.gravity = -20.0; self.jump_force = 8.0
         self.normal_move_speed = 5.0; self.sprint_speed_multiplier = 1.6
         self.sneak_speed_multiplier = 0.5; self.fly_speed = 10.0
-        self.player_height = 1.8; self.sneak_camera_offset_y = 0.25
+        self.player_height = 1.8; self.player_width = 0.6; self.sneak_camera_offset_y = 0.25
         self.is_sprinting = False; self.is_sneaking = False; self.is_flying_creative = False
         self.last_space_press_time = 0; self.double_tap_time = 0.3
         self.chunk_dirty = True
@@ -555,14 +598,8 @@ class Game:
     def rebuild_held_block_geometry(self):
         self.held_block_batch = pyglet.graphics.Batch();
         if not self.selected_block: return
-        block_type_id = self.selected_block; default_texture_key = "stone"; texture_keys_for_faces = [default_texture_key] * 6
-        if block_type_id == "grass_block": texture_keys_for_faces = ["grass_block_side","grass_block_side","grass_block_top","grass_block_bottom","grass_block_side","grass_block_side"]
-        elif block_type_id == "oak_log": texture_keys_for_faces = ["oak_log_side","oak_log_side","oak_log_top","oak_log_top","oak_log_side","oak_log_side"]
-        elif block_type_id == "birch_log": texture_keys_for_faces = ["birch_log_side","birch_log_side","birch_log_top","birch_log_top","birch_log_side","birch_log_side"]
-        elif block_type_id == "crafting_table": texture_keys_for_faces = ["crafting_table_side", "crafting_table_side", "crafting_table_top", "oak_planks", "crafting_table_front", "crafting_table_side"]
-        elif block_type_id == "oak_leaves" or block_type_id == "birch_leaves": texture_keys_for_faces = [block_type_id] * 6
-        elif block_type_id in self.texture_map: texture_keys_for_faces = [block_type_id] * 6
-        elif block_type_id in self.texture_groups: texture_keys_for_faces = [block_type_id] * 6 
+        default_texture_key = "stone"
+        texture_keys_for_faces = self.block_registry.face_textures(block_id(self.selected_block))
         vertex_texture_groups = [];
         for tex_key in texture_keys_for_faces: tex_group = self.texture_groups.get(tex_key, self.texture_groups.get(default_texture_key)); vertex_texture_groups.append(tex_group)
         scale = self.held_block_scale
@@ -581,10 +618,11 @@ class Game:
             if elapsed < self.arm_swing_duration: gl.glRotatef(-math.sin((elapsed/self.arm_swing_duration)*math.pi)*20,1,0,1)
         gl.glPushAttrib(gl.GL_DEPTH_BUFFER_BIT|gl.GL_LIGHTING_BIT|gl.GL_POLYGON_BIT|gl.GL_TEXTURE_BIT|gl.GL_ENABLE_BIT)
         gl.glDisable(gl.GL_DEPTH_TEST); gl.glDisable(gl.GL_LIGHTING); gl.glEnable(gl.GL_TEXTURE_2D)
-        if self.selected_block == "oak_leaves" or self.selected_block == "birch_leaves" or self.selected_block == "birch_planks":
+        use_blend = self.block_registry.blend[block_id(self.selected_block)]
+        if use_blend:
             gl.glEnable(gl.GL_BLEND); gl.glBlendFunc(gl.GL_SRC_ALPHA,gl.GL_ONE_MINUS_SRC_ALPHA)
         self.held_block_batch.draw()
-        if self.selected_block == "oak_leaves" or self.selected_block == "birch_leaves" or self.selected_block == "birch_planks":
+        if use_blend:
             gl.glDisable(gl.GL_BLEND)
         gl.glPopAttrib(); gl.glPopMatrix()
 
@@ -599,12 +637,10 @@ class Game:
         player_head_y_int = math.floor(self.position[1] + self.player_height - 0.01) 
         
         stuck_in_block = False
-        non_solid_blocks = {"oak_leaves", "birch_leaves"}
-        if (player_x_block, player_foot_y_int, player_z_block) in self.world and \
-           self.world.get((player_x_block, player_foot_y_int, player_z_block)) not in non_solid_blocks:
+        solid, get_id = self.block_registry.solid, self.world.get_id
+        if solid[get_id(player_x_block, player_foot_y_int, player_z_block)]:
             stuck_in_block = True
-        if (player_x_block, player_head_y_int, player_z_block) in self.world and \
-           self.world.get((player_x_block, player_head_y_int, player_z_block)) not in non_solid_blocks:
+        if solid[get_id(player_x_block, player_head_y_int, player_z_block)]:
            if self.position[1] + self.player_height - 0.01 < player_head_y_int + 1.0:
                stuck_in_block = True
         
@@ -613,43 +649,21 @@ class Game:
 
         if stuck_in_block:
             logging.warning(f"Player stuck or out of bounds at {self.position}. Attempting to find safe spot.")
-            search_x, search_z = player_x_block, player_z_block
-            found_safe_spot = False
-            start_search_y = math.floor(self.position[1]) + 5 
-            for y_candidate_feet in range(start_search_y, -10, -1): 
-                block_below_pos = (search_x, y_candidate_feet - 1, search_z)
-                standing_spot_pos = (search_x, y_candidate_feet, search_z) 
-                head_spot_pos = (search_x, y_candidate_feet + 1, search_z) 
-
-                block_type_below = self.world.get(block_below_pos)
-                block_type_standing = self.world.get(standing_spot_pos)
-                block_type_head = self.world.get(head_spot_pos)
-
-                if block_type_below and block_type_below not in non_solid_blocks and \
-                   (not block_type_standing or block_type_standing in non_solid_blocks) and \
-                   (not block_type_head or block_type_head in non_solid_blocks):
-                    self.position = [search_x + 0.5, float(y_candidate_feet), search_z + 0.5]
-                    self.velocity = [0,0,0]
-                    if self.mode == "survival": self.on_ground = True
-                    logging.info(f"Moved player to safe spot: {self.position}")
-                    found_safe_spot = True
-                    break
-            
-            if not found_safe_spot:
-                self.position = [self.position[0], 30.0, self.position[2]] 
-                self.velocity = [0,0,0]
-                self.on_ground = False 
-                logging.warning(f"Could not find safe spot nearby, moved player to default height: {self.position}")
-
-                new_foot_y = math.floor(self.position[1])
-                new_head_y = math.floor(self.position[1] + self.player_height - 0.01)
-                if ( (math.floor(self.position[0]), new_foot_y, math.floor(self.position[2])) in self.world and \
-                     self.world.get((math.floor(self.position[0]), new_foot_y, math.floor(self.position[2]))) not in non_solid_blocks ) or \
-                   ( (math.floor(self.position[0]), new_head_y, math.floor(self.position[2])) in self.world and \
-                     self.world.get((math.floor(self.position[0]), new_head_y, math.floor(self.position[2]))) not in non_solid_blocks ):
-                    self.position[1] += 5.0 
-                    logging.warning("Still stuck after default height, pushed further up.")
+            # 高度圖直接給出這一柱最高的實心方塊，站在它上面一定不會卡住
+            surface_y = self.world.surface_y(player_x_block, player_z_block)
+            if surface_y is not None and surface_y >= 0:
+                self.position = [player_x_block + 0.5, float(surface_y + 1), player_z_block + 0.5]
+                if self.mode == "survival": self.on_ground = True
+                logging.info(f"Moved player to safe spot: {self.position}")
+            else:
+                self.position = [self.position[0], self.fallback_surface_y(player_x_block, player_z_block), self.position[2]]
+                self.on_ground = False
+                logging.warning(f"No ground in this column (chunk not loaded or empty), moved player to {self.position}")
+            self.velocity = [0,0,0]
 
+    def fallback_surface_y(self, x, z):
+        """區塊還沒載入或整柱是空的時候的安全高度: 地形雜訊的地表加上 surface_fallback_margin。"""
+        return float(min(surface_height(self.world_seed, x, z) + self.surface_fallback_margin, WORLD_HEIGHT))
 
     def load_textures_and_groups(self):
         for texture_key_mapped, texture_filename_mapped in self.texture_map.items():
@@ -688,6 +702,7 @@ class Game:
                     elif texture_filename_mapped == "oak_planks": base_color = (200, 160, 100, 255)
                     elif texture_filename_mapped == "sand": base_color = (240, 230, 140, 255)
                     elif texture_filename_mapped == "gravel": base_color = (160, 160, 160, 255)
+                    elif texture_filename_mapped == "glowstone": base_color = (250, 210, 120, 255)
                     img_pil = Image.new('RGBA',(16,16),color=base_color); draw = ImageDraw.Draw(img_pil)
                     if "leaves" in texture_filename_mapped:
                         for _ in range(random.randint(25,55)): x_rand,y_rand=random.randint(0,15),random.randint(0,15); alpha=0 if random.random()<0.7 else random.randint(10,70); draw.point((x_rand,y_rand),fill=(base_color[0],base_color[1],base_color[2],alpha))
@@ -727,239 +742,275 @@ class Game:
             else: logging.warning(f"Break texture {fp} not found."); self.break_texture_groups.append(None)
 
     def rebuild_world_geometry(self):
-        if not self.chunk_dirty: return
-        if not self.world: self.chunk_dirty = False; return
-        self.world_batch = pyglet.graphics.Batch(); render_distance_blocks = 32 
-        px_floor,py_floor,pz_floor = map(math.floor, self.position)
-        non_solid_blocks = {"oak_leaves", "birch_leaves"}
-        
-        # 定義需要隨機旋轉材質的方塊類型
-        rotatable_blocks = {
-            "grass_block", "dirt", "sand", "stone", "oak_leaves", "birch_leaves", 
-            "gravel", "coal_ore", "iron_ore", "gold_ore", "diamond_ore", "lapis_ore"
-        }
-
-        for (x,y,z), block_type_in_world in self.world.items():
-            if not (abs(x-px_floor)<render_distance_blocks and \
-                    abs(y-py_floor)<render_distance_blocks+20 and \
-                    abs(z-pz_floor)<render_distance_blocks): 
-                continue
-            
-            is_transparent_block = (block_type_in_world in non_solid_blocks) 
+        """把有變動或剛進入渲染範圍的區塊交給背景網格工作，並上傳已完成的網格。"""
+        if self.chunk_dirty:
+            player_chunk_x = math.floor(self.position[0] / self.chunk_size)
+            player_chunk_z = math.floor(self.position[2] / self.chunk_size)
+            d = self.render_chunk_distance
+            self.visible_chunks = {(cx, cz) for cx, cz in self.world.chunk_keys()
+                                   if abs(cx - player_chunk_x) <= d and abs(cz - player_chunk_z) <= d}
+
+            for key in [key for key in self.chunk_meshes if key not in self.visible_chunks]:
+                self.delete_chunk_mesh(key)
+            for key in [key for key in self.mesh_pool.pending if key not in self.visible_chunks]:
+                self.mesh_pool.cancel(key)
+            dirty = self.world.take_dirty_meshes()
+            # 近的區塊先排進佇列
+            for key in sorted(self.visible_chunks, key=lambda k: max(abs(k[0] - player_chunk_x), abs(k[1] - player_chunk_z))):
+                if not self._mesh_ready(*key):
+                    continue
+                if key in dirty or (key not in self.chunk_meshes and key not in self.mesh_pool.pending):
+                    self.mesh_pool.submit(key, self.current_mesher(), self.world.snapshot_area(*key), self.block_registry)
+            self.chunk_dirty = False
+        self.upload_chunk_meshes()
+
+    def current_mesher(self):
+        if self.greedy_meshing:
+            return chunk_mesher.mesh_chunk_greedy
+        return chunk_mesher.mesh_chunk
+
+    def upload_chunk_meshes(self):
+        # 每幀只花 mesh_upload_budget_ms 上傳，剩下的留到下一幀
+        done_keys = self.mesh_pool.done_keys()
+        if not done_keys: return
+        start = time.perf_counter()
+        player_chunk_x = math.floor(self.position[0] / self.chunk_size)
+        player_chunk_z = math.floor(self.position[2] / self.chunk_size)
+        done_keys.sort(key=lambda k: max(abs(k[0] - player_chunk_x), abs(k[1] - player_chunk_z)))
+        for key in done_keys:
+            meshes = self.mesh_pool.pop_result(key)
+            if meshes is not None and key in self.visible_chunks:
+                self.upload_chunk_mesh(key, meshes)
+            if (time.perf_counter() - start) * 1000 >= self.mesh_upload_budget_ms:
+                break
 
-            for face_index_standard, (dx_normal,dy_normal,dz_normal) in enumerate([(1,0,0),(-1,0,0),(0,1,0),(0,-1,0),(0,0,1),(0,0,-1)]):
-                neighbor_x,neighbor_y,neighbor_z = x+dx_normal,y+dy_normal,z+dz_normal
-                neighbor_block_type = self.world.get((neighbor_x,neighbor_y,neighbor_z))
-                
-                should_draw_face = False
-                if not neighbor_block_type: 
-                    should_draw_face = True
-                elif is_transparent_block and (neighbor_block_type != block_type_in_world and neighbor_block_type is not None):
-                    should_draw_face = True
-                elif not is_transparent_block and (neighbor_block_type in non_solid_blocks): 
-                    should_draw_face = True
-
-                if should_draw_face:
-                    texture_key_for_face = None
-                    if block_type_in_world=="grass_block":
-                        if face_index_standard==2: texture_key_for_face="grass_block_top"      
-                        elif face_index_standard==3: texture_key_for_face="grass_block_bottom"  
-                        else: texture_key_for_face="grass_block_side"                         
-                    elif block_type_in_world=="oak_log":
-                        if face_index_standard==2 or face_index_standard==3: texture_key_for_face="oak_log_top"
-                        else: texture_key_for_face="oak_log_side"
-                    elif block_type_in_world=="birch_log":
-                        if face_index_standard==2 or face_index_standard==3: texture_key_for_face="birch_log_top"
-                        else: texture_key_for_face="birch_log_side"
-                    elif block_type_in_world == "crafting_table":
-                        if face_index_standard == 2: texture_key_for_face = "crafting_table_top"
-                        elif face_index_standard == 3: texture_key_for_face = "oak_planks"
-                        elif face_index_standard == 4: texture_key_for_face = "crafting_table_front"
-                        else: texture_key_for_face = "crafting_table_side"
-                    elif block_type_in_world in non_solid_blocks: 
-                        texture_key_for_face=block_type_in_world
-                    elif block_type_in_world in self.texture_map: 
-                        texture_key_for_face=block_type_in_world
-                    else: 
-                        texture_key_for_face="stone" 
-                    
-                    texture_group_for_face = self.texture_groups.get(texture_key_for_face, self.texture_groups.get("stone"))
-                    
-                    # 計算隨機旋轉
-                    rotation = 0
-                    should_rotate = False
-                    
-                    # 草地只有頂部會旋轉，樹葉和其他自然方塊全旋轉
-                    if block_type_in_world == "grass_block":
-                        if face_index_standard == 2: # Top face
-                            should_rotate = True
-                    elif block_type_in_world in rotatable_blocks:
-                        should_rotate = True
-                    
-                    if should_rotate:
-                        # 根據座標計算一個固定的隨機數 (Hash)
-                        # 使用位元運算可以加快速度
-                        # (x * 質數1 + y * 質數2 + z * 質數3)
-                        # 這樣同一個位置的方塊旋轉角度永遠固定
-                        h = int(x * 521 + y * 97 + z * 643)
-                        rotation = h % 4
-
-                    if texture_group_for_face:
-                        v,tc = self.get_block_face_vertices(x,y,z,face_index_standard,scale=1.0,center_offset=(0,0,0), rotation=rotation)
-                        self.world_batch.add(4,gl.GL_QUADS,texture_group_for_face,('v3f/static',v),('t2f/static',tc))
-        self.chunk_dirty = False
-
-    def generate_tree(self, xt, ys, zt, tree_type="oak"):
-        non_solid_blocks = {"oak_leaves", "birch_leaves"}
-        log_type = f"{tree_type}_log"
-        leaves_type = f"{tree_type}_leaves"
-        
-        can_grow=True
-        for i in range(-1,2): 
-            for j in range(-1,2):
-                if i==0 and j==0: continue 
-                check_pos_ground=(xt+i,ys-1,zt+j)
-                block_on_ground=self.world.get(check_pos_ground)
-                if block_on_ground and block_on_ground not in ["grass_block", "dirt"] and block_on_ground not in non_solid_blocks:
-                    can_grow=False; break
-                for k_up in range(5): 
-                    check_pos_air=(xt+i,ys+k_up,zt+j)
-                    block_in_air=self.world.get(check_pos_air)
-                    if block_in_air and block_in_air not in non_solid_blocks: 
-                        can_grow=False; break
-                if not can_grow: break
-            if not can_grow: break
-        
-        if not (self.world.get((xt,ys-1,zt)) in ["grass_block","dirt"]): 
-            can_grow=False
-        
-        if not can_grow: return False
-
-        trunk_height=random.randint(4,6); placed_logs=[]
-        for i in range(trunk_height):
-            log_pos=(xt,ys+i,zt)
-            if self.world.get(log_pos) and self.world.get(log_pos) not in [None] and self.world.get(log_pos) not in non_solid_blocks:
-                for plog_pos in placed_logs: self.world.pop(plog_pos,None) 
-                return False
-            self.world[log_pos]=log_type; placed_logs.append(log_pos)
-
-        leaf_y_base=ys+trunk_height-2 
-        leaf_height_layers=random.randint(3,4) 
-        for leaf_y_offset in range(leaf_height_layers):
-            current_y=leaf_y_base+leaf_y_offset
-            radius=1 if (leaf_y_offset==leaf_height_layers-1 and leaf_height_layers>1) else 2 
-            if leaf_height_layers==1: radius=1 
-
-            for leaf_x_offset in range(-radius,radius+1):
-                for leaf_z_offset in range(-radius,radius+1):
-                    if leaf_x_offset==0 and leaf_z_offset==0 and current_y < ys + trunk_height: continue
-                    if radius==2 and abs(leaf_x_offset)==2 and abs(leaf_z_offset)==2 and random.random()<0.5: continue
-                    if radius==2 and (abs(leaf_x_offset)==2 or abs(leaf_z_offset)==2) and \
-                       (abs(leaf_x_offset)!=abs(leaf_z_offset)) and random.random()<0.2: continue
-
-                    leaf_pos=(xt+leaf_x_offset,current_y,zt+leaf_z_offset)
-                    existing_block_at_leaf_pos=self.world.get(leaf_pos)
-                    if not existing_block_at_leaf_pos or existing_block_at_leaf_pos in non_solid_blocks:
-                        self.world[leaf_pos]=leaves_type
-        return True
+    def upload_chunk_mesh(self, key, meshes):
+        self.delete_chunk_mesh(key)
+        fallback_group = self.texture_groups.get("stone")
+        by_group = {}
+        for texture_name, mesh in meshes.items():
+            texture_group = self.texture_groups.get(texture_name, fallback_group)
+            if not texture_group: continue
+            if texture_group in by_group:
+                by_group[texture_group] = tuple(np.concatenate((merged, part)) for merged, part in zip(by_group[texture_group], mesh))
+            else:
+                by_group[texture_group] = mesh
+        # 每個區塊每種貼圖一個 vertex list，共用同一個 world_batch
+        self.chunk_meshes[key] = [self.add_mesh_vertex_list(texture_group, *mesh) for texture_group, mesh in by_group.items()]
+
+    def add_mesh_vertex_list(self, texture_group, v, tc, c):
+        # 頂點顏色是烘焙好的光照，與貼圖相乘
+        # 兩種網格池給的都是平的 numpy 陣列 (工作行程的還直接指向共享記憶體)，直接複製進 vertex list 的緩衝區，不轉成 Python 串列
+        vertex_list = self.world_batch.add(len(v) // 3, gl.GL_QUADS, texture_group, 'v3f/static', 't2f/static', 'c3B/static')
+        write_vertex_data(vertex_list.vertices, v)
+        write_vertex_data(vertex_list.tex_coords, tc)
+        write_vertex_data(vertex_list.colors, c)
+        return vertex_list
+
+    def delete_chunk_mesh(self, key):
+        for vertex_list in self.chunk_meshes.pop(key, ()):
+            vertex_list.delete()
 
     def generate_chunk(self, chunk_x, chunk_z):
-        base_y_level = 8
-        ores_to_generate = [
-            ("coal_ore", 0, base_y_level - 1, 80), ("iron_ore", 2, base_y_level - 3, 50),
-            ("gold_ore", 4, base_y_level - 5, 15), ("lapis_ore", 4, base_y_level - 5, 10),
-            ("diamond_ore", 5, base_y_level - 6, 5)
-        ]
-        
-        start_x, start_z = chunk_x * self.chunk_size, chunk_z * self.chunk_size
-        
-        for dx in range(self.chunk_size):
-            for dz in range(self.chunk_size):
-                x_coord, z_coord = start_x + dx, start_z + dz
-                self.world[(x_coord, 0, z_coord)] = "stone"
-                for y_offset in range(1, base_y_level - 4): self.world[(x_coord, y_offset, z_coord)] = "stone"
-                for y_offset in range(base_y_level - 4, base_y_level): self.world[(x_coord, y_offset, z_coord)] = "dirt"
-                self.world[(x_coord, base_y_level, z_coord)] = "grass_block"
-
-                for y_ore_check in range(1, base_y_level - 1):
-                    if self.world.get((x_coord, y_ore_check, z_coord)) == "stone":
-                        for ore_type, min_d, max_d, rarity in ores_to_generate:
-                            if min_d <= y_ore_check <= max_d and random.randint(1, 1000) <= rarity:
-                                self.world[(x_coord, y_ore_check, z_coord)] = ore_type
-                                break
-        
-        if random.random() < 0.15: 
-            for _ in range(random.randint(1, 3)):
-                x_tree, z_tree = start_x + random.randint(2, self.chunk_size-3), start_z + random.randint(2, self.chunk_size-3)
-                if self.world.get((x_tree, base_y_level, z_tree)) == "grass_block":
-                    tree_type = "birch" if random.random() < 0.3 else "oak" 
-                    self.generate_tree(x_tree, base_y_level + 1, z_tree, tree_type=tree_type)
-
+        # 地形、礦石與樹整塊用 numpy 算好，再寫進區塊陣列 (排列為 [y][z][x])
+        # 只由 (種子, cx, cz) 決定，與生成順序無關，也不會寫到別的區塊
+        self.apply_generated_chunk(chunk_x, chunk_z, generate_chunk_blocks(self.world_seed, chunk_x, chunk_z))
+
+    def apply_generated_chunk(self, chunk_x, chunk_z, terrain):
+        blocks = np.frombuffer(self.world.writable_chunk(chunk_x, chunk_z).blocks, dtype=np.uint8)
+        # 生成前就寫入的方塊 (例如玩家在邊界外放的) 在空氣的位置保留
+        np.copyto(blocks.reshape(terrain.shape), terrain, where=terrain != AIR)
+        self.world.lighting.light_chunk(chunk_x, chunk_z)
+        self.world.mark_modified(chunk_x, chunk_z)
         logging.info(f"Generated chunk at ({chunk_x}, {chunk_z})")
 
     def _manage_world_chunks(self):
         player_chunk_x = math.floor(self.position[0] / self.chunk_size)
         player_chunk_z = math.floor(self.position[2] / self.chunk_size)
-        
-        new_chunks_generated = False
-        for cx in range(player_chunk_x - self.chunk_load_distance, player_chunk_x + self.chunk_load_distance + 1):
-            for cz in range(player_chunk_z - self.chunk_load_distance, player_chunk_z + self.chunk_load_distance + 1):
-                if (cx, cz) not in self.generated_chunks:
-                    self.generate_chunk(cx, cz)
-                    self.generated_chunks.add((cx, cz))
-                    new_chunks_generated = True
-        
-        if new_chunks_generated:
+        # 玩家換區塊時重新排佇列: 由近到遠一圈一圈排入還沒準備好的區塊
+        if self.managed_chunk_center != (player_chunk_x, player_chunk_z):
+            self.managed_chunk_center = (player_chunk_x, player_chunk_z)
+            self.chunk_queue = deque((player_chunk_x + dx, player_chunk_z + dz) for dx, dz in self.spiral_offsets
+                                     if not self._chunk_ready(player_chunk_x + dx, player_chunk_z + dz))
+            self._unload_far_chunks(player_chunk_x, player_chunk_z)
+        self.process_chunk_queue()
+
+    def _chunk_ready(self, cx, cz):
+        return (cx, cz) in self.generated_chunks and self.world.touch_chunk(cx, cz) is not None
+
+    def process_chunk_queue(self):
+        """每個 tick 最多花 chunk_generation_budget_ms 載入/生成佇列前端的區塊 (至少處理一個)。"""
+        if self.chunk_pool is not None:
+            self.collect_generated_chunks()
+        if not self.chunk_queue: return
+        start = time.perf_counter()
+        while self.chunk_queue:
+            cx, cz = self.chunk_queue.popleft()
+            if self.chunk_pool is not None and (cx, cz) not in self.generated_chunks:
+                # 工作行程模式: 只排進生成工作，完成後由 collect_generated_chunks 寫入
+                self.chunk_pool.submit_generate(self.world_seed, cx, cz)
+                continue
+            self._fill_chunk(cx, cz)
+            self.chunk_dirty = True
+            if (time.perf_counter() - start) * 1000 >= self.chunk_generation_budget_ms:
+                break
+
+    def collect_generated_chunks(self):
+        for key in self.chunk_pool.done_generated():
+            terrain = self.chunk_pool.pop_generated(key)
+            if terrain is not None and key not in self.generated_chunks:
+                self.apply_generated_chunk(*key, terrain)
+                self.generated_chunks.add(key)
+                self.chunk_dirty = True
+
+    def _fill_chunk(self, cx, cz, generate=True):
+        if (cx, cz) in self.world.stored_chunks:
+            # 已存檔的區塊直接從區域檔讀入
+            try:
+                self.world.load_chunk(cx, cz)
+            except OSError as e:
+                # 暫時讀不到: 放回索引下次再試，不能生成新地形蓋掉存檔
+                logging.error(f"讀取區塊 ({cx}, {cz}) 失敗，稍後重試: {e}", exc_info=True)
+                self.world.stored_chunks.add((cx, cz))
+                return
+            except Exception as e:
+                # 區塊資料損壞就重新生成，不然會留下一個洞，周圍的區塊也一直等不到它建網格
+                logging.error(f"區塊 ({cx}, {cz}) 資料損壞，重新生成: {e}", exc_info=True)
+                self.generated_chunks.discard((cx, cz))
+        if generate and (cx, cz) not in self.generated_chunks:
+            self.generate_chunk(cx, cz)
+            self.generated_chunks.add((cx, cz))
+        chunk = self.world.get_chunk(cx, cz)
+        if chunk is not None and chunk.light is None:
+            # 從區域檔讀入的區塊只存方塊，光照在載入時重新計算
+            self.world.lighting.light_chunk(cx, cz)
+
+    def _mesh_ready(self, cx, cz):
+        # 區塊與周圍八個區塊都生成完才建網格，避免邊界的面與角落的遮蔽建了又要重建
+        for key in ((cx + dx, cz + dz) for dx, dz in MESH_NEIGHBORHOOD):
+            if key not in self.generated_chunks or self.world.get_chunk(*key) is None:
+                return False
+        return True
+
+    def _unload_far_chunks(self, player_chunk_x, player_chunk_z):
+        # 上一批卸載與自動存檔的區塊都寫完了，就不用再留著它們的陣列
+        if (self.world.unsaved_chunks or self.world.pending_save) and self.saver.idle():
+            self.world.modified_chunks.update(self.saver.take_failed())
+            self.world.forget_unsaved()
+
+        far_chunks = [(cx, cz) for cx, cz in self.world.chunk_keys()
+                      if max(abs(cx - player_chunk_x), abs(cz - player_chunk_z)) > self.chunk_unload_distance]
+        dirty = {}
+        for cx, cz in far_chunks:
+            blocks = self.world.unload_chunk(cx, cz)
+            if blocks is not None:
+                dirty[(cx, cz)] = blocks
+
+        # 每個區塊有方塊與光照兩個 CHUNK_VOLUME 大小的陣列
+        max_chunks = min(self.max_loaded_chunks, self.max_loaded_bytes // (2 * CHUNK_VOLUME))
+        evicted_before = self.world.evictions
+        if len(self.world.chunks) > max_chunks:
+            d = self.chunk_load_distance
+            keep = {(cx, cz) for cx in range(player_chunk_x - d, player_chunk_x + d + 1)
+                    for cz in range(player_chunk_z - d, player_chunk_z + d + 1)}
+            dirty.update(self.world.evict_lru(max_chunks, keep))
+
+        if dirty:
+            self.saver.submit(dirty)
+        if far_chunks or self.world.evictions != evicted_before:
             self.chunk_dirty = True
+            logging.info(f"Unloaded {len(far_chunks) + self.world.evictions - evicted_before} chunks ({len(dirty)} written back). "
+                         f"Resident {len(self.world.chunks)} chunks / {self.world.resident_bytes() // 1024} KB, "
+                         f"hits {self.world.cache_hits}, misses {self.world.cache_misses}, evictions {self.world.evictions}.")
 
 
     def load_world(self):
-        self.init_world_file()
-        world_file_path = os.path.join(MAIN_SCRIPT_DIR, "worlds", "world.json")
+        world_dir = os.path.join(MAIN_SCRIPT_DIR, "worlds")
+        self.region_store = RegionStore(os.path.join(world_dir, "region"))
+        self.saver = BackgroundSaver(self.region_store)
+        self.convert_legacy_world_file()
+        self.load_world_seed(os.path.join(world_dir, "level.json"))
+        self.world = ChunkedWorld()
+        self.world.solid = self.block_registry.solid
+        self.world.lighting = LightEngine(self.world, self.block_registry)
         try:
-            with open(world_file_path, "r", encoding='utf-8') as f: content = f.read()
-            data = json.loads(content) if content.strip() else {}
-            
-            if isinstance(data, dict):
-                self.world = {tuple(map(int, k.split(','))): v for k, v in data.items()}
-                if self.world:
-                    for x, y, z in self.world.keys():
-                        self.generated_chunks.add((math.floor(x / self.chunk_size), math.floor(z / self.chunk_size)))
-                    logging.info(f"World data loaded. {len(self.world)} blocks, {len(self.generated_chunks)} chunks.")
-            else: logging.warning(f"World data format error. Starting fresh.")
-        except (json.JSONDecodeError, FileNotFoundError, Exception) as e:
-            logging.error(f"Error reading world file {world_file_path}: {e}. Starting fresh.", exc_info=True)
+            # 只讀區域檔索引，區塊等 _manage_world_chunks 需要時才載入
+            stored_chunks = self.world.attach_store(self.region_store)
+            self.generated_chunks.update(stored_chunks)
+            # 先載入玩家所在與周圍的已存檔區塊，ensure_player_on_surface 需要用到
+            player_chunk_x = math.floor(self.position[0] / self.chunk_size)
+            player_chunk_z = math.floor(self.position[2] / self.chunk_size)
+            for cx in range(player_chunk_x - 1, player_chunk_x + 2):
+                for cz in range(player_chunk_z - 1, player_chunk_z + 2):
+                    self._fill_chunk(cx, cz, generate=False)
+            # 地形有高低起伏，腳下的區塊要先生成才能把玩家放到地表上
+            self._fill_chunk(player_chunk_x, player_chunk_z)
+            if stored_chunks:
+                logging.info(f"World index loaded. {len(stored_chunks)} chunks on disk, {len(self.world.chunks)} loaded around the player.")
+        except Exception as e:
+            logging.error(f"Error loading the world around the player from {self.region_store.directory}: {e}", exc_info=True)
         self.chunk_dirty = True
 
-    def init_world_file(self):
-        path=os.path.join(MAIN_SCRIPT_DIR,"worlds","world.json"); os.makedirs(os.path.dirname(path),exist_ok=True)
-        if not os.path.exists(path) or os.path.getsize(path)==0:
-            try:
-                with open(path,"w",encoding='utf-8') as f: json.dump({},f); logging.info(f"Initialized empty world file at {path}")
-            except IOError as e: logging.error(f"Error initializing world file {path}: {e}", exc_info=True)
+    def load_world_seed(self, level_path):
+        # 種子跟著存檔走，同一個世界重新生成的區塊內容永遠一樣
+        self.world_seed = load_world_seed(level_path)
+
+    def convert_legacy_world_file(self):
+        # 舊版 worlds/world.json 只在第一次啟動時轉成區域檔，原檔保留為 .bak
+        path = os.path.join(MAIN_SCRIPT_DIR, "worlds", "world.json")
+        if not os.path.exists(path) or self.region_store.region_coords():
+            return
+        try:
+            convert_json_world(path, self.region_store.directory)
+            os.replace(path, path + ".bak")
+            logging.info(f"Legacy world file converted; original kept at {path}.bak")
+        except (json.JSONDecodeError, ValueError, OSError) as e:
+            logging.error(f"轉換舊版世界檔 {path} 失敗: {e}", exc_info=True)
+
+    def _player_data(self):
+        return {
+            "player_id": self.player_id,
+            "mode": self.mode, 
+            "position": [round(p, 2) for p in self.position],
+            "rotation": [round(r, 2) for r in self.rotation],
+            "hotbar": self.hotbar,
+            "main_inventory": self.main_inventory,
+            "inventory_crafting_grid": self.inventory_crafting_grid,
+            "crafting_table_grid": self.crafting_table_grid,
+            "current_hotbar_index": self.current_hotbar_index
+        }
+
+    def queue_save(self):
+        """在主執行緒取得區塊與玩家資料的快照並交給背景存檔，回傳快照的區塊數。"""
+        player_data_file_path=os.path.join(MAIN_SCRIPT_DIR,"playerdata","player.json")
+        os.makedirs(os.path.dirname(player_data_file_path),exist_ok=True)
+        # 上次背景寫入失敗的區塊重新標記，這次再試
+        self.world.modified_chunks.update(self.saver.take_failed())
+        snapshots = self.world.snapshot_modified_chunks()
+        player_json = json.dumps(self._player_data(), indent=2, ensure_ascii=False).encode('utf-8')
+        self.saver.submit(snapshots, [(player_data_file_path, player_json)])
+        return len(snapshots)
+
+    def autosave(self, dt=0):
+        try:
+            start = time.perf_counter()
+            chunk_count = self.queue_save()
+            self.last_autosave_ms = (time.perf_counter() - start) * 1000
+            logging.info(f"Autosave queued: {chunk_count} modified chunks, main thread {self.last_autosave_ms:.2f} ms.")
+        except Exception as e: logging.error(f"自動存檔失敗:{e}", exc_info=True)
 
     def save_game(self):
-        world_file_path=os.path.join(MAIN_SCRIPT_DIR,"worlds","world.json"); player_data_file_path=os.path.join(MAIN_SCRIPT_DIR,"playerdata","player.json")
-        os.makedirs(os.path.dirname(world_file_path),exist_ok=True); os.makedirs(os.path.dirname(player_data_file_path),exist_ok=True)
         try:
-            world_serializable={f"{k[0]},{k[1]},{k[2]}":v for k,v in self.world.items()}
-            with open(world_file_path,"w",encoding='utf-8') as f: json.dump(world_serializable,f,indent=2,ensure_ascii=False)
-            
             self._return_held_and_crafting_items()
-
-            player_data={
-                "player_id": self.player_id,
-                "mode": self.mode, 
-                "position": [round(p, 2) for p in self.position],
-                "rotation": [round(r, 2) for r in self.rotation],
-                "hotbar": self.hotbar,
-                "main_inventory": self.main_inventory,
-                "inventory_crafting_grid": self.inventory_crafting_grid,
-                "crafting_table_grid": self.crafting_table_grid,
-                "current_hotbar_index": self.current_hotbar_index
-            }
-            with open(player_data_file_path,"w",encoding='utf-8') as f: json.dump(player_data,f,indent=2,ensure_ascii=False)
-            logging.info(f"Game saved. World ({len(world_serializable)} blocks) to {world_file_path}. Player data to {player_data_file_path}")
+            chunk_count = self.queue_save()
+            # 離開遊戲時要等背景執行緒寫完
+            self.saver.flush()
+            failed = self.saver.take_failed()
+            if failed:
+                self.world.modified_chunks.update(failed)
+                logging.error(f"儲存遊戲失敗: {len(failed)} 個區塊未寫入")
+                return
+            logging.info(f"Game saved. World ({chunk_count} modified chunks) to {self.region_store.directory}. Player data to playerdata/player.json")
         except Exception as e: logging.error(f"儲存遊戲失敗:{e}", exc_info=True)
 
 
@@ -979,25 +1030,18 @@ class Game:
             self.breaking_effect_batch.draw()
             gl.glDisable(gl.GL_BLEND)
 
+    def player_box(self, pos_x, pos_y, pos_z):
+        half_width = self.player_width / 2
+        return (pos_x - half_width, pos_y, pos_z - half_width), (pos_x + half_width, pos_y + self.player_height, pos_z + half_width)
+
     def check_collision_bbox(self, pos_x, pos_y, pos_z):
-        player_width, non_solid_blocks = 0.6, {"oak_leaves", "birch_leaves"}
-        min_x,max_x = pos_x - player_width/2, pos_x + player_width/2
-        min_y,max_y = pos_y, pos_y + self.player_height 
-        min_z,max_z = pos_z - player_width/2, pos_z + player_width/2
-
-        for ix in range(math.floor(min_x),math.ceil(max_x)):
-            for iy in range(math.floor(min_y),math.ceil(max_y)):
-                for iz in range(math.floor(min_z),math.ceil(max_z)):
-                    block_type=self.world.get((ix,iy,iz))
-                    if block_type and block_type not in non_solid_blocks:
-                        block_min_x,block_max_x=ix,ix+1
-                        block_min_y,block_max_y=iy,iy+1
-                        block_min_z,block_max_z=iz,iz+1
-                        if (min_x<block_max_x and max_x>block_min_x and \
-                            min_y<block_max_y and max_y>block_min_y and \
-                            min_z<block_max_z and max_z>block_min_z):
-                            return True 
-        return False 
+        return box_hits_solid(self.world, self.block_registry.solid, *self.player_box(pos_x, pos_y, pos_z))
+
+    def move_player_axis(self, axis, delta):
+        """沿 axis (0 x, 1 y, 2 z) 移動玩家，碰到方塊就停在它前面，回傳 (碰撞時間 t, 法向量分量)。"""
+        t, normal = sweep_aabb(self.world, self.block_registry.solid, *self.player_box(*self.position), axis, delta)
+        self.position[axis] += delta * t
+        return t, normal
 
     def get_selected_block_type(self): return self.selected_block
 
@@ -1011,33 +1055,8 @@ class Game:
         yaw,pitch = self.rotation[0], self.rotation[1]
         rad_yaw,rad_pitch = math.radians(yaw), math.radians(pitch)
         
-        dx_view, dy_view, dz_view = math.cos(rad_pitch) * -math.sin(rad_yaw), math.sin(rad_pitch), math.cos(rad_pitch) * -math.cos(rad_yaw)
-
-        step_size, last_air_block_coord = 0.05, None
-
-        for i in range(int(max_distance/step_size)+1): 
-            current_x, current_y, current_z = eye_x + dx_view*i*step_size, eye_y + dy_view*i*step_size, eye_z + dz_view*i*step_size
-            block_pos_tuple=(math.floor(current_x),math.floor(current_y),math.floor(current_z))
-
-            if block_pos_tuple in self.world: 
-                face_hit=[0,0,0] 
-                if last_air_block_coord:
-                    diff_x, diff_y, diff_z = last_air_block_coord[0]-block_pos_tuple[0], last_air_block_coord[1]-block_pos_tuple[1], last_air_block_coord[2]-block_pos_tuple[2]
-                    if abs(diff_x) > abs(diff_y) and abs(diff_x) > abs(diff_z): face_hit[0]=int(math.copysign(1, diff_x))
-                    elif abs(diff_y) > abs(diff_z): face_hit[1]=int(math.copysign(1, diff_y))
-                    else: face_hit[2]=int(math.copysign(1, diff_z))
-                else: 
-                    frac_x, frac_y, frac_z = current_x - block_pos_tuple[0] - 0.5, current_y - block_pos_tuple[1] - 0.5, current_z - block_pos_tuple[2] - 0.5
-                    abs_fx,abs_fy,abs_fz=abs(frac_x),abs(frac_y),abs(frac_z)
-                    if abs_fx>abs_fy and abs_fx>abs_fz: face_hit[0]=1 if frac_x<0 else -1
-                    elif abs_fy>abs_fz: face_hit[1]=1 if frac_y<0 else -1
-                    else: face_hit[2]=1 if frac_z<0 else -1
-                
-                if face_hit==[0,0,0]: face_hit=[0,1,0] 
-                return block_pos_tuple,tuple(face_hit)
-            
-            last_air_block_coord=block_pos_tuple 
-        return None 
+        direction = (math.cos(rad_pitch) * -math.sin(rad_yaw), math.sin(rad_pitch), math.cos(rad_pitch) * -math.cos(rad_yaw))
+        return raycast_block(self.world.get_id, self.block_registry.targetable, (eye_x, eye_y, eye_z), direction, max_distance)
 
     def sort_main_inventory(self):
         if not self.show_inventory: return
@@ -1185,6 +1204,27 @@ class Game:
             else:
                 self.add_chat_feedback(f"無效的目標選擇器 '{args[0]}'", color=error_color)
 
+        elif cmd == "/seed":
+            self.add_chat_feedback(f"種子: [{self.world_seed}]")
+
+        elif cmd == "/tickrate":
+            if len(args) == 1 and args[0].isdigit() and 1 <= int(args[0]) <= 240:
+                self.timestep.tick_rate = int(args[0])
+                self.add_chat_feedback(f"模擬速率已設為每秒 {self.timestep.tick_rate} 次。")
+            else:
+                self.add_chat_feedback(f"用法: /tickrate <1-240> (目前 {self.timestep.tick_rate})", color=error_color)
+
+        elif cmd == "/greedy":
+            if len(args) == 1 and args[0] in ("on", "off"):
+                self.greedy_meshing = args[0] == "on"
+                # 所有區塊網格都要重建
+                for chunk_key in list(self.chunk_meshes):
+                    self.delete_chunk_mesh(chunk_key)
+                self.chunk_dirty = True
+                self.add_chat_feedback(f"Greedy meshing 已{'開啟' if self.greedy_meshing else '關閉'}。")
+            else:
+                self.add_chat_feedback("用法: /greedy <on|off>", color=error_color)
+
         else:
             self.add_chat_feedback(f"未知或無效的指令: '{command_text.split()[0]}'", color=error_color)
 
@@ -1449,16 +1489,8 @@ class Game:
             self.is_sprinting = False
 
     def update(self, dt):
-        if self.chat_feedback_messages:
-            current_time = time.time()
-            self.chat_feedback_messages = [msg for msg in self.chat_feedback_messages if msg['expiry'] > current_time]
-
+        """一個固定步長的模擬 tick: 只做移動、物理與挖掘，介面與區塊管理在 advance 每幀做一次。"""
         if self.pause_menu or self.show_keybinding_menu: return 
-        if dt > 0.1: dt = 0.1
-
-        self._update_tooltip()
-        
-        self._manage_world_chunks()
 
         old_player_chunk_x = math.floor(self.position[0] / self.chunk_size)
         old_player_chunk_z = math.floor(self.position[2] / self.chunk_size)
@@ -1508,7 +1540,7 @@ class Game:
                     if 'sneak' not in self.conflicting_actions and self.is_action_pressed('sneak'): 
                         dy_input_creative_fly -= current_speed * dt
             
-            player_width = 0.6
+            player_width = self.player_width
             
             next_pos_x = self.position[0] + dx_input
             if self.is_sneaking and self.on_ground:
@@ -1518,8 +1550,8 @@ class Game:
                     dx_input = 0
                     next_pos_x = self.position[0]
             
-            if not self.check_collision_bbox(next_pos_x, self.position[1], self.position[2]):
-                self.position[0] = next_pos_x
+            # 掃掠碰撞盒: 沿途的每一格都會檢查，碰到牆就貼著牆停下
+            self.move_player_axis(0, dx_input)
             
             next_pos_z = self.position[2] + dz_input
             if self.is_sneaking and self.on_ground:
@@ -1529,47 +1561,32 @@ class Game:
                     dz_input = 0
                     next_pos_z = self.position[2]
 
-            if not self.check_collision_bbox(self.position[0], self.position[1], next_pos_z):
-                self.position[2] = next_pos_z
+            self.move_player_axis(2, dz_input)
 
 
             if self.mode == "creative" and self.is_flying_creative:
                 self.on_ground = False 
                 self.velocity[1] = 0   
                 
-                next_pos_y_fly = self.position[1] + dy_input_creative_fly
-                if not self.check_collision_bbox(self.position[0], next_pos_y_fly, self.position[2]):
-                    self.position[1] = next_pos_y_fly
-                else: 
-                    if dy_input_creative_fly < 0: 
-                        self.position[1] = math.floor(next_pos_y_fly) + 1.0 
-                        if self.check_collision_bbox(self.position[0], self.position[1] - 0.01, self.position[2]):
-                            self.is_flying_creative = False 
-                            self.on_ground = True
-                    elif dy_input_creative_fly > 0: 
-                        self.position[1] = math.floor(next_pos_y_fly + self.player_height) - self.player_height - 0.01 
+                _, normal_y = self.move_player_axis(1, dy_input_creative_fly)
+                if normal_y > 0:
+                    # 往下飛碰到地面就落地
+                    self.is_flying_creative = False 
+                    self.on_ground = True
             else: 
                 self.velocity[1] += self.gravity * dt
                 self.velocity[1] = max(self.velocity[1], -50.0) 
                 
-                next_pos_y_normal = self.position[1] + self.velocity[1] * dt
-                self.on_ground = False 
-
-                if not self.check_collision_bbox(self.position[0], next_pos_y_normal, self.position[2]):
-                    self.position[1] = next_pos_y_normal
-                else: 
-                    if self.velocity[1] <= 0: 
-                        self.position[1] = math.floor(next_pos_y_normal) + 1.0 
-                        self.on_ground = True
-                        self.velocity[1] = 0 
-                    elif self.velocity[1] > 0: 
-                        self.position[1] = math.floor(next_pos_y_normal + self.player_height) - self.player_height - 0.01
-                        self.velocity[1] = 0 
+                # 終端速度 -50 配上 dt 0.1 一個 tick 會走 5 格，掃掠才不會穿過地板
+                _, normal_y = self.move_player_axis(1, self.velocity[1] * dt)
+                self.on_ground = normal_y > 0
+                if normal_y:
+                    self.velocity[1] = 0 
 
         if self.breaking_block_pos and not self.show_inventory and not self.pause_menu and not self.show_crafting_table_ui:
             block_type_at_breaking_pos = self.world.get(self.breaking_block_pos)
             if block_type_at_breaking_pos:
-                required_time = self.break_time_map.get(block_type_at_breaking_pos, 3.0) 
+                required_time = self.block_registry.break_time[block_id(block_type_at_breaking_pos)]
                 elapsed_time = time.time() - self.breaking_block_start_time
                 
                 current_target_info = self.get_target_block(max_distance=5) 
@@ -1597,7 +1614,7 @@ class Game:
 
         if self.mode == "survival" and self.position[1] < -60: 
             logging.warning("Player fell out of the world in survival mode. Resetting position.")
-            self.position = [self.position[0], 30.0, self.position[2]] 
+            self.position = [self.position[0], self.fallback_surface_y(math.floor(self.position[0]), math.floor(self.position[2])), self.position[2]]
             self.velocity = [0,0,0]; self.on_ground = False
             self.ensure_player_on_surface() 
             self.chunk_dirty = True 
@@ -1606,25 +1623,45 @@ class Game:
         new_player_chunk_z = math.floor(self.position[2] / self.chunk_size)
         if new_player_chunk_x != old_player_chunk_x or new_player_chunk_z != old_player_chunk_z:
             self.chunk_dirty = True
-        
+
+    def _update_hud_labels(self):
         sneak_status = " Sneaking" if self.is_sneaking else ""
         sprint_status = " Sprinting" if self.is_sprinting else ""
         fly_status = " Flying" if self.mode=="creative" and self.is_flying_creative else ""
-        self.pos_label.text = (f"Pos:({self.position[0]:.1f},{self.position[1]:.1f},{self.position[2]:.1f}) R:({self.rotation[0]:.0f},{self.rotation[1]:.0f}) Ground:{self.on_ground} Mode:{self.mode}{sneak_status}{sprint_status}{fly_status} V_Y:{self.velocity[1]:.1f}")
+        self.pos_label.text = (f"Pos:({self.position[0]:.1f},{self.position[1]:.1f},{self.position[2]:.1f}) R:({self.rotation[0]:.0f},{self.rotation[1]:.0f}) Ground:{self.on_ground} Mode:{self.mode}{sneak_status}{sprint_status}{fly_status} V_Y:{self.velocity[1]:.1f} Gen queue:{len(self.chunk_queue)} Mesh queue:{self.mesh_pool.queue_depth()}")
         if self.mode == "survival": 
             self.hp_label.text = f"HP:{self.hp}/{self.max_hp}"
             self.hunger_label.text = f"Hunger:{self.hunger}/{self.max_hunger}"
 
-    def get_camera_position(self):
+    def advance(self, dt):
+        """每幀呼叫一次，依經過的時間以固定步長執行零到數個 update，再做每幀一次的介面更新與區塊管理。"""
+        if self.chat_feedback_messages:
+            current_time = time.time()
+            self.chat_feedback_messages = [msg for msg in self.chat_feedback_messages if msg['expiry'] > current_time]
+        self.timestep.advance(dt, self.simulation_tick)
+        if self.pause_menu or self.show_keybinding_menu: return
+        # 追趕好幾個 tick 的那一幀也只做一次，區塊的時間預算不會跟著 tick 數倍增
+        self._update_tooltip()
+        self._manage_world_chunks()
+        self._update_hud_labels()
+
+    def simulation_tick(self, dt):
+        self.previous_position = list(self.position)
+        self.update(dt)
+
+    def get_camera_position(self, alpha=1.0):
         eye_y_offset = self.player_height * 0.85
         if self.is_sneaking and self.mode == "survival":
             eye_y_offset -= self.sneak_camera_offset_y
         
-        player_eye_x = self.position[0]
-        player_eye_y = self.position[1] + eye_y_offset
-        player_eye_z = self.position[2]
+        player_eye_x, player_eye_y, player_eye_z = self.position
+        previous = self.previous_position
+        if alpha < 1.0 and max(abs(a - b) for a, b in zip(self.position, previous)) <= self.max_interpolation_distance:
+            player_eye_x = previous[0] + (player_eye_x - previous[0]) * alpha
+            player_eye_y = previous[1] + (player_eye_y - previous[1]) * alpha
+            player_eye_z = previous[2] + (player_eye_z - previous[2]) * alpha
         
-        return (player_eye_x, player_eye_y, player_eye_z)
+        return (player_eye_x, player_eye_y + eye_y_offset, player_eye_z)
 
     def setup_3d(self):
         w,h=self.window.get_size()
@@ -1650,7 +1687,7 @@ class Game:
         gl.glRotatef(-self.rotation[1],1.0,0.0,0.0)
         gl.glRotatef(-self.rotation[0],0.0,1.0,0.0)
 
-        cam_x, cam_y, cam_z = self.get_camera_position()
+        cam_x, cam_y, cam_z = self.get_camera_position(self.timestep.alpha)
         gl.glTranslatef(-cam_x, -cam_y, -cam_z)
 
     def setup_2d(self):
@@ -1668,11 +1705,7 @@ class Game:
     def _draw_item_texture_in_slot(self, item_id, x, y, size):
         if not item_id: return
         
-        texture_key = item_id
-        if item_id == "grass_block": texture_key = "grass_block_top"
-        elif item_id == "oak_log": texture_key = "oak_log_side"
-        elif item_id == "birch_log": texture_key = "birch_log_side"
-        elif item_id == "crafting_table": texture_key = "crafting_table_top"
+        texture_key = self.block_registry.icon_texture[block_id(item_id)] or item_id
         
         texture_group = self.texture_groups.get(texture_key)
         if not texture_group: return
@@ -2237,7 +2270,7 @@ class Game:
                                        player_min_y<block_max_y_place and player_max_y>block_min_y_place and \
                                        player_min_z<block_max_z_place and player_max_z>block_min_z_place)
 
-                    if place_pos not in self.world and not intersects_player:
+                    if place_pos not in self.world and not intersects_player and 0 <= place_pos[1] < WORLD_HEIGHT:
                         self.world[place_pos]=selected_type_id
                         action_taken=True
                         self.trigger_arm_swing_animation()
@@ -2597,7 +2630,7 @@ class Game:
         self._refresh_inventory_display_layout()
 
 
-def run_game():
+def run_game(worker_processes=0, tick_rate=60):
     window = None
     game_instance = None
     try:
@@ -2614,7 +2647,7 @@ def run_game():
         return
 
     try:
-        game_instance = Game(window)
+        game_instance = Game(window, worker_processes, tick_rate)
         if game_instance:
             window.push_handlers(
                 game_instance.on_key_press, game_instance.on_key_release,
@@ -2632,13 +2665,15 @@ def run_game():
         if window and not window.has_exit: window.close()
         return
 
-    pyglet.clock.schedule_interval(game_instance.update, 1 / 60.0) 
+    # advance 每幀 (1/60 秒) 呼叫一次: 模擬 (update) 在裡面以 tick_rate 的固定步長執行零到數次，介面與區塊管理每幀一次
+    pyglet.clock.schedule_interval(game_instance.advance, 1 / 60.0) 
+    pyglet.clock.schedule_interval(game_instance.autosave, game_instance.autosave_interval)
 
     @window.event
     def on_draw():
         window.clear()
         game_instance.setup_3d()
-        if game_instance.chunk_dirty: game_instance.rebuild_world_geometry()
+        game_instance.rebuild_world_geometry()
             
         game_instance.world_batch.draw()
         
@@ -2699,7 +2734,9 @@ def run_game():
 
     @window.event
     def on_close():
-        if game_instance: game_instance.save_game()
+        if game_instance:
+            game_instance.save_game()
+            game_instance.mesh_pool.shutdown()
         logging.info("遊戲視窗關閉事件觸發 (on_close)。Pyglet app將立即退出。")
 
     logging.info("開始 Pyglet 應用程式主循環...")
@@ -2710,4 +2747,16 @@ def run_game():
         window.close()
 
 if __name__ == "__main__":
-    run_game()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Minecraft Py")
+    parser.add_argument("--pregen", type=int, metavar="RADIUS", help="不開視窗，預先生成並儲存半徑 RADIUS 區塊內的世界")
+    parser.add_argument("--center", type=int, nargs=2, default=(0, 0), metavar=("CX", "CZ"), help="預先生成的中心區塊座標")
+    parser.add_argument("--workers", type=int, default=None, help="預先生成使用的行程數 (預設為 CPU 核心數)")
+    parser.add_argument("--worker-processes", type=int, default=0, metavar="N",
+                        help="遊戲中用 N 個工作行程生成區塊與網格，網格資料透過共享記憶體交換 (預設 0: 使用執行緒)")
+    parser.add_argument("--tick-rate", type=int, default=60, help="每秒模擬次數 (預設 60)，較慢的電腦可以調低，畫面會內插")
+    # 啟動器會另外傳 --mode，這裡不處理
+    args, _ = parser.parse_known_args()
+    if args.pregen is not None:
+        pregen_world(os.path.join(MAIN_SCRIPT_DIR, "worlds"), args.pregen, tuple(args.center), args.workers)
+    else:
+        run_game(args.worker_processes, args.tick_rate)
\ No newline at end of file
@@ -0,0 +1,256 @@
+from collections import deque
+
+import numpy as np
+
+from world_storage import CHUNK_SIZE, WORLD_HEIGHT
+
+MAX_LIGHT = 15
+# chunk.light 一格一個 byte: 高 4 位元是天空光、低 4 位元是方塊光 (兩個 nibble)
+SKY = 4
+BLOCK = 0
+# 光照等級對應的頂點顏色亮度，0 級保留一點亮度，洞穴裡不會全黑
+MIN_BRIGHTNESS = 0.08
+LIGHT_BRIGHTNESS = tuple(round(255 * (MIN_BRIGHTNESS + (1 - MIN_BRIGHTNESS) * f / (4 - 3 * f)))
+                         for f in (level / MAX_LIGHT for level in range(MAX_LIGHT + 1)))
+# 以 chunk.light 的 byte 為索引，天空光與方塊光取較亮的
+LIGHT_COLORS = tuple(LIGHT_BRIGHTNESS[max(value >> SKY, value & 15)] for value in range(256))
+
+# 六個方向，順序同 face_index: 0 +x 1 -x 2 上 3 下 4 +z 5 -z
+_DIRECTIONS = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+# 鄰近區塊 (dx, dz)、這個區塊的邊界切片、鄰居那一側的邊界切片 ([y][z][x])
+_BORDERS = (
+    ((1, 0), (slice(None), slice(None), -1), (slice(None), slice(None), 0)),
+    ((-1, 0), (slice(None), slice(None), 0), (slice(None), slice(None), -1)),
+    ((0, 1), (slice(None), -1, slice(None)), (slice(None), 0, slice(None))),
+    ((0, -1), (slice(None), 0, slice(None)), (slice(None), -1, slice(None))),
+)
+
+
+def _light_view(chunk):
+    return np.frombuffer(chunk.light, dtype=np.uint8).reshape(WORLD_HEIGHT, CHUNK_SIZE, CHUNK_SIZE)
+
+
+def _flood(light, opacity, height):
+    """light: 外圍加一圈的 (WORLD_HEIGHT + 2, 18, 18)，內部已放好光源。逐層往外擴散 (每一輪就是 BFS 的下一層)。
+
+    只處理 height 以下的層，上面整片是空氣、已經是最亮。
+    """
+    passes = opacity[:height] < MAX_LIGHT
+    attenuation = np.maximum(opacity[:height], 1)
+    inner = light[1:height + 1, 1:-1, 1:-1]
+    for _ in range(MAX_LIGHT - 1):
+        best = np.maximum.reduce((light[2:height + 2, 1:-1, 1:-1], light[0:height, 1:-1, 1:-1],
+                                  light[1:height + 1, 2:, 1:-1], light[1:height + 1, :-2, 1:-1],
+                                  light[1:height + 1, 1:-1, 2:], light[1:height + 1, 1:-1, :-2]))
+        spread = np.where(passes, best - attenuation, 0)
+        if not (spread > inner).any():
+            break
+        np.maximum(inner, spread, out=inner)
+
+
+class LightEngine:
+    """天空光與方塊光 (各 0~15)，存在每個區塊的 chunk.light。
+
+    新生成或讀入的區塊用 light_chunk 整塊計算，之後 set_id 改變方塊時只從那一格
+    做增量的移除/加入傳播，影響範圍最多 15 格，不會重算整個世界。
+    光照有改變的區塊 (以及邊界上被影響的鄰居) 會標記成需要重建網格。
+    """
+
+    def __init__(self, world, registry):
+        self.world = world
+        # 以方塊 ID 為索引: 光通過時減少多少 (15 = 完全擋住)、自己發出多亮的光
+        self.opacity = registry.light_opacity
+        self.emission = registry.light_emission
+        # 統計: 增量更新改寫過的格數
+        self.cells_updated = 0
+        self._changed_columns = set()
+
+    # --- 整塊計算 ---
+    def light_chunk(self, cx, cz):
+        """計算 (cx, cz) 的光照，鄰居邊界的光當作光源，算完再把這個區塊的光傳進已計算的鄰居。"""
+        world = self.world
+        chunk = world.chunks.get((cx, cz))
+        if chunk is None:
+            return
+        ids = np.frombuffer(chunk.blocks, dtype=np.uint8).reshape(WORLD_HEIGHT, CHUNK_SIZE, CHUNK_SIZE)
+        opacity_table = np.array(self.opacity, dtype=np.int8)
+        opacity = opacity_table[ids]
+        emission = np.array(self.emission, dtype=np.int8)[ids]
+        layers = np.flatnonzero(ids.reshape(WORLD_HEIGHT, -1).any(axis=1))
+        height = min(int(layers[-1]) + 2, WORLD_HEIGHT) if layers.size else 0
+        neighbors = [(world.chunks.get((cx + dx, cz + dz)), border) for (dx, dz), _, border in _BORDERS]
+
+        channels = []
+        for shift in (SKY, BLOCK):
+            light = np.zeros((WORLD_HEIGHT + 2, CHUNK_SIZE + 2, CHUNK_SIZE + 2), dtype=np.int8)
+            if shift == SKY:
+                # 從頂端往下，一路都沒有任何阻擋的格子是 15 (天空光往下不衰減)
+                light[1:-1, 1:-1, 1:-1] = np.where(np.cumsum(opacity[::-1], axis=0, dtype=np.int32)[::-1] == 0, MAX_LIGHT, 0)
+            else:
+                light[1:-1, 1:-1, 1:-1] = emission
+            for ((dx, dz), _, _), (neighbor, border) in zip(_BORDERS, neighbors):
+                if neighbor is not None and neighbor.light is not None:
+                    ring = (slice(1, -1), slice(1, -1) if dz == 0 else (-1 if dz > 0 else 0),
+                            slice(1, -1) if dx == 0 else (-1 if dx > 0 else 0))
+                    light[ring] = (_light_view(neighbor)[border] >> shift) & 15
+            if shift == SKY:
+                _flood(light, opacity, height)
+            elif light.any():
+                # 方塊光可能從鄰居照進上方的空氣，不能只算到地表
+                _flood(light, opacity, WORLD_HEIGHT)
+            channels.append(light[1:-1, 1:-1, 1:-1].astype(np.uint8))
+        chunk.light = bytearray(((channels[0] << SKY) | channels[1]).tobytes())
+
+        # 往外: 邊界上比鄰居亮的格子，從鄰居那一格開始增量傳播
+        for shift in (SKY, BLOCK):
+            queue = deque()
+            for ((dx, dz), own, _), (neighbor, border) in zip(_BORDERS, neighbors):
+                if neighbor is None or neighbor.light is None:
+                    continue
+                theirs = _light_view(neighbor)
+                their_level = (theirs[border] >> shift) & 15
+                their_opacity = opacity_table[
+                    np.frombuffer(neighbor.blocks, dtype=np.uint8).reshape(WORLD_HEIGHT, CHUNK_SIZE, CHUNK_SIZE)[border]]
+                candidate = channels[0 if shift == SKY else 1][own].astype(np.int8) - np.maximum(their_opacity, 1)
+                brighter = (candidate > their_level) & (their_opacity < MAX_LIGHT)
+                if not brighter.any():
+                    continue
+                for y, along in zip(*np.nonzero(brighter)):
+                    lx = along if dx == 0 else (0 if dx > 0 else CHUNK_SIZE - 1)
+                    lz = along if dz == 0 else (0 if dz > 0 else CHUNK_SIZE - 1)
+                    x, z = (cx + dx) * CHUNK_SIZE + int(lx), (cz + dz) * CHUNK_SIZE + int(lz)
+                    self._set(neighbor, x, int(y), z, shift, int(candidate[y, along]))
+                    queue.append((x, int(y), z))
+            self._spread(queue, shift)
+        self._flush_changes()
+
+    # --- 增量更新 ---
+    def block_changed(self, x, y, z):
+        """(x, y, z) 的方塊剛被換掉: 先移除這一格原本的光 (以及從它傳出去的)，再從光源與鄰居重新傳播。"""
+        chunks = self.world.chunks
+        chunk = chunks.get((x >> 4, z >> 4))
+        if chunk is None or chunk.light is None:
+            return
+        i = (y << 8) | ((z & 15) << 4) | (x & 15)
+        bid = chunk.blocks[i]
+        for shift in (SKY, BLOCK):
+            relight = deque()
+            old = (chunk.light[i] >> shift) & 15
+            if old:
+                self._set(chunk, x, y, z, shift, 0)
+                self._unspread(deque(((x, y, z, old),)), shift, relight)
+            if shift == BLOCK and self.emission[bid]:
+                self._set(chunk, x, y, z, shift, self.emission[bid])
+                relight.append((x, y, z))
+            elif shift == SKY and y == WORLD_HEIGHT - 1 and self.opacity[bid] < MAX_LIGHT:
+                # 最上層直接照到天空
+                self._set(chunk, x, y, z, shift, MAX_LIGHT - self.opacity[bid])
+                relight.append((x, y, z))
+            # 四周的光可能照進這一格 (方塊被挖掉或換成透明的)
+            for dx, dy, dz in _DIRECTIONS:
+                if 0 <= y + dy < WORLD_HEIGHT:
+                    relight.append((x + dx, y + dy, z + dz))
+            self._spread(relight, shift)
+        self._flush_changes()
+
+    def _set(self, chunk, x, y, z, shift, value):
+        i = (y << 8) | ((z & 15) << 4) | (x & 15)
+        chunk.light[i] = (chunk.light[i] & (255 ^ (15 << shift))) | (value << shift)
+        self.cells_updated += 1
+        self._changed_columns.add((x, z))
+
+    def _spread(self, queue, shift):
+        """加入傳播: queue 裡每一格的光往六個方向擴散，只寫入能讓鄰居變亮的格子。"""
+        chunks = self.world.chunks
+        opacity = self.opacity
+        keep = 255 ^ (15 << shift)
+        changed = self._changed_columns
+        updated = 0
+        while queue:
+            x, y, z = queue.popleft()
+            chunk = chunks.get((x >> 4, z >> 4))
+            if chunk is None or chunk.light is None:
+                continue
+            level = (chunk.light[(y << 8) | ((z & 15) << 4) | (x & 15)] >> shift) & 15
+            if level <= 1:
+                continue
+            for dx, dy, dz in _DIRECTIONS:
+                ny = y + dy
+                if ny < 0 or ny >= WORLD_HEIGHT:
+                    continue
+                nx, nz = x + dx, z + dz
+                neighbor = chunks.get((nx >> 4, nz >> 4))
+                if neighbor is None or neighbor.light is None:
+                    continue
+                i = (ny << 8) | ((nz & 15) << 4) | (nx & 15)
+                cost = opacity[neighbor.blocks[i]]
+                if cost >= MAX_LIGHT:
+                    continue
+                # 只有滿格的天空光往下走不衰減
+                if not (shift == SKY and dy < 0 and level == MAX_LIGHT) and cost < 1:
+                    cost = 1
+                value = level - cost
+                light = neighbor.light
+                if value > (light[i] >> shift) & 15:
+                    light[i] = (light[i] & keep) | (value << shift)
+                    updated += 1
+                    changed.add((nx, nz))
+                    queue.append((nx, ny, nz))
+        self.cells_updated += updated
+
+    def _unspread(self, queue, shift, relight):
+        """移除傳播: queue 裡是 (x, y, z, 原本的光)，這些格子已經歸零。
+
+        比它暗的鄰居是被它照亮的，一起歸零並繼續往外；不比它暗的鄰居有別的光源，
+        放進 relight 之後再傳播回來。
+        """
+        chunks = self.world.chunks
+        emission = self.emission
+        keep = 255 ^ (15 << shift)
+        changed = self._changed_columns
+        updated = 0
+        while queue:
+            x, y, z, level = queue.popleft()
+            for dx, dy, dz in _DIRECTIONS:
+                ny = y + dy
+                if ny < 0 or ny >= WORLD_HEIGHT:
+                    continue
+                nx, nz = x + dx, z + dz
+                neighbor = chunks.get((nx >> 4, nz >> 4))
+                if neighbor is None or neighbor.light is None:
+                    continue
+                i = (ny << 8) | ((nz & 15) << 4) | (nx & 15)
+                light = neighbor.light
+                neighbor_level = (light[i] >> shift) & 15
+                if not neighbor_level:
+                    continue
+                if neighbor_level < level or (shift == SKY and dy < 0 and level == MAX_LIGHT):
+                    light[i] &= keep
+                    updated += 1
+                    changed.add((nx, nz))
+                    queue.append((nx, ny, nz, neighbor_level))
+                    source = emission[neighbor.blocks[i]] if shift == BLOCK else 0
+                    if source:
+                        # 被歸零的是光源本身，恢復它自己發出的光
+                        light[i] |= source << shift
+                        relight.append((nx, ny, nz))
+                else:
+                    relight.append((nx, ny, nz))
+        self.cells_updated += updated
+
+    def _flush_changes(self):
+        # 光照變了的格子所在的區塊要重建網格；在區塊邊界上的格子也會影響鄰居的面
+        mark = self.world.dirty_meshes.add
+        for x, z in self._changed_columns:
+            cx, cz = x >> 4, z >> 4
+            mark((cx, cz))
+            lx, lz = x & 15, z & 15
+            if lx == 0:
+                mark((cx - 1, cz))
+            elif lx == CHUNK_SIZE - 1:
+                mark((cx + 1, cz))
+            if lz == 0:
+                mark((cx, cz - 1))
+            elif lz == CHUNK_SIZE - 1:
+                mark((cx, cz + 1))
+        self._changed_columns.clear()
@@ -0,0 +1,90 @@
+import numpy as np
+
+# 2D 梯度方向 (四個對角 + 四個軸向)
+_GRAD_X = np.array([1, -1, 1, -1, 1, -1, 0, 0], dtype=np.float64)
+_GRAD_Z = np.array([1, 1, -1, -1, 0, 0, 1, -1], dtype=np.float64)
+# 3D 梯度: 立方體 12 條邊的方向，補 4 個重複的湊成 16 個 (Improved Perlin Noise)
+_GRAD3 = np.array([(1, 1, 0), (-1, 1, 0), (1, -1, 0), (-1, -1, 0), (1, 0, 1), (-1, 0, 1), (1, 0, -1), (-1, 0, -1),
+                   (0, 1, 1), (0, -1, 1), (0, 1, -1), (0, -1, -1), (1, 1, 0), (0, -1, 1), (-1, 1, 0), (0, -1, -1)],
+                  dtype=np.float64)
+_GRAD3_X, _GRAD3_Y, _GRAD3_Z = _GRAD3[:, 0].copy(), _GRAD3[:, 1].copy(), _GRAD3[:, 2].copy()
+
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+class FractalNoise:
+    """多個 octave 疊加的 Perlin 雜訊，所有 octave 在同一組陣列運算裡一起算。
+
+    每個 octave 有自己的排列表 (由 seed 決定)，建立一次後重複使用，
+    呼叫端應該依 seed 快取這個物件而不是每個區塊重建。
+    """
+
+    def __init__(self, seed, octaves=4, persistence=0.5, lacunarity=2.0):
+        rng = np.random.default_rng(seed)
+        perms = np.array([rng.permutation(256) for _ in range(octaves)], dtype=np.intp)
+        # 接成兩倍長，索引 +1 時不用再取餘數；攤平後以 octave * 512 為位移
+        self.perm = np.concatenate([perms, perms], axis=1).ravel()
+        # 最後一層查表直接查梯度編號，省掉每個角落各一次 & 7
+        self.gradient = self.perm & 7
+        # 3D 直接存每個雜湊值對應的梯度分量，一個角落少查一次表
+        self.gradient3 = [component[self.perm & 15] for component in (_GRAD3_X, _GRAD3_Y, _GRAD3_Z)]
+        self.octave_base = (np.arange(octaves, dtype=np.intp) * 512)[:, None]
+        self.frequencies = (lacunarity ** np.arange(octaves))[:, None]
+        amplitudes = persistence ** np.arange(octaves)
+        self.amplitudes = amplitudes / amplitudes.sum()
+        self.octaves = octaves
+
+    def _lattice(self, coords):
+        # 每個軸各自算格點、小數部分與平滑權重，之後再廣播成網格
+        c = np.asarray(coords, dtype=np.float64)[None, :] * self.frequencies
+        c0 = np.floor(c)
+        d = c - c0
+        return c0.astype(np.intp) & 255, d, _fade(d)
+
+    def grid2(self, xs, zs):
+        """在 xs (長度 n) 與 zs (長度 m) 組成的網格上取樣，回傳 [z][x] 形狀 (m, n)、約在 [-1, 1] 的值。
+
+        座標要先換算成雜訊尺度 (方塊座標 / 尺度)。
+        """
+        xi, dx, u = self._lattice(xs)
+        zi, dz, v = self._lattice(zs)
+        perm, gradient, base = self.perm, self.gradient, self.octave_base
+        a = (base + perm[base + xi])[:, None, :] + zi[:, :, None]
+        b = (base + perm[base + xi + 1])[:, None, :] + zi[:, :, None]
+        h00, h01 = gradient[a], gradient[a + 1]
+        h10, h11 = gradient[b], gradient[b + 1]
+        dx, u = dx[:, None, :], u[:, None, :]
+        dz, v = dz[:, :, None], v[:, :, None]
+        n00 = _GRAD_X[h00] * dx + _GRAD_Z[h00] * dz
+        n10 = _GRAD_X[h10] * (dx - 1) + _GRAD_Z[h10] * dz
+        n01 = _GRAD_X[h01] * dx + _GRAD_Z[h01] * (dz - 1)
+        n11 = _GRAD_X[h11] * (dx - 1) + _GRAD_Z[h11] * (dz - 1)
+        nx0 = n00 + u * (n10 - n00)
+        nx1 = n01 + u * (n11 - n01)
+        return np.tensordot(self.amplitudes, nx0 + v * (nx1 - nx0), axes=1)
+
+    def grid3(self, xs, ys, zs):
+        """3D 版的 grid2，回傳 [y][z][x] 形狀 (len(ys), len(zs), len(xs))，與區塊陣列排列相同。"""
+        xi, dx, u = self._lattice(xs)
+        yi, dy, v = self._lattice(ys)
+        zi, dz, w = self._lattice(zs)
+        perm, base = self.perm, self.octave_base[:, :, None, None]
+        grad_x, grad_y, grad_z = self.gradient3
+        # 各軸的值擴成 (octave, y, z, x) 可以廣播的形狀
+        dx, u, xi = dx[:, None, None, :], u[:, None, None, :], xi[:, None, None, :]
+        dy, v, yi = dy[:, :, None, None], v[:, :, None, None], yi[:, :, None, None]
+        dz, w, zi = dz[:, None, :, None], w[:, None, :, None], zi[:, None, :, None]
+        values = 0.0
+        for ox in (0, 1):
+            a = base + perm[base + xi + ox] + yi
+            weight_x = u if ox else 1 - u
+            for oy in (0, 1):
+                row = base + perm[a + oy] + zi
+                weight_xy = weight_x * (v if oy else 1 - v)
+                for oz in (0, 1):
+                    h = row + oz
+                    dot = grad_x[h] * (dx - ox) + grad_y[h] * (dy - oy) + grad_z[h] * (dz - oz)
+                    values = values + dot * weight_xy * (w if oz else 1 - w)
+        return np.tensordot(self.amplitudes, values, axes=1)
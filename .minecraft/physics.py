@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+
+from world_storage import CHUNK_SIZE, WORLD_HEIGHT
+
+# 碰撞盒剛好貼在方塊邊界上時，浮點誤差不能讓它被算成嵌進方塊
+EPSILON = 1e-7
+
+
+def chunk_solid_rows(chunk, solid):
+    """區塊的實心位元集: 每個 (y, lz) 一個 16 位元整數，第 lx 位代表該格是否實心，索引為 (y << 4) | lz。
+
+    結果快取在 chunk.solid_rows，方塊改變時 world_storage 會把它清掉。
+    """
+    rows = chunk.solid_rows
+    if rows is None:
+        mask = np.asarray(solid, dtype=bool)[np.frombuffer(chunk.blocks, dtype=np.uint8)]
+        bits = np.packbits(mask.reshape(-1, CHUNK_SIZE), axis=1, bitorder="little")
+        rows = chunk.solid_rows = bits.view("<u2").ravel().tolist()
+    return rows
+
+
+def solid_in_cells(world, solid, x0, x1, y0, y1, z0, z1):
+    """[x0, x1) x [y0, y1) x [z0, z1) 的方塊格裡有沒有實心方塊。未載入的區塊與世界上下方視為空氣。"""
+    y0, y1 = max(y0, 0), min(y1, WORLD_HEIGHT)
+    if y0 >= y1:
+        return False
+    chunks = world.chunks
+    for z in range(z0, z1):
+        lz = z & 15
+        x = x0
+        while x < x1:
+            # x 範圍跨區塊時分段，每段在同一個區塊裡用一個位元遮罩檢查整列
+            end = min(x1, ((x >> 4) + 1) << 4)
+            chunk = chunks.get((x >> 4, z >> 4))
+            if chunk is not None:
+                rows = chunk.solid_rows
+                if rows is None:
+                    rows = chunk_solid_rows(chunk, solid)
+                mask = ((1 << (end - x)) - 1) << (x & 15)
+                for y in range(y0, y1):
+                    if rows[(y << 4) | lz] & mask:
+                        return True
+            x = end
+    return False
+
+
+def box_cells(box_min, box_max):
+    """AABB 覆蓋的方塊格範圍 ([lo, hi) 三軸各一組)，貼在邊界上的那一格不算。"""
+    return ([math.floor(c + EPSILON) for c in box_min], [math.ceil(c - EPSILON) for c in box_max])
+
+
+def box_hits_solid(world, solid, box_min, box_max):
+    lo, hi = box_cells(box_min, box_max)
+    return solid_in_cells(world, solid, lo[0], hi[0], lo[1], hi[1], lo[2], hi[2])
+
+
+def sweep_aabb(world, solid, box_min, box_max, axis, delta):
+    """把 AABB 沿 axis 移動 delta，依序檢查前緣經過的每一層方塊格 (不會穿過薄牆)。
+
+    回傳 (碰撞時間 t, 法向量分量)：t 在 [0, 1]，乘上 delta 就是能走的距離；
+    沒有碰到時為 (1.0, 0)，碰到時法向量分量是被撞的那一面的方向 (往 + 方向撞到為 -1)。
+    """
+    if delta == 0:
+        return 1.0, 0
+    lo, hi = box_cells(box_min, box_max)
+    if delta > 0:
+        cells = range(hi[axis], math.ceil(box_max[axis] + delta - EPSILON))
+    else:
+        cells = range(lo[axis] - 1, math.floor(box_min[axis] + delta + EPSILON) - 1, -1)
+    for cell in cells:
+        lo[axis], hi[axis] = cell, cell + 1
+        if solid_in_cells(world, solid, lo[0], hi[0], lo[1], hi[1], lo[2], hi[2]):
+            distance = cell - box_max[axis] if delta > 0 else box_min[axis] - (cell + 1)
+            return max(0.0, distance / abs(delta)), -1 if delta > 0 else 1
+    return 1.0, 0
+
+
+class FixedTimestep:
+    """固定時間步長: 累積實際經過的時間，每滿 1 / tick_rate 秒執行一次模擬，結果與幀率無關。
+
+    一幀最多補 max_catch_up 步，還追不上就丟掉多出來的整步 (遊戲變慢，而不是越積越多卡死)。
+    alpha 是剩下的時間佔一步的比例，畫面用它在前後兩個模擬狀態之間內插。
+    """
+
+    def __init__(self, tick_rate=60, max_catch_up=5):
+        self.tick_rate = tick_rate
+        self.max_catch_up = max_catch_up
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.ticks = 0
+        self.dropped_ticks = 0
+
+    def advance(self, dt, tick):
+        """加上這一幀經過的 dt，呼叫 tick(步長) 零到 max_catch_up 次，回傳執行的步數。"""
+        step = 1.0 / self.tick_rate
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= step and steps < self.max_catch_up:
+            tick(step)
+            self.accumulator -= step
+            steps += 1
+        if self.accumulator >= step:
+            self.dropped_ticks += int(self.accumulator // step)
+            self.accumulator %= step
+        self.ticks += steps
+        self.alpha = self.accumulator / step
+        return steps
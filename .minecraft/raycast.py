@@ -0,0 +1,50 @@
+import math
+
+from world_storage import WORLD_HEIGHT
+
+_INF = float("inf")
+
+
+def _axis(origin, cell, direction):
+    # 回傳 (步進方向, 走完一格的 t, 碰到第一個格線的 t)
+    if direction > 0:
+        return 1, 1 / direction, (cell + 1 - origin) / direction
+    if direction < 0:
+        return -1, -1 / direction, (cell - origin) / direction
+    return 0, _INF, _INF
+
+
+def raycast_block(get_id, targetable, origin, direction, max_distance):
+    """沿著射線依序走訪經過的方塊格 (Amanatides & Woo 體素走訪，每格只看一次)。
+
+    direction 要是單位向量，targetable 是以方塊 ID 為索引的表 (BlockRegistry.targetable)。
+    回傳 (第一個可選取的方塊座標, 射線射入那一面的法向量)，max_distance 內沒有則回傳 None。
+    """
+    ox, oy, oz = origin
+    dx, dy, dz = direction
+    x, y, z = math.floor(ox), math.floor(oy), math.floor(oz)
+    step_x, delta_x, t_max_x = _axis(ox, x, dx)
+    step_y, delta_y, t_max_y = _axis(oy, y, dy)
+    step_z, delta_z, t_max_z = _axis(oz, z, dz)
+    # 眼睛在方塊裡面時沒有射入的面，取射線主要方向的反面
+    ax, ay, az = abs(dx), abs(dy), abs(dz)
+    if ax > ay and ax > az:
+        face = (-step_x, 0, 0)
+    elif ay > az:
+        face = (0, -step_y, 0)
+    else:
+        face = (0, 0, -step_z or 1)
+    t = 0.0
+    while t <= max_distance:
+        if targetable[get_id(x, y, z)]:
+            return (x, y, z), face
+        if t_max_x < t_max_y and t_max_x < t_max_z:
+            t, x, t_max_x, face = t_max_x, x + step_x, t_max_x + delta_x, (-step_x, 0, 0)
+        elif t_max_y < t_max_z:
+            t, y, t_max_y, face = t_max_y, y + step_y, t_max_y + delta_y, (0, -step_y, 0)
+            # 往上離開世界或往下穿過底部之後不會再碰到方塊
+            if y >= WORLD_HEIGHT and step_y > 0 or y < 0 and step_y < 0:
+                return None
+        else:
+            t, z, t_max_z, face = t_max_z, z + step_z, t_max_z + delta_z, (0, 0, -step_z)
+    return None
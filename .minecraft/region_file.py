@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import queue
+import struct
+import zlib
+import logging
+import threading
+
+from world_storage import CHUNK_VOLUME, BLOCK_NAMES, ChunkedWorld, block_id
+from terrain import new_world_seed
+
+# --- 區域檔格式 ---
+# 每個區域檔存放 REGION_SIZE x REGION_SIZE 個區塊:
+#   [8 bytes magic][REGION_SIZE^2 筆 (offset u32, length u32)][區塊資料...]
+# offset 為 0 代表該區塊不存在。每個區塊資料以 zlib 壓縮，內容為
+#   [u8 調色盤數量][每個名稱: u8 長度 + utf-8][CHUNK_VOLUME bytes 的調色盤索引]
+# 調色盤只記錄該區塊用到的方塊名稱，存檔不依賴執行時期的方塊 ID。
+REGION_SIZE = 16
+REGION_MAGIC = b"MCPYRGN1"
+_ENTRY = struct.Struct("<II")
+HEADER_SIZE = len(REGION_MAGIC) + _ENTRY.size * REGION_SIZE * REGION_SIZE
+COMPRESSION_LEVEL = 1
+
+
+def write_file_atomic(path, data):
+    # 先寫到暫存檔再改名，寫到一半當掉也不會弄壞原本的檔案
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        if isinstance(data, (list, tuple)):
+            f.writelines(data)
+        else:
+            f.write(data)
+        # 資料真的寫到磁碟後才改名，斷電時不會留下內容是空的新檔
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def region_of(cx, cz):
+    return cx // REGION_SIZE, cz // REGION_SIZE
+
+
+def _slot(cx, cz):
+    return (cz % REGION_SIZE) * REGION_SIZE + (cx % REGION_SIZE)
+
+
+def encode_chunk(blocks):
+    present = [bid for bid in range(len(BLOCK_NAMES)) if bid == 0 or bytes((bid,)) in blocks]
+    to_local = bytearray(256)
+    header = bytearray([len(present)])
+    for local, bid in enumerate(present):
+        to_local[bid] = local
+        name = BLOCK_NAMES[bid].encode("utf-8")
+        header.append(len(name))
+        header += name
+    return zlib.compress(bytes(header) + bytes(blocks).translate(to_local), COMPRESSION_LEVEL)
+
+
+def decode_chunk(payload):
+    raw = zlib.decompress(payload)
+    count, pos = raw[0], 1
+    to_global = bytearray(256)
+    for local in range(count):
+        length = raw[pos]
+        to_global[local] = block_id(raw[pos + 1:pos + 1 + length].decode("utf-8"))
+        pos += 1 + length
+    data = raw[pos:]
+    if len(data) != CHUNK_VOLUME:
+        raise ValueError(f"區塊資料長度錯誤: {len(data)} != {CHUNK_VOLUME}")
+    return bytearray(data.translate(to_global))
+
+
+class RegionStore:
+    """讀寫 worlds/region 底下的二進位區域檔。"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # 同一個區域檔的讀寫互斥: 背景存檔改寫檔案時 (Windows 上檔案開著 os.replace 會失敗)，
+        # 主執行緒的 load_chunk 要等它寫完
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _region_lock(self, rx, rz):
+        with self._locks_guard:
+            lock = self._locks.get((rx, rz))
+            if lock is None:
+                lock = self._locks[(rx, rz)] = threading.Lock()
+            return lock
+
+    def region_path(self, rx, rz):
+        return os.path.join(self.directory, f"r.{rx}.{rz}.mcr")
+
+    def region_coords(self):
+        coords = []
+        for filename in os.listdir(self.directory):
+            parts = filename.split(".")
+            if len(parts) == 4 and parts[0] == "r" and parts[3] == "mcr":
+                try:
+                    coords.append((int(parts[1]), int(parts[2])))
+                except ValueError:
+                    continue
+        return coords
+
+    def _parse_header(self, data, path):
+        if len(data) < HEADER_SIZE or data[:len(REGION_MAGIC)] != REGION_MAGIC:
+            raise ValueError(f"{path} 不是有效的區域檔")
+        entries = {}
+        for slot in range(REGION_SIZE * REGION_SIZE):
+            offset, length = _ENTRY.unpack_from(data, len(REGION_MAGIC) + slot * _ENTRY.size)
+            if offset:
+                entries[slot] = (offset, length)
+        return entries
+
+    def _read_region(self, rx, rz):
+        path = self.region_path(rx, rz)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        return {slot: data[offset:offset + length]
+                for slot, (offset, length) in self._parse_header(data, path).items()}
+
+    def _write_region(self, rx, rz, payloads):
+        header = bytearray(REGION_MAGIC)
+        body = []
+        offset = HEADER_SIZE
+        for slot in range(REGION_SIZE * REGION_SIZE):
+            payload = payloads.get(slot)
+            if payload is None:
+                header += _ENTRY.pack(0, 0)
+                continue
+            header += _ENTRY.pack(offset, len(payload))
+            body.append(payload)
+            offset += len(payload)
+        write_file_atomic(self.region_path(rx, rz), [bytes(header)] + body)
+
+    def save_chunks(self, chunk_blocks):
+        """chunk_blocks: {(cx, cz): blocks}，只重寫有變動的區域檔。"""
+        return self.save_payloads({key: encode_chunk(blocks) for key, blocks in chunk_blocks.items()})
+
+    def save_payloads(self, chunk_payloads):
+        """chunk_payloads: {(cx, cz): encode_chunk 的結果}，給已經在別處壓縮好的區塊使用。"""
+        by_region = {}
+        for (cx, cz), payload in chunk_payloads.items():
+            by_region.setdefault(region_of(cx, cz), {})[_slot(cx, cz)] = payload
+        unreadable = []
+        for (rx, rz), new_payloads in by_region.items():
+            with self._region_lock(rx, rz):
+                try:
+                    payloads = self._read_region(rx, rz)
+                except (OSError, ValueError) as e:
+                    # 讀不出原本內容的區域檔不能重寫，不然裡面其他區塊會被清掉
+                    logging.error(f"區域檔 r.{rx}.{rz} 無法讀取，這次不寫入: {e}")
+                    unreadable.append((rx, rz))
+                    continue
+                payloads.update(new_payloads)
+                self._write_region(rx, rz, payloads)
+        if unreadable:
+            raise ValueError(f"{len(unreadable)} 個區域檔無法讀取，未寫入: {unreadable}")
+        return len(by_region)
+
+    def chunk_index(self):
+        """只讀各區域檔的標頭，回傳磁碟上已存在的區塊座標。
+
+        標頭損壞的區域檔改名為 .corrupt 保留下來，其他區域檔照常載入；它的區塊會重新生成並寫進新的區域檔。
+        """
+        keys = []
+        for rx, rz in self.region_coords():
+            path = self.region_path(rx, rz)
+            with self._region_lock(rx, rz):
+                try:
+                    with open(path, "rb") as f:
+                        header = f.read(HEADER_SIZE)
+                    slots = self._parse_header(header, path)
+                except ValueError as e:
+                    self._quarantine(path, e)
+                    continue
+                except OSError as e:
+                    # 暫時打不開的檔案留在原地，save_payloads 也會拒絕重寫它
+                    logging.error(f"無法讀取區域檔 {path}，略過: {e}")
+                    continue
+            for slot in slots:
+                keys.append((rx * REGION_SIZE + slot % REGION_SIZE, rz * REGION_SIZE + slot // REGION_SIZE))
+        return keys
+
+    def _quarantine(self, path, error):
+        corrupt_path, n = path + ".corrupt", 1
+        while os.path.exists(corrupt_path):
+            corrupt_path, n = f"{path}.{n}.corrupt", n + 1
+        os.replace(path, corrupt_path)
+        logging.error(f"區域檔 {path} 損壞 ({error})，已改名為 {corrupt_path}，其中的區塊會重新生成")
+
+    def load_chunk(self, cx, cz):
+        """用 seek 只讀出單一區塊，區塊不存在時回傳 None。"""
+        rx, rz = region_of(cx, cz)
+        path = self.region_path(rx, rz)
+        with self._region_lock(rx, rz):
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                return None
+            with f:
+                if f.read(len(REGION_MAGIC)) != REGION_MAGIC:
+                    raise ValueError(f"{path} 不是有效的區域檔")
+                # 每次都重讀標頭項目，背景存檔改寫檔案後位移會變
+                f.seek(len(REGION_MAGIC) + _slot(cx, cz) * _ENTRY.size)
+                offset, length = _ENTRY.unpack(f.read(_ENTRY.size))
+                if not offset:
+                    return None
+                f.seek(offset)
+                payload = f.read(length)
+        return decode_chunk(payload)
+
+    def load_region(self, rx, rz):
+        with self._region_lock(rx, rz):
+            payloads = self._read_region(rx, rz)
+        for slot, payload in payloads.items():
+            cx = rx * REGION_SIZE + slot % REGION_SIZE
+            cz = rz * REGION_SIZE + slot // REGION_SIZE
+            yield (cx, cz), decode_chunk(payload)
+
+    def load_all(self):
+        for rx, rz in self.region_coords():
+            yield from self.load_region(rx, rz)
+
+
+class BackgroundSaver:
+    """在背景執行緒壓縮並寫入區域檔，主執行緒只負責交出區塊快照。"""
+
+    def __init__(self, store):
+        self.store = store
+        self.tasks = queue.Queue()
+        self.last_duration = 0.0
+        self._failed_chunks = set()
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="region-saver", daemon=True)
+        self.thread.start()
+
+    def submit(self, chunk_blocks, files=()):
+        """chunk_blocks: {(cx, cz): 不再被修改的 blocks}; files: [(路徑, bytes)] 一併寫入。"""
+        self.tasks.put((chunk_blocks, list(files)))
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.tasks.task_done()
+                return
+            chunk_blocks, files = task
+            start = time.perf_counter()
+            try:
+                if chunk_blocks:
+                    self.store.save_chunks(chunk_blocks)
+                for path, data in files:
+                    write_file_atomic(path, data)
+                self.last_duration = time.perf_counter() - start
+                logging.info(f"Background save wrote {len(chunk_blocks)} chunks in {self.last_duration * 1000:.1f} ms.")
+            except Exception as e:
+                logging.error(f"背景存檔失敗: {e}", exc_info=True)
+                with self._lock:
+                    self._failed_chunks.update(chunk_blocks)
+            finally:
+                self.tasks.task_done()
+
+    def take_failed(self):
+        with self._lock:
+            failed, self._failed_chunks = self._failed_chunks, set()
+        return failed
+
+    def idle(self):
+        return self.tasks.unfinished_tasks == 0
+
+    def flush(self):
+        self.tasks.join()
+
+    def close(self):
+        self.tasks.put(None)
+        self.thread.join()
+
+
+def load_world_seed(level_path):
+    """讀取 level.json 的世界種子；沒有或損壞時產生新的種子並寫回。"""
+    try:
+        with open(level_path, "r", encoding="utf-8") as f:
+            seed = int(json.load(f)["seed"])
+        logging.info(f"World seed: {seed}")
+        return seed
+    except FileNotFoundError:
+        pass
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        logging.error(f"讀取世界種子 {level_path} 失敗: {e}，將使用新的種子。", exc_info=True)
+    seed = new_world_seed()
+    try:
+        write_file_atomic(level_path, json.dumps({"seed": seed}, indent=2).encode("utf-8"))
+        logging.info(f"New world seed {seed} saved to {level_path}")
+    except OSError as e:
+        logging.error(f"儲存世界種子 {level_path} 失敗: {e}", exc_info=True)
+    return seed
+
+
+def convert_json_world(json_path, region_dir):
+    """把舊版 world.json ("x,y,z": "name") 一次轉成區域檔，回傳實際存進區域檔的方塊數。
+
+    座標格式錯誤、名稱不是字串或 y 超出世界高度的項目會跳過並記錄，不會讓整個轉換失敗。
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    data = json.loads(content) if content.strip() else {}
+    world = ChunkedWorld()
+    skipped = []
+    for key, name in data.items():
+        try:
+            x, y, z = map(int, key.split(","))
+            # set_id 在 y 超出範圍時回傳 False；方塊種類超過 uint8 上限時 block_id 會丟 ValueError
+            if isinstance(name, str) and name and world.set_id(x, y, z, block_id(name)):
+                continue
+        except ValueError:
+            pass
+        skipped.append(key)
+    if skipped:
+        logging.warning(f"Skipped {len(skipped)} invalid or out-of-range blocks in {json_path}, e.g. {skipped[:5]}")
+    stored = sum(chunk.block_count() for chunk in world.chunks.values())
+    RegionStore(region_dir).save_chunks({key: chunk.blocks for key, chunk in world.chunks.items()})
+    logging.info(f"Converted {stored} blocks in {len(world.chunks)} chunks from {json_path} to {region_dir}.")
+    return stored
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        print("用法: python region_file.py <world.json> <region 資料夾>")
+        sys.exit(1)
+    convert_json_world(sys.argv[1], sys.argv[2])
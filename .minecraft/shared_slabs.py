@@ -0,0 +1,49 @@
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SlabRing:
+    """一塊預先配置的共享記憶體，切成 slot_count 個 slot_size 位元組的槽 (slab)。
+
+    主行程建立這塊記憶體並管理哪些槽是空的；工作行程用 name 連上同一塊記憶體，
+    只寫入主行程分配給它的槽。結果直接留在槽裡給主行程讀，不經過 pickle 與管線，
+    主行程用完再 release 給下一個工作。
+    """
+
+    def __init__(self, slot_count, slot_size, name=None):
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=slot_count * slot_size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.free = deque(range(slot_count))
+
+    def acquire(self):
+        """取一個空槽，全部都在使用中時回傳 None。"""
+        return self.free.popleft() if self.free else None
+
+    def release(self, slot):
+        self.free.append(slot)
+
+    def array(self, slot, dtype=np.uint8, count=None, offset=0):
+        """槽內從 offset 位元組開始、count 個元素的 numpy 陣列，直接指向共享記憶體 (不複製)。"""
+        dtype = np.dtype(dtype)
+        if count is None:
+            count = (self.slot_size - offset) // dtype.itemsize
+        if offset + count * dtype.itemsize > self.slot_size:
+            raise ValueError(f"槽只有 {self.slot_size} 位元組，放不下 {count} 個 {dtype}")
+        return np.ndarray(count, dtype, self.memory.buf, slot * self.slot_size + offset)
+
+    def close(self):
+        try:
+            self.memory.close()
+        except BufferError:
+            # 還有陣列指向這塊記憶體，交給行程結束時釋放
+            pass
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from world_storage import CHUNK_SIZE, WORLD_HEIGHT, AIR, block_id
+from terrain import chunk_heightmap, chunk_rng
+
+# --- 跨區塊結構 (樹) ---
+# 每個區塊的樹只由 (種子, cx, cz) 與高度圖決定，規劃結果依「落在哪個區塊」分組。
+# 生成區塊時套用自己與 8 個鄰居規劃中落在這個區塊的部分，
+# 所以樹可以長在區塊邊界上，生成順序與平行生成都不影響結果，也不用寫入別的區塊。
+TREE_CHANCE = 0.15
+BIRCH_CHANCE = 0.3
+PLAN_CACHE_SIZE = 256
+
+_plans = OrderedDict()
+
+
+def _tree_template(trunk_height, leaf_layers):
+    """回傳 (位移 (N, 3) 的 [dx, dy, dz], 是否為樹幹, 每格被省略的機率)。"""
+    offsets, logs, drop_chances = [], [], []
+    for dy in range(trunk_height):
+        offsets.append((0, dy, 0)); logs.append(True); drop_chances.append(0.0)
+    for layer in range(leaf_layers):
+        dy = trunk_height - 2 + layer
+        radius = 1 if layer == leaf_layers - 1 else 2
+        for dx in range(-radius, radius + 1):
+            for dz in range(-radius, radius + 1):
+                if dx == 0 and dz == 0 and dy < trunk_height:
+                    continue
+                # 外圈四角一半機率、其餘外圈 20% 機率不長葉子，樹冠比較自然
+                drop = 0.0
+                if radius == 2 and abs(dx) == 2 and abs(dz) == 2:
+                    drop = 0.5
+                elif radius == 2 and (abs(dx) == 2 or abs(dz) == 2):
+                    drop = 0.2
+                offsets.append((dx, dy, dz)); logs.append(False); drop_chances.append(drop)
+    return np.array(offsets, dtype=np.int32), np.array(logs), np.array(drop_chances)
+
+
+# (樹幹高度, 樹葉層數) -> 樣板
+TREE_TEMPLATES = {(trunk, layers): _tree_template(trunk, layers) for trunk in (4, 5, 6) for layers in (3, 4)}
+
+
+def surface_height(seed, x, z):
+    return int(chunk_heightmap(seed, x >> 4, z >> 4)[z & 15, x & 15])
+
+
+def _can_grow(seed, x, z, surface_y):
+    # 周圍 8 柱的地表都不能比樹根高 (原本檢查樹幹旁邊 5 格內沒有實心方塊)
+    for dx in (-1, 0, 1):
+        for dz in (-1, 0, 1):
+            if (dx or dz) and surface_height(seed, x + dx, z + dz) > surface_y:
+                return False
+    return surface_y + 12 < WORLD_HEIGHT
+
+
+def plan_trees(seed, cx, cz):
+    """規劃樹幹在 (cx, cz) 裡的樹，回傳 {(目標 cx, cz): (區塊內索引, 方塊 ID, 是否為樹幹)}。"""
+    key = (seed, cx, cz)
+    plan = _plans.get(key)
+    if plan is not None:
+        _plans.move_to_end(key)
+        return plan
+    rng = chunk_rng(seed, cx, cz)
+    positions, block_ids, logs = [], [], []
+    if rng.random() < TREE_CHANCE:
+        for _ in range(rng.randint(1, 3)):
+            x = cx * CHUNK_SIZE + rng.randint(0, CHUNK_SIZE - 1)
+            z = cz * CHUNK_SIZE + rng.randint(0, CHUNK_SIZE - 1)
+            tree_type = "birch" if rng.random() < BIRCH_CHANCE else "oak"
+            offsets, is_log, drop_chances = TREE_TEMPLATES[(rng.randint(4, 6), rng.randint(3, 4))]
+            keep = np.random.default_rng(rng.getrandbits(63)).random(len(offsets)) >= drop_chances
+            surface_y = surface_height(seed, x, z)
+            if not _can_grow(seed, x, z, surface_y):
+                continue
+            positions.append(offsets[keep] + (x, surface_y + 1, z))
+            block_ids.append(np.where(is_log[keep], block_id(f"{tree_type}_log"), block_id(f"{tree_type}_leaves")))
+            logs.append(is_log[keep])
+    plan = {}
+    if positions:
+        positions, block_ids, logs = np.concatenate(positions), np.concatenate(block_ids).astype(np.uint8), np.concatenate(logs)
+        target_x, target_z = positions[:, 0] >> 4, positions[:, 2] >> 4
+        index = (positions[:, 1] << 8) | ((positions[:, 2] & 15) << 4) | (positions[:, 0] & 15)
+        for target in set(zip(target_x.tolist(), target_z.tolist())):
+            mask = (target_x == target[0]) & (target_z == target[1])
+            plan[target] = (index[mask], block_ids[mask], logs[mask])
+    _plans[key] = plan
+    if len(_plans) > PLAN_CACHE_SIZE:
+        _plans.popitem(last=False)
+    return plan
+
+
+def place_structures(ids, seed, cx, cz):
+    """把自己與鄰居規劃中落在 (cx, cz) 的結構寫進 ids ([y][z][x] 陣列)，回傳放了幾格。
+
+    樹葉最多離樹幹 2 格，所以只需要看相鄰的 8 個區塊。樹幹先寫、樹葉只填空氣，
+    不同的樹重疊時結果與套用順序無關。
+    """
+    parts = [plan_trees(seed, cx + dx, cz + dz).get((cx, cz)) for dx in (-1, 0, 1) for dz in (-1, 0, 1)]
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return 0
+    flat = ids.reshape(-1)
+    index = np.concatenate([part[0] for part in parts])
+    block_ids = np.concatenate([part[1] for part in parts])
+    logs = np.concatenate([part[2] for part in parts])
+    flat[index[logs]] = block_ids[logs]
+    leaves = ~logs
+    free = flat[index[leaves]] == AIR
+    flat[index[leaves][free]] = block_ids[leaves][free]
+    return int(logs.sum() + free.sum())
+
+
+def clear_caches():
+    _plans.clear()
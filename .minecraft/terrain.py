@@ -0,0 +1,254 @@
+import random
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from world_storage import CHUNK_SIZE, WORLD_HEIGHT, AIR, block_id
+from perlin_noise import FractalNoise
+
+SEED_MASK = (1 << 63) - 1
+
+
+def new_world_seed():
+    return random.SystemRandom().getrandbits(63)
+
+
+def chunk_seed(seed, cx, cz):
+    """由世界種子與區塊座標混合出區塊自己的種子，生成順序不影響結果。"""
+    h = (seed ^ (cx * 341873128712) ^ (cz * 132897987541)) & SEED_MASK
+    # splitmix64 的混合步驟，讓相鄰區塊的種子差異夠大
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & SEED_MASK
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & SEED_MASK
+    return h ^ (h >> 31)
+
+
+def chunk_rng(seed, cx, cz):
+    return random.Random(chunk_seed(seed, cx, cz))
+
+
+# --- 高度圖 ---
+# 地表最低高度；礦石的深度範圍也以此為準
+BASE_Y_LEVEL = 8
+TERRAIN_BASE_HEIGHT = 24
+TERRAIN_AMPLITUDE = 40
+TERRAIN_SCALE = 128.0
+# 草地下面幾層泥土，再往下是石頭
+DIRT_DEPTH = 4
+HEIGHT_NOISE_SALT = 0x5DEECE66D
+# 雜訊只在每 NOISE_STEP 格取樣一次，中間用雙線性內插 (起伏的尺度遠大於 4 格)
+NOISE_STEP = 4
+# 一次算 NOISE_TILE x NOISE_TILE 個區塊的高度圖，分攤 numpy 每次呼叫的固定成本
+NOISE_TILE = 4
+NOISE_TILE_CACHE_SIZE = 64
+
+# --- 洞穴 ---
+# 3D 雜訊大於門檻的石頭挖空；垂直方向尺度較小，洞穴比較扁
+CAVE_SCALE = 32.0
+CAVE_Y_SCALE = 20.0
+CAVE_THRESHOLD = 0.25
+CAVE_NOISE_SALT = 0x2545F4914F6CDD1D
+CAVE_OCTAVES = 2
+# 每 8 格取樣一次再三線性內插；洞穴只要大致的形狀，取樣點越少越便宜
+CAVE_STEP = 8
+# 最底層不挖，玩家不會掉出世界
+CAVE_MIN_Y = 1
+
+_noise_by_seed = {}
+_height_tiles = OrderedDict()
+_cave_tiles = OrderedDict()
+
+
+def _lerp_weights(size, step):
+    # 取樣點到每一格的內插權重，heights = W @ samples @ W.T
+    weights = np.zeros((size, size // step + 1))
+    for i in range(size):
+        weights[i, i // step] = 1 - (i % step) / step
+        weights[i, i // step + 1] = (i % step) / step
+    return weights
+
+
+_TILE_LERP = _lerp_weights(NOISE_TILE * CHUNK_SIZE, NOISE_STEP)
+_CAVE_LERP = _lerp_weights(CHUNK_SIZE, CAVE_STEP)
+_CAVE_Y_LERP = _lerp_weights(WORLD_HEIGHT, CAVE_STEP)
+
+
+def clear_caches():
+    _noise_by_seed.clear()
+    _height_tiles.clear()
+    _cave_tiles.clear()
+
+
+def _noise(seed, salt, octaves):
+    # 排列表只在第一次用到這個種子時建立
+    key = (seed, salt)
+    noise = _noise_by_seed.get(key)
+    if noise is None:
+        noise = _noise_by_seed[key] = FractalNoise(seed ^ salt, octaves=octaves)
+    return noise
+
+
+def height_noise(seed):
+    return _noise(seed, HEIGHT_NOISE_SALT, 4)
+
+
+def cave_noise(seed):
+    return _noise(seed, CAVE_NOISE_SALT, CAVE_OCTAVES)
+
+
+def _cache_tile(cache, key, value):
+    cache[key] = value
+    if len(cache) > NOISE_TILE_CACHE_SIZE:
+        cache.popitem(last=False)
+    return value
+
+
+def _height_tile(seed, tx, tz):
+    key = (seed, tx, tz)
+    heights = _height_tiles.get(key)
+    if heights is not None:
+        _height_tiles.move_to_end(key)
+        return heights
+    span = NOISE_TILE * CHUNK_SIZE
+    coords = np.arange(0, span + 1, NOISE_STEP, dtype=np.float64)
+    samples = height_noise(seed).grid2((tx * span + coords) / TERRAIN_SCALE, (tz * span + coords) / TERRAIN_SCALE)
+    values = _TILE_LERP @ samples @ _TILE_LERP.T
+    heights = np.clip(np.rint(TERRAIN_BASE_HEIGHT + values * TERRAIN_AMPLITUDE),
+                      BASE_Y_LEVEL, WORLD_HEIGHT - 16).astype(np.int32)
+    heights.flags.writeable = False
+    return _cache_tile(_height_tiles, key, heights)
+
+
+def chunk_heightmap(seed, cx, cz):
+    """回傳區塊的地表高度 [z][x] (int32，唯讀)，草地就在這個 y。"""
+    heights = _height_tile(seed, cx // NOISE_TILE, cz // NOISE_TILE)
+    x0, z0 = (cx % NOISE_TILE) * CHUNK_SIZE, (cz % NOISE_TILE) * CHUNK_SIZE
+    return heights[z0:z0 + CHUNK_SIZE, x0:x0 + CHUNK_SIZE]
+
+
+def _cave_tile(seed, tx, tz):
+    """整個 tile 的洞穴雜訊取樣點 [y][z][x]，高度只取到 tile 內最高的石頭。"""
+    key = (seed, tx, tz)
+    samples = _cave_tiles.get(key)
+    if samples is not None:
+        _cave_tiles.move_to_end(key)
+        return samples
+    span = NOISE_TILE * CHUNK_SIZE
+    coords = np.arange(0, span + 1, CAVE_STEP, dtype=np.float64)
+    stone_top = int(_height_tile(seed, tx, tz).max()) - DIRT_DEPTH
+    ys = np.arange(0, stone_top // CAVE_STEP + 2) * CAVE_STEP
+    samples = cave_noise(seed).grid3((tx * span + coords) / CAVE_SCALE, ys / CAVE_Y_SCALE,
+                                     (tz * span + coords) / CAVE_SCALE)
+    return _cache_tile(_cave_tiles, key, samples)
+
+
+def carve_caves(ids, seed, cx, cz, stone_top):
+    """把 y 在 [CAVE_MIN_Y, stone_top) 之間、洞穴密度超過門檻的石頭挖空。"""
+    if stone_top <= CAVE_MIN_Y:
+        return ids
+    samples = _cave_tile(seed, cx // NOISE_TILE, cz // NOISE_TILE)
+    per_chunk = CHUNK_SIZE // CAVE_STEP
+    x0, z0 = (cx % NOISE_TILE) * per_chunk, (cz % NOISE_TILE) * per_chunk
+    corners = samples[:, z0:z0 + per_chunk + 1, x0:x0 + per_chunk + 1]
+    # 三線性內插不會超過格子角落的最大值: 角落全在門檻以下的那幾層格子不用內插，只算中間有洞穴的範圍
+    hot = (corners > CAVE_THRESHOLD).any(axis=(1, 2))
+    cells = np.flatnonzero(hot[:-1] | hot[1:])
+    if not len(cells):
+        return ids
+    low, high = max(int(cells[0]) * CAVE_STEP, CAVE_MIN_Y), min((int(cells[-1]) + 1) * CAVE_STEP, stone_top)
+    if low >= high:
+        return ids
+    # 三個軸分開內插: 先 x、再 z、最後 y
+    coarse = _CAVE_LERP @ (corners @ _CAVE_LERP.T)
+    density = (_CAVE_Y_LERP[low:high, :len(samples)] @ coarse.reshape(len(samples), -1)).reshape(-1, CHUNK_SIZE, CHUNK_SIZE)
+    layer = ids[low:high]
+    layer[(density > CAVE_THRESHOLD) & (layer == block_id("stone"))] = AIR
+    return ids
+
+
+# --- 地形與礦石 (numpy 向量化) ---
+# (礦石, 最低 y, 最高 y, 每 1000 格石頭的機率)，依序判定，先抽中的優先
+ORES_TO_GENERATE = (
+    ("coal_ore", 0, BASE_Y_LEVEL - 1, 80), ("iron_ore", 2, BASE_Y_LEVEL - 3, 50),
+    ("gold_ore", 4, BASE_Y_LEVEL - 5, 15), ("lapis_ore", 4, BASE_Y_LEVEL - 5, 10),
+    ("diamond_ore", 5, BASE_Y_LEVEL - 6, 5),
+)
+# 礦石只會出現在這個高度範圍內的石頭 (含兩端)
+ORE_MIN_Y, ORE_MAX_Y = 1, BASE_Y_LEVEL - 2
+
+
+def chunk_generator(seed, cx, cz):
+    return np.random.default_rng(chunk_seed(seed, cx, cz))
+
+
+def flat_heightmap():
+    return np.full((CHUNK_SIZE, CHUNK_SIZE), BASE_Y_LEVEL, dtype=np.int32)
+
+
+@lru_cache(maxsize=None)
+def _layer_table():
+    # 以「地表高度 - y」查表: 負數為空氣、0 為草地、1..DIRT_DEPTH 為泥土、再往下是石頭
+    table = np.full(DIRT_DEPTH + 3, block_id("stone"), dtype=np.uint8)
+    table[0] = AIR
+    table[1] = block_id("grass_block")
+    table[2:DIRT_DEPTH + 2] = block_id("dirt")
+    return table
+
+
+def fill_layers(heightmap):
+    """依高度圖 [z][x] 填入石頭/泥土/草地，回傳 (WORLD_HEIGHT, 16, 16) 的方塊 ID 陣列。"""
+    ids = np.zeros((WORLD_HEIGHT, CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8)
+    top = min(int(heightmap.max()) + 1, WORLD_HEIGHT)
+    # 最低地表以下全是石頭，整段直接填；只有起伏的那一段需要逐格查表
+    solid = max(int(heightmap.min()) - DIRT_DEPTH, 0)
+    ids[:solid] = block_id("stone")
+    depth = heightmap[None, :, :] - np.arange(solid - 1, top - 1, dtype=np.int32)[:, None, None]
+    # ndarray.clip 每次呼叫都要檢查型別範圍，區塊這麼小時比運算本身還貴
+    np.minimum(depth, DIRT_DEPTH + 2, out=depth)
+    np.maximum(depth, 0, out=depth)
+    ids[solid:top] = _layer_table()[depth]
+    return ids
+
+
+@lru_cache(maxsize=None)
+def _ore_table():
+    """每一層的累積機率與對應方塊: 逐一判定、抽中就停止，等於把 [0, 1) 切成連續的區段。
+
+    第 i 層的區段整體加上 i，所有層接成一條遞增序列，一次 searchsorted 就能查完整個區塊。
+    """
+    heights = range(ORE_MIN_Y, ORE_MAX_Y + 1)
+    thresholds = np.zeros((len(heights), len(ORES_TO_GENERATE)))
+    # 每層最後一格是沒抽中任何礦石時的石頭
+    choices = np.full((len(heights), len(ORES_TO_GENERATE) + 1), block_id("stone"), dtype=np.uint8)
+    for row, y in enumerate(heights):
+        cumulative, remaining = 0.0, 1.0
+        for col, (ore_name, min_d, max_d, rarity) in enumerate(ORES_TO_GENERATE):
+            choices[row, col] = block_id(ore_name)
+            if min_d <= y <= max_d:
+                cumulative += remaining * rarity / 1000
+                remaining *= 1 - rarity / 1000
+            thresholds[row, col] = row + cumulative
+    return thresholds.ravel(), choices.ravel(), np.arange(len(heights))[:, None, None]
+
+
+def place_ores(ids, generator):
+    """整個區塊只抽一次亂數 (每格一個)，把石頭換成礦石；機率與逐格 randint(1, 1000) 相同。"""
+    thresholds, choices, rows = _ore_table()
+    layer = ids[ORE_MIN_Y:ORE_MAX_Y + 1]
+    # 第 i 層在 thresholds 裡佔 len(ORES) 格、在 choices 裡佔 len(ORES) + 1 格，差值剛好是 rows
+    picked = np.searchsorted(thresholds, generator.random(layer.shape) + rows, side="right")
+    np.copyto(layer, choices[picked + rows], where=layer == block_id("stone"))
+    return ids
+
+
+def generate_terrain(seed, cx, cz, heightmap=None, caves=True):
+    """產生區塊的地形、洞穴與礦石，回傳 (WORLD_HEIGHT, 16, 16) 的方塊 ID 陣列。
+
+    礦石在挖完洞穴之後才放，只會出現在剩下的石頭裡。
+    """
+    if heightmap is None:
+        heightmap = chunk_heightmap(seed, cx, cz)
+    ids = fill_layers(heightmap)
+    if caves:
+        carve_caves(ids, seed, cx, cz, int(heightmap.max()) - DIRT_DEPTH)
+    return place_ores(ids, chunk_generator(seed, cx, cz))
@@ -0,0 +1,416 @@
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+import numpy as np
+
+CHUNK_SIZE = 16
+WORLD_HEIGHT = 128
+CHUNK_AREA = CHUNK_SIZE * CHUNK_SIZE
+CHUNK_VOLUME = CHUNK_AREA * WORLD_HEIGHT
+
+AIR = 0
+
+# --- 方塊名稱 <-> 整數 ID 對照 ---
+# 區塊陣列裡只存 uint8 的 ID，名稱只在對外 API 轉換一次。
+BLOCK_NAMES = ["air"]
+BLOCK_IDS = {"air": AIR}
+
+
+def block_id(name):
+    bid = BLOCK_IDS.get(name)
+    if bid is None:
+        bid = len(BLOCK_NAMES)
+        if bid > 255:
+            raise ValueError(f"方塊種類超過 uint8 上限，無法登記 '{name}'")
+        BLOCK_NAMES.append(name)
+        BLOCK_IDS[name] = bid
+    return bid
+
+
+# 建網格需要的區塊: 自己、四個鄰居 (邊界上的面) 與四個斜對角 (角落頂點的環境光遮蔽)
+MESH_NEIGHBORHOOD = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+# 光照 byte (天空光 << 4 | 方塊光) 的露天全亮值: 世界外與還沒計算光照的區塊都當作這個值
+FULL_SKY = 0xF0
+
+# 高度圖用的「任何方塊」表；實心表由 BlockRegistry.solid 提供 (ChunkedWorld.solid)
+NOT_AIR = [False] + [True] * 255
+
+
+def _column_tops(mask):
+    # mask: (WORLD_HEIGHT, CHUNK_AREA)，回傳每一柱最高的 True 的 y，沒有則為 -1
+    tops = WORLD_HEIGHT - 1 - mask[::-1].argmax(axis=0)
+    return np.where(mask.any(axis=0), tops, -1).tolist()
+
+
+def _lower_column_top(tops, blocks, column, table):
+    # 最高的方塊被換掉時往下找下一個，只掃這一柱
+    i = ((tops[column] - 1) << 8) | column
+    while i >= 0 and not table[blocks[i]]:
+        i -= CHUNK_AREA
+    tops[column] = i >> 8 if i >= 0 else -1
+
+
+def spiral_offsets(radius):
+    """從 (0, 0) 一圈一圈往外的區塊位移 (半徑以切比雪夫距離計)，同一圈內近的在前。"""
+    offsets = [(0, 0)]
+    for ring in range(1, radius + 1):
+        x, z = -ring, -ring
+        for dx, dz in ((1, 0), (0, 1), (-1, 0), (0, -1)):
+            for _ in range(2 * ring):
+                offsets.append((x, z))
+                x, z = x + dx, z + dz
+    offsets.sort(key=lambda o: (max(abs(o[0]), abs(o[1])), o[0] * o[0] + o[1] * o[1]))
+    return offsets
+
+
+class Chunk:
+    """16 x WORLD_HEIGHT x 16 的方塊陣列，每格一個 byte 的方塊 ID。"""
+    __slots__ = ("cx", "cz", "blocks", "shared", "solid_rows", "heights", "light")
+
+    def __init__(self, cx, cz, blocks=None):
+        self.cx = cx
+        self.cz = cz
+        self.blocks = bytearray(CHUNK_VOLUME) if blocks is None else blocks
+        # 存檔快照仍在使用 blocks 時為 True，下次寫入前要先複製 (copy-on-write)
+        self.shared = False
+        # 碰撞用的實心位元集 (physics.chunk_solid_rows)，方塊改變時清掉，下次需要再重建
+        self.solid_rows = None
+        # (每柱最高的實心方塊 y, 每柱最高的任何方塊 y)，索引 (lz << 4) | lx，沒有方塊為 -1
+        # 第一次用到時整塊計算，之後 set_id 逐格更新
+        self.heights = None
+        # 每格一個 byte 的光照 (高 4 位元天空光、低 4 位元方塊光)，由 lighting.LightEngine 計算，還沒算過為 None
+        self.light = None
+
+    def writable_blocks(self):
+        """整塊改寫 blocks 之前呼叫 (例如生成)，由內容算出的快取都要重建。"""
+        self.solid_rows = None
+        self.heights = None
+        self.light = None
+        return self.unshared_blocks()
+
+    def unshared_blocks(self):
+        if self.shared:
+            self.blocks = bytearray(self.blocks)
+            self.shared = False
+        return self.blocks
+
+    def heightmaps(self, solid):
+        if self.heights is None:
+            ids = np.frombuffer(self.blocks, dtype=np.uint8).reshape(WORLD_HEIGHT, CHUNK_AREA)
+            self.heights = (_column_tops(np.asarray(solid, dtype=bool)[ids]), _column_tops(ids != AIR))
+        return self.heights
+
+    def block_count(self):
+        return CHUNK_VOLUME - self.blocks.count(AIR)
+
+    def iter_blocks(self):
+        blocks = self.blocks
+        base_x, base_z = self.cx * CHUNK_SIZE, self.cz * CHUNK_SIZE
+        # 上方整片空氣不用逐格掃描
+        end = len(blocks.rstrip(b"\x00"))
+        for i in range(end):
+            bid = blocks[i]
+            if bid:
+                yield (base_x + (i & 15), i >> 8, base_z + ((i >> 4) & 15)), bid
+
+
+class ChunkedWorld(MutableMapping):
+    """以 (chunk_x, chunk_z) 為鍵的區塊儲存。
+
+    保留原本 `self.world` 的 dict 介面 ((x, y, z) -> 方塊名稱)，
+    熱迴圈請改用 get_id / set_id 直接讀寫整數 ID。
+    """
+
+    def __init__(self):
+        # 依最近使用排序，最久沒用的在最前面 (LRU)
+        self.chunks = OrderedDict()
+        # 上次存檔後內容有變動的區塊，存檔時只寫這些
+        self.modified_chunks = set()
+        # 需要重建網格的區塊 (內容變動、或鄰居載入/卸載影響邊界的面)
+        self.dirty_meshes = set()
+        # 存在磁碟上但還沒載入記憶體的區塊，需要時才讀 (見 attach_store)
+        self.store = None
+        self.stored_chunks = set()
+        # 已卸載但背景存檔還沒寫完的區塊，重新載入時從這裡取
+        self.unsaved_chunks = {}
+        # 已交給背景存檔、還沒確定寫完的區塊；這時卸載要留在 unsaved_chunks，不然重新載入會讀到舊檔
+        self.pending_save = set()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evictions = 0
+        # 高度圖判斷「實心」用的表，遊戲會換成 BlockRegistry.solid
+        self.solid = NOT_AIR
+        # 光照引擎 (lighting.LightEngine)，設定後 set_id 會增量更新光照
+        self.lighting = None
+
+    # --- 區塊層級 ---
+    def get_chunk(self, cx, cz):
+        return self.chunks.get((cx, cz))
+
+    def ensure_chunk(self, cx, cz):
+        chunk = self.chunks.get((cx, cz))
+        if chunk is None:
+            # 寫入磁碟上的區塊前要先載入，不然會蓋掉存檔內容
+            if (cx, cz) in self.stored_chunks:
+                chunk = self.load_chunk(cx, cz)
+            if chunk is None:
+                chunk = Chunk(cx, cz)
+                self.chunks[(cx, cz)] = chunk
+                self.mark_mesh_dirty(cx, cz)
+        return chunk
+
+    def attach_store(self, store):
+        """啟動時只讀區域檔索引，區塊內容由 load_chunk 按需讀取。"""
+        self.store = store
+        self.stored_chunks = set(store.chunk_index())
+        return self.stored_chunks
+
+    def load_chunk(self, cx, cz):
+        key = (cx, cz)
+        if key not in self.stored_chunks:
+            return self.chunks.get(key)
+        # 先移出索引，讀檔失敗也不會每一幀重試
+        self.stored_chunks.discard(key)
+        blocks = self.unsaved_chunks.pop(key, None)
+        if blocks is not None:
+            # 背景執行緒可能還在讀這份陣列，沿用 copy-on-write
+            chunk = Chunk(cx, cz, blocks)
+            chunk.shared = True
+            self.chunks[key] = chunk
+            self.mark_mesh_dirty(cx, cz)
+            return chunk
+        blocks = self.store.load_chunk(cx, cz)
+        if blocks is None:
+            return None
+        chunk = Chunk(cx, cz, blocks)
+        self.chunks[key] = chunk
+        self.mark_mesh_dirty(cx, cz)
+        return chunk
+
+    def chunk_keys(self):
+        return self.chunks.keys()
+
+    def mark_modified(self, cx, cz):
+        self.modified_chunks.add((cx, cz))
+        self.mark_mesh_dirty(cx, cz)
+
+    def mark_mesh_dirty(self, cx, cz):
+        # 連同周圍的區塊，它們邊界上的面要重新判斷是否被遮住
+        self.dirty_meshes.update((cx + dx, cz + dz) for dx, dz in MESH_NEIGHBORHOOD)
+
+    def snapshot_area(self, cx, cz):
+        """回傳只含 (cx, cz) 與周圍八個區塊 (MESH_NEIGHBORHOOD) 的唯讀 ChunkedWorld，給背景網格工作使用。"""
+        snapshot = ChunkedWorld()
+        for dx, dz in MESH_NEIGHBORHOOD:
+            key = (cx + dx, cz + dz)
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                # 共用同一份陣列，主執行緒下次寫入時才複製
+                chunk.shared = True
+                copy = snapshot.chunks[key] = Chunk(key[0], key[1], chunk.blocks)
+                # 光照會在主執行緒原地更新，直接複製一份 (只有 32 KB)
+                copy.light = bytes(chunk.light) if chunk.light is not None else None
+        return snapshot
+
+    def take_dirty_meshes(self):
+        keys, self.dirty_meshes = self.dirty_meshes, set()
+        return keys
+
+    def writable_chunk(self, cx, cz):
+        chunk = self.ensure_chunk(cx, cz)
+        chunk.writable_blocks()
+        return chunk
+
+    def snapshot_modified_chunks(self):
+        """交出變動區塊的快照，只標記共用不複製，之後的寫入才會複製陣列。"""
+        keys, self.modified_chunks = self.modified_chunks, set()
+        self.pending_save.update(keys)
+        snapshots = {}
+        for key in keys:
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                chunk.shared = True
+                snapshots[key] = chunk.blocks
+            elif key in self.unsaved_chunks:
+                # 卸載後寫回失敗的區塊
+                snapshots[key] = self.unsaved_chunks[key]
+        return snapshots
+
+    # --- 卸載 / LRU ---
+    def touch_chunk(self, cx, cz):
+        """需要 (cx, cz) 時呼叫: 更新 LRU 順序與命中統計，回傳記憶體中的區塊或 None。"""
+        chunk = self.chunks.get((cx, cz))
+        if chunk is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+            self.chunks.move_to_end((cx, cz))
+        return chunk
+
+    def unload_chunk(self, cx, cz):
+        """從記憶體移除區塊；有未存檔變動時回傳 blocks，呼叫端要負責寫回。
+
+        背景存檔還在寫的區塊雖然沒有新的變動，也先留在 unsaved_chunks，直到 forget_unsaved。
+        """
+        key = (cx, cz)
+        chunk = self.chunks.pop(key, None)
+        if chunk is None:
+            return None
+        self.evictions += 1
+        self.stored_chunks.add(key)
+        self.mark_mesh_dirty(cx, cz)
+        if key not in self.modified_chunks:
+            if key in self.pending_save:
+                self.unsaved_chunks[key] = chunk.blocks
+            return None
+        self.modified_chunks.discard(key)
+        self.unsaved_chunks[key] = chunk.blocks
+        return chunk.blocks
+
+    def evict_lru(self, max_chunks, keep=()):
+        """卸載最久未使用的區塊直到剩 max_chunks 個，回傳需要寫回的 {key: blocks}。"""
+        dirty = {}
+        for key in list(self.chunks):
+            if len(self.chunks) <= max_chunks:
+                break
+            if key in keep:
+                continue
+            blocks = self.unload_chunk(*key)
+            if blocks is not None:
+                dirty[key] = blocks
+        return dirty
+
+    def forget_unsaved(self):
+        # 背景存檔都寫完後呼叫；寫入失敗 (又被標記為變動) 的留著
+        self.pending_save.clear()
+        self.unsaved_chunks = {key: blocks for key, blocks in self.unsaved_chunks.items()
+                               if key in self.modified_chunks}
+
+    def resident_bytes(self):
+        return sum(CHUNK_VOLUME + (len(chunk.light) if chunk.light is not None else 0) for chunk in self.chunks.values())
+
+    # --- 整數 ID 存取 ---
+    def get_id(self, x, y, z):
+        if y < 0 or y >= WORLD_HEIGHT:
+            return AIR
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        if chunk is None:
+            return AIR
+        return chunk.blocks[(y << 8) | ((z & 15) << 4) | (x & 15)]
+
+    def set_id(self, x, y, z, bid):
+        if y < 0 or y >= WORLD_HEIGHT:
+            return False
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        if chunk is None:
+            if bid == AIR:
+                return False
+            chunk = self.ensure_chunk(x >> 4, z >> 4)
+        blocks = chunk.unshared_blocks()
+        lx, lz = x & 15, z & 15
+        blocks[(y << 8) | (lz << 4) | lx] = bid
+        chunk.solid_rows = None
+        if chunk.heights is not None:
+            column = (lz << 4) | lx
+            for tops, table in zip(chunk.heights, (self.solid, NOT_AIR)):
+                if table[bid]:
+                    if y > tops[column]:
+                        tops[column] = y
+                elif y == tops[column]:
+                    _lower_column_top(tops, blocks, column, table)
+        if self.lighting is not None:
+            self.lighting.block_changed(x, y, z)
+        key = (chunk.cx, chunk.cz)
+        self.modified_chunks.add(key)
+        self.dirty_meshes.add(key)
+        # 邊界上的方塊也會影響鄰近區塊的面，角落上的還會影響斜對角區塊的環境光遮蔽
+        dx = -1 if lx == 0 else 1 if lx == CHUNK_SIZE - 1 else 0
+        dz = -1 if lz == 0 else 1 if lz == CHUNK_SIZE - 1 else 0
+        if dx:
+            self.dirty_meshes.add((key[0] + dx, key[1]))
+        if dz:
+            self.dirty_meshes.add((key[0], key[1] + dz))
+        if dx and dz:
+            self.dirty_meshes.add((key[0] + dx, key[1] + dz))
+        return True
+
+    def get_light(self, x, y, z):
+        """(x, y, z) 的光照 byte (天空光 << 4 | 方塊光)。"""
+        if y < 0 or y >= WORLD_HEIGHT:
+            return FULL_SKY
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        if chunk is None or chunk.light is None:
+            return FULL_SKY
+        return chunk.light[(y << 8) | ((z & 15) << 4) | (x & 15)]
+
+    def surface_y(self, x, z):
+        """(x, z) 這一柱最高的實心方塊的 y，整柱沒有實心方塊為 -1，區塊不在記憶體中時為 None。"""
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        if chunk is None:
+            return None
+        return chunk.heightmaps(self.solid)[0][((z & 15) << 4) | (x & 15)]
+
+    def top_y(self, x, z):
+        """同 surface_y，但算的是任何方塊 (包含樹葉等非實心方塊)。"""
+        chunk = self.chunks.get((x >> 4, z >> 4))
+        if chunk is None:
+            return None
+        return chunk.heightmaps(self.solid)[1][((z & 15) << 4) | (x & 15)]
+
+    # --- 相容舊 dict 介面 ---
+    def __getitem__(self, pos):
+        bid = self.get_id(*pos)
+        if bid == AIR:
+            raise KeyError(pos)
+        return BLOCK_NAMES[bid]
+
+    def get(self, pos, default=None):
+        bid = self.get_id(*pos)
+        return BLOCK_NAMES[bid] if bid != AIR else default
+
+    def __setitem__(self, pos, name):
+        x, y, z = pos
+        self.set_id(x, y, z, block_id(name) if name else AIR)
+
+    def __delitem__(self, pos):
+        if self.get_id(*pos) == AIR:
+            raise KeyError(pos)
+        self.set_id(pos[0], pos[1], pos[2], AIR)
+
+    _MISSING = object()
+
+    def pop(self, pos, default=_MISSING):
+        bid = self.get_id(*pos)
+        if bid == AIR:
+            if default is self._MISSING:
+                raise KeyError(pos)
+            return default
+        self.set_id(pos[0], pos[1], pos[2], AIR)
+        return BLOCK_NAMES[bid]
+
+    def __contains__(self, pos):
+        return self.get_id(*pos) != AIR
+
+    def __iter__(self):
+        for chunk in list(self.chunks.values()):
+            for pos, _ in chunk.iter_blocks():
+                yield pos
+
+    def items(self):
+        for chunk in list(self.chunks.values()):
+            for pos, bid in chunk.iter_blocks():
+                yield pos, BLOCK_NAMES[bid]
+
+    def __len__(self):
+        return sum(chunk.block_count() for chunk in self.chunks.values())
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    def clear(self):
+        self.chunks.clear()
+        self.modified_chunks.clear()
+        self.stored_chunks.clear()
+        self.unsaved_chunks.clear()
+        self.dirty_meshes.clear()
@@ -0,0 +1,83 @@
+import os
+import time
+import signal
+import logging
+import multiprocessing
+
+from world_storage import spiral_offsets
+from region_file import RegionStore, encode_chunk, load_world_seed
+from terrain import generate_terrain
+from structures import place_structures
+
+# 每累積這麼多個區塊寫一次區域檔，中斷時最多只損失這一批
+PREGEN_FLUSH_CHUNKS = 256
+PREGEN_TASK_CHUNKSIZE = 8
+PREGEN_REPORT_INTERVAL = 2.0
+
+
+def generate_chunk_blocks(seed, cx, cz):
+    """地形、洞穴、礦石與樹，回傳 (WORLD_HEIGHT, 16, 16) 的方塊 ID 陣列。
+
+    只由 (種子, cx, cz) 決定，不讀寫任何共用狀態，可以放在別的行程執行。
+    """
+    ids = generate_terrain(seed, cx, cz)
+    place_structures(ids, seed, cx, cz)
+    return ids
+
+
+def _ignore_interrupt():
+    # Ctrl+C 只由主行程處理，工作行程被中斷在半路會讓 Pool 卡住
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _generate_payload(task):
+    # 在工作行程裡生成並壓縮，傳回主行程的只有幾 KB 的區域檔資料
+    seed, cx, cz = task
+    return (cx, cz), encode_chunk(generate_chunk_blocks(seed, cx, cz).tobytes())
+
+
+def pregen_world(world_dir, radius, center=(0, 0), workers=None):
+    """不開視窗，用多個行程預先生成並儲存 center 周圍 radius 區塊內的世界，回傳新寫入的區塊數。
+
+    已經在區域檔裡的區塊會跳過，所以中斷後重新執行會從上次的進度繼續。
+    """
+    if os.path.exists(os.path.join(world_dir, "world.json")):
+        logging.error("舊版 world.json 還沒轉換成區域檔，請先啟動一次遊戲再預先生成。")
+        return 0
+    store = RegionStore(os.path.join(world_dir, "region"))
+    seed = load_world_seed(os.path.join(world_dir, "level.json"))
+    on_disk = set(store.chunk_index())
+    keys = [(center[0] + dx, center[1] + dz) for dx, dz in spiral_offsets(radius)]
+    tasks = [(seed, cx, cz) for cx, cz in keys if (cx, cz) not in on_disk]
+    workers = workers or os.cpu_count() or 1
+    logging.info(f"Pre-generating {len(tasks)} chunks around {center} (radius {radius}, "
+                 f"{len(keys) - len(tasks)} already on disk) with {workers} worker processes.")
+    if not tasks:
+        return 0
+
+    start = last_report = time.perf_counter()
+    written, batch = 0, {}
+    pool = multiprocessing.Pool(workers, initializer=_ignore_interrupt)
+    try:
+        for key, payload in pool.imap_unordered(_generate_payload, tasks, chunksize=PREGEN_TASK_CHUNKSIZE):
+            batch[key] = payload
+            if len(batch) >= PREGEN_FLUSH_CHUNKS:
+                store.save_payloads(batch)
+                written, batch = written + len(batch), {}
+            now = time.perf_counter()
+            if now - last_report >= PREGEN_REPORT_INTERVAL:
+                last_report = now
+                done = written + len(batch)
+                logging.info(f"{done}/{len(tasks)} chunks, {done / (now - start):.0f} chunks/s")
+        pool.close()
+    except KeyboardInterrupt:
+        logging.warning("預先生成被中斷，已完成的區塊會保存，下次執行會從這裡繼續。")
+        pool.terminate()
+    finally:
+        pool.join()
+        if batch:
+            store.save_payloads(batch)
+            written += len(batch)
+    elapsed = time.perf_counter() - start
+    logging.info(f"Pre-generated {written} chunks in {elapsed:.1f} s ({written / elapsed:.0f} chunks/s).")
+    return written
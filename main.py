@@ -492,7 +492,7 @@ class GameLauncher:
             pyglet_check_timeout = 10
             logging.info(f"Checking for pyglet using: '{resolved_python_exe}' with timeout {pyglet_check_timeout}s...")
             try:
-                check_script = "import pyglet; print(f'Pyglet {pyglet.version} imported successfully')"
+                check_script = "import pyglet, numpy; print(f'Pyglet {pyglet.version}, NumPy {numpy.__version__} imported successfully')"
                 clean_env = os.environ.copy()
                 vars_to_remove_for_subprocess = ['PYTHONPATH', 'PYTHONDEVMODE', 'PYTHONDEBUG', 'DEBUGPY_LAUNCHER_PORT', 'DEBUGPY_SOCKET_PATH']
                 if 'PYTHONPATH' in clean_env:
@@ -515,9 +515,9 @@ class GameLauncher:
                 logging.error(f"Pyglet library import failed in '{resolved_python_exe}' environment. Stdout: {stdout_output}, Stderr: {error_output}", exc_info=True)
                 if self.master.winfo_exists():
                     self.master.after(0, lambda: msgbox.showerror("依賴項缺失",
-                        f"執行遊戲所需的 'pyglet' 函式庫在 '{resolved_python_exe}' 環境中匯入失敗。\n\n"
+                        f"執行遊戲所需的 'pyglet' / 'numpy' 函式庫在 '{resolved_python_exe}' 環境中匯入失敗。\n\n"
                         f"錯誤詳情 (stderr):\n{error_output[:300]}...\n\n"
-                        f"請確認 'pyglet' 已正確安裝於此 Python 環境。\n嘗試安裝指令：\n'{resolved_python_exe} -m pip install pyglet'"))
+                        f"請確認 'pyglet' 與 'numpy' 已正確安裝於此 Python 環境。\n嘗試安裝指令：\n'{resolved_python_exe} -m pip install \"pyglet<2.0\" numpy'"))
                 self._re_enable_after_error()
                 return
             except subprocess.TimeoutExpired: